@@ -1,98 +1,121 @@
+import collision
+import copy
+import csvload
+import heapq
+import itertools
 import numpy
-import matplotlib.pyplot as plt
-import matplotlib.patches as patches
 import os
+import time
+
+
+class AnytimeResult:
+    """
+    Outcome of AStar.FindPathAnytime: the best path so far, its cost and the bound with cost <= bound * optimal.
+    reason tells why the search returned: "optimal", "deadline", "nopath" or "error"
+    """
+
+    def __init__(self):
+        self.path: list[str] = []
+        self.cost = float("inf")
+        self.bound = float("inf")
+        self.epsilon = float("inf")
+        self.reason = ""
+        self.phases = 0
+        self.expansions = 0
+        self.elapsed = 0.0
+
+    def __repr__(self) -> str:
+        return (f"AnytimeResult(reason:{self.reason} cost:{self.cost:.5f} bound:{self.bound:.3f} "
+                f"epsilon:{self.epsilon:.3f} phases:{self.phases} expansions:{self.expansions} "
+                f"elapsed:{self.elapsed:.4f} path:{self.path})")
 
 
 class AStar:
+    """
+    A* search over a roadmap of nodes, undirected edges and circle obstacles.
+
+    The roadmap (nodedict, nbr, edgecost, obst) belongs to the instance and the searches only read it,
+    everything a search writes is per-query state set up by NewSearchState. Searcher makes planners
+    that share the roadmap and have their own search state, for answering queries from several threads.
+    """
 
-    nodedict: dict[str, dict[str, float]] = {}
-    nodestat: dict[str, str] = {}
-    parentnode: dict[str, str] = {}
-    nbr: dict[str, list[str]] = {}
-    edgecost: dict[str, float] = {}
-    obst: list[dict[str, float]] = []
+    nodedict: dict[str, dict[str, float]]
+    nbr: dict[str, list[str]]
+    edgecost: dict[str, float]
+    obst: list[dict[str, float]]
 
     verbosity: int = 0
 
     def __init__(self, nodetxt: list[str], edgetxt: list[str], obsttxt: list[str] = None, verbosity: int = 0):
         self.verbosity = verbosity
+        self.nodedict = {}
+        self.nbr = {}
+        self.edgecost = {}
+        self.obst = []
+        # set on the copies Searcher makes, they share the roadmap and must not change it
+        self.issearcher = False
+        self.NewSearchState()
         if self.verbosity > 1:
             print(f"AStar.__init__")
         if self.verbosity > 2:
             print("nodetxt:", nodetxt)
             print("edgetxt:", edgetxt)
             print("obsttxt:", obsttxt)
+        # a single entry is a file name, otherwise the entries are the lines themselves
         if (len(nodetxt) == 1):
-            nodetxt = self.FileToList(nodetxt[0])
+            nodetxt = nodetxt[0]
         if (len(edgetxt) == 1):
-            edgetxt = self.FileToList(edgetxt[0])
+            edgetxt = edgetxt[0]
         if (obsttxt and len(obsttxt) == 1):
-            obsttxt = self.FileToList(obsttxt[0])
-
-        if self.verbosity > 0:
-            print(f"There are {len(nodetxt)} nodes lines and {len(edgetxt)} edge lines")
-            if obsttxt:
-                print(f"There are {len(obsttxt)} obstacle lines")
-            else:
-                print(f"No obstacle file")
+            obsttxt = obsttxt[0]
 
-        for line in nodetxt:
-            if line[0] == "#":
-                continue
-            if len(line) <= 1:
-                continue
-            n, xv, yv, cst = line.split(",")
-            self.nodedict[n] = {"x": float(xv),
-                                "y": float(yv),
-                                "cost": float(cst),
-                                "tent_tot_cost": float(cst)}
-            self.nbr[n] = []
-            self.nodestat[n] = "unvisited"
+        report = csvload.LoadReport()
+        ids, nxy, ncost = csvload.ReadNodes(nodetxt, report)
+        # the cost column of the node file is not used, searches start from zero
+        self.nodedict.update({n: {"x": x, "y": y} for n, (x, y) in zip(ids, nxy.tolist())})
+        self.nbr.update({n: [] for n in ids})
 
         if self.verbosity > 1:
             print("nodedict", self.nodedict)
             print("nbr", self.nbr)
 
+        known = list(self.nbr.keys())
+        i1, i2, ecost = csvload.ReadEdges(edgetxt, known, report)
+        n1s = [known[i] for i in i1.tolist()]
+        n2s = [known[i] for i in i2.tolist()]
+        for n1, n2 in zip(n1s, n2s):
+            self.nbr[n1].append(n2)
+            self.nbr[n2].append(n1)
+        self.edgecost.update(kv for n1, n2, fcost in zip(n1s, n2s, ecost.tolist())
+                             for kv in ((f"{n1}:{n2}", fcost), (f"{n2}:{n1}", fcost)))
         mincost: float = 1e6
         maxcost: float = -1e6
         sumcost = 0
-        for line in edgetxt:
-            if line[0] == "#":
-                continue
-            if len(line) <= 1:
-                continue
-            n1, n2, cost = line.split(",")
-            if n1 not in self.nbr:
-                print(f'Error in edgelist: "{n1}" is not a node')
-                continue
-            if n2 not in self.nbr:
-                print(f'Error in edgelist: "{n2}" is not a node')
-                continue
-            self.nbr[n1].append(n2)
-            self.nbr[n2].append(n1)
-            fcost = float(cost)
-            mincost = min(mincost, fcost)
-            maxcost = max(maxcost, fcost)
-            sumcost += fcost
-            self.edgecost[f"{n1}:{n2}"] = fcost
-            self.edgecost[f"{n2}:{n1}"] = fcost
+        if len(ecost) > 0:
+            mincost = float(ecost.min())
+            maxcost = float(ecost.max())
+            sumcost = float(ecost.sum())
         nedges = max(1, len(self.edgecost))
         print(f"edge costs min:{mincost:.3f} max:{maxcost:.3f} avg:{sumcost/nedges:.3f}")
-        # print("edgecost",edgecost)
 
         if obsttxt:
-            for line in obsttxt:
-                if line[0] == "#":
-                    continue
-                if len(line) <= 1:
-                    continue
-                x, y, diam = line.split(",")
+            for x, y, diam in csvload.ReadObstacles(obsttxt, report).tolist():
                 id = len(self.obst)
                 self.obst.append({"id": str(id),
-                                  "x": float(x),
-                                  "y": float(y),
-                                  "diam": float(diam)})
+                                  "x": x,
+                                  "y": y,
+                                  "diam": diam})
+        report.Print()
+
+        if self.verbosity > 0:
+            print(f"There are {len(ids)} node rows and {len(ecost)} edge rows")
+            if obsttxt:
+                print(f"There are {len(self.obst)} obstacles")
+            else:
+                print(f"No obstacle file")
+
+        # broad phase so collision checks only look at the obstacles near a segment or point
+        self.obstgrid = collision.ObstacleGrid(self.obst)
 
         if self.verbosity > 1:
             print("obst", self.obst)
@@ -127,109 +150,53 @@ class AStar:
 
     def GetNodeColor(self, n: str):
         # Named colors: https://matplotlib.org/stable/gallery/color/named_colors.html
-        if self.nodestat[n] == "open":
+        stat = self.nodestat.get(n, "unvisited")
+        if stat == "open":
             return "lightseagreen"
-        if self.nodestat[n] == "closed":
+        if stat == "closed":
             return "darkgreen"
-        if self.nodestat[n] == "unvisited":
+        if stat == "unvisited":
             return "blue"
         return "black"
 
     def PlotNodesWithNames(self, iplt: int, isSubplot=True):
-
-        # Plot the nodes using matplotlib
-
-        if isSubplot:
-            nrows = self.nrows
-            ncols = self.ncols
-        else:
-            nrows = 1
-            ncols = 1
-
-        ax = self.fig.add_subplot(nrows, ncols, iplt, aspect='equal')  # type: ignore
-
-        xmin = 1e6
-        xmax = -1e6
-        ymin = 1e6
-        ymax = -1e6
-        for n in self.nodedict.keys():
-            xx = self.nodedict[n]["x"]
-            yy = self.nodedict[n]["y"]
-            xmin = min(xmin, xx)
-            xmax = max(xmax, xx)
-            ymin = min(ymin, yy)
-            ymax = max(ymax, yy)
-
-        borderx = 0.1*(xmax-xmin)
-        bordery = 0.1*(ymax-ymin)
-        ax.set_xlim(xmin-borderx, xmax+borderx)
-        ax.set_ylim(ymin-bordery, ymax+bordery)
-        self.scale = (xmax-xmin) / 2
-        ax.grid(True, which='both')
-
-        # Now add the obstacles
-        for o in self.obst:
-            x = o["x"]
-            y = o["y"]
-            diam = o["diam"]
-            ax.add_patch(patches.Circle((x, y), diam/2, color='grey'))
-            ax.text(x, y, o["id"],
-                    fontsize=10, horizontalalignment='center', verticalalignment='center', color='white')
-
-        # Now add the nodes
-        for n in self.nodedict.keys():
-            x = self.nodedict[n]["x"]
-            y = self.nodedict[n]["y"]
-            clr = self.GetNodeColor(n)
-            ax.add_patch(patches.Circle((x, y), self.scale*0.07, color=clr))
-            nodename = n.replace(".000000", "")  # remove trailing zeros if they are in the label
-            ax.text(x, y, nodename,
-                    fontsize=10, horizontalalignment='center', verticalalignment='center', color='white')
-            # print("plt n", n, "x", x, "y", y)
-
-        # Now add the links between the nodes with cost
-        for e in self.edgecost.keys():
-            n1, n2 = e.split(":")
-            x1 = self.nodedict[n1]["x"]
-            y1 = self.nodedict[n1]["y"]
-            x2 = self.nodedict[n2]["x"]
-            y2 = self.nodedict[n2]["y"]
-            ax.plot([x1, x2], [y1, y2],
-                    color='green', linewidth=1)
-            # now calculate the midpoint and add the cost
-            xmid = (x1+x2)/2
-            ymid = (y1+y2)/2
-            ax.text(xmid, ymid, f"{self.edgecost[e]:.3f}",
-                    fontsize=10, horizontalalignment='center', verticalalignment='center')
-
-        plt.draw()
+        import astarplot
+        astarplot.PlotNodesWithNames(self, iplt, isSubplot)
 
     def HightlightNodesInPath(self, path: list[str], cost, actionline: str):
+        import astarplot
+        astarplot.HightlightNodesInPath(self, path, cost, actionline)
 
-        # Highlight the path we found
-        ax = plt.gca()
-        tit = "-".join(path) + f" cost:{cost:.3f}\n{actionline}"
-        ax.set_title(tit)
-        # ax.title = tit
-        for n in path:
-            x = self.nodedict[n]["x"]
-            y = self.nodedict[n]["y"]
-            ax.add_patch(patches.Circle((x, y), self.scale*0.07, edgecolor='red', lw=4, fill=False))
-
-    fig = None
     iplot: int = 1
     nrows: int = 4
     ncols: int = 6
+    # graphs with more nodes are plotted without labels
+    labelmax: int = 200
+    # every plotstep-th step of a step plot becomes a frame
+    plotstep: int = 1
 
     def SetupPlot(self, tit: str):
-        self.iplot = 1
-        self.fig = plt.figure()
-        self.fig.suptitle(tit)
-
-    def ShowPlot(self):
-        plt.show()
+        self.plotsteps = []
+        self.plotstart = dict(self.nodestat)
+        # matplotlib is only imported once something is plotted
+        import astarplot
+        astarplot.SetupPlot(self, tit)
+
+    def ShowPlot(self, fname: str = ""):
+        """
+        Show the plot made by FindPath or write it to fname, an image file or for step plots also a .gif or .mp4.
+        Nothing to do if there is no plot
+        """
+        if self.fig is None:
+            return
+        import astarplot
+        astarplot.ShowPlot(self, fname)
 
     def DoSubPlot(self, n: str, actionline: str, isSubPlot=True):
+        if isSubPlot:
+            # a step only records what changed, ShowPlot animates the steps without redrawing the graph
+            self.plotsteps.append((n, self.nodestat[n], self.parentnode.get(n), actionline))
+            return
         self.PlotNodesWithNames(self.iplot, isSubPlot)
         curp = self.GetParentList(n)
         curp.reverse()
@@ -238,34 +205,42 @@ class AStar:
         self.HightlightNodesInPath(curp, cost, actionline)
 
     def AddNodeToOpenList(self, n: str):
-        # global nodedict
-        ntentcost = self.nodedict[n]["tent_tot_cost"]
-        for i in range(len(self.openlist)):
-            if ntentcost < self.nodedict[self.openlist[i]]["tent_tot_cost"]:
-                self.openlist.insert(i, n)
-                self.nodestat[n] = "open"
-                if self.verbosity > 2:
-                    print(f"added {n} to openlist:{self.openlist} {ntentcost}")
-                return
-        self.openlist.append(n)
+        # the open list is a binary heap of (tent_tot_cost, seq, node) entries with lazy deletion,
+        # openseq holds the seq of the live entry for each open node so stale entries can be skipped
+        ntentcost = self.fcost[n]
+        self.openpushes += 1
+        heapq.heappush(self.openheap, (ntentcost, self.openpushes, n))
+        self.openseq[n] = self.openpushes
+        self.openset.add(n)
         self.nodestat[n] = "open"
+        # one test on the common path, the detail levels are checked inside
         if self.verbosity > 2:
-            print(f"added {n} to openlist:{self.openlist} {ntentcost}")
-
-        if self.verbosity > 3:
-            ## print out values anc check that they are in sorted order
-            print(f"AddNodeToOpenList after adding {n}")
-            pval = -1
-            for idx, id in enumerate(self.openlist):
-                nd = self.nodedict[id]
-                cval = nd["tent_tot_cost"]
-                if cval < pval:
-                    print(f"Warning in AddNodeToOpenlist: {id} {cval} < {pval}")
-                print(f'     {idx} openlist {id} ttcost:{cval}')
-                pval = cval
+            print(f"added {n} to openlist (size:{len(self.openset)}) {ntentcost}")
+            if self.verbosity > 3:
+                ## print out values and check that the live heap top is the cheapest open node
+                print(f"AddNodeToOpenList after adding {n}")
+                self.DropStaleOpenEntries()
+                topcost = self.openheap[0][0]
+                for id in self.openset:
+                    cval = self.fcost[id]
+                    if cval < topcost:
+                        print(f"Warning in AddNodeToOpenlist: {id} {cval} < {topcost}")
+                    print(f'     openlist {id} ttcost:{cval}')
+
+    def DropStaleOpenEntries(self):
+        # pop heap entries that belong to nodes that were removed or re-pushed with a lower cost
+        while self.openheap:
+            _, seq, n = self.openheap[0]
+            if self.openseq.get(n) == seq:
+                return
+            heapq.heappop(self.openheap)
+
+    def RemoveNodeFromOpenList(self, n: str):
+        self.openset.discard(n)
+        self.openseq.pop(n, None)
 
     def AddNodeToClosedList(self, n: str):
-        self.closedlist.append(n)
+        self.closedset.add(n)
         self.nodestat[n] = "closed"
 
     def GetParentList(self, n: str) -> list[str]:
@@ -279,20 +254,74 @@ class AStar:
         return rv
 
     fastMethod = True
+    # FindPath searches from both ends when there is nothing to plot, see FindPathBidirectional
+    bidirectional = False
+    # optional landmarks.LandmarkTable, its ALT bound sharpens the euclidean heuristic, see Heuristic
+    landmarks = None
+    # optional pathcache.PathCache for repeated queries, version counts the changes to the graph
+    pathcache = None
+    version: int = 0
+    mutations: int = 0
+    # optional stats.PlannerStats that the searches add their counts and times to, see RecordSearch
+    stats = None
+
+    def NewSearchState(self):
+        """
+        Start with no search done, no anytime search to continue and no plot
+        """
+        self.ResetSearch()
+        self.expansionsfwd = 0
+        self.expansionsrev = 0
+        # search state of FindPathAnytime, kept so a later call for the same query continues where it stopped
+        self.anytime = None
+        self.fig = None
+        # steps of a step plot as (node, its status, its parent, action) and the node status before the first
+        self.plotsteps = []
+        self.plotstart = {}
+
+    def ResetSearch(self):
+        """
+        Drop the per-query state of the last search. Nodes without a nodestat entry are unvisited
+        """
+        # cost from the start and that cost plus the heuristic of the nodes the search reached
+        self.gcost: dict[str, float] = {}
+        self.fcost: dict[str, float] = {}
+        self.nodestat: dict[str, str] = {}
+        self.parentnode: dict[str, str] = {}
+        self.openheap = []
+        self.openseq: dict[str, int] = {}
+        self.openset: set[str] = set()
+        self.closedset: set[str] = set()
+        self.openpushes = 0
+        # pops of searches that keep their own heaps, 0 when they follow from openpushes and openheap
+        self.openpops = 0
+        self.expansions = 0
+
+    def Searcher(self) -> "AStar":
+        """
+        A planner of the same class that shares this roadmap, its landmarks and its path cache but has its own
+        search state and no stats, so it can answer queries in another thread. The roadmap must not change
+        while searchers use it, make new searchers after a change. The methods that would change it raise
+        RuntimeError when called on a searcher
+        """
+        rv = copy.copy(self)
+        rv.NewSearchState()
+        rv.stats = None
+        rv.issearcher = True
+        return rv
 
     def GetSeeminglyClosestNodeToTarget(self) -> str:
         # global nodedict
         if self.fastMethod:
-            return self.openlist[0]
+            self.DropStaleOpenEntries()
+            return self.openheap[0][2]
         else:
-            if len(self.openlist) == 1:
-                return self.openlist[0]
             mincost = 1e6
             minnode: str = "None"
-            for n in self.openlist:
-                if "tent_tot_cost" not in self.nodedict[n].keys():
+            for n in self.openset:
+                if n not in self.fcost:
                     continue
-                ttcost = self.nodedict[n]["tent_tot_cost"]
+                ttcost = self.fcost[n]
                 if ttcost < mincost:
                     mincost = ttcost
                     minnode = n
@@ -301,15 +330,73 @@ class AStar:
     def AssignParent(self, n: str, parent: str, goal: str):
         # global nodedict, parentnode
         self.parentnode[n] = parent
-        pd = self.nodedict[parent]
-        nd = self.nodedict[n]
-        nd["cost"] = pd["cost"] + self.edgecost[f"{parent}:{n}"]
-        nd["tent_tot_cost"] = nd["cost"] + self.Distance(n, goal)
+        self.gcost[n] = self.gcost[parent] + self.edgecost[f"{parent}:{n}"]
+        self.fcost[n] = self.gcost[n] + self.Heuristic(n, goal)
+
+    def Heuristic(self, n: str, goal: str) -> float:
+        """
+        Lower bound on the path cost from n to goal, the euclidean distance or the larger ALT bound of the landmarks
+        """
+        h = self.Distance(n, goal)
+        if self.landmarks is not None:
+            h = max(h, self.landmarks.LowerBound(n, goal))
+        return h
+
+    def BumpVersion(self, added: bool = False):
+        """
+        Record a change of the graph, every change gets a version that was never used before. An added edge can
+        make paths shorter than the landmark distances, whose bounds would then overestimate, so the landmarks
+        are dropped. Removed edges and nodes only make paths longer and keep the bounds valid
+        :param added: the change added an edge
+        """
+        self.mutations += 1
+        self.version = self.mutations
+        if added and self.landmarks is not None:
+            self.landmarks = None
+            if self.verbosity > 0:
+                print("Landmarks dropped, an added edge can make paths shorter than their distances")
 
     def FindPath(self, start: str, goal: str, scenename="Scene", stepplot=False, finplot=False) -> list[str]:
+        """
+        Shortest path from start to goal, answered from the path cache when one is set and there is nothing to plot
+        """
+        t0 = time.perf_counter()
+        cached = False
+        if self.pathcache is None or stepplot or finplot:
+            rv = self.FindPathUncached(start, goal, scenename, stepplot, finplot)
+        else:
+            rv = self.pathcache.Get(start, goal, self.version)
+            cached = rv is not None
+            if cached:
+                self.expansions = 0
+            else:
+                rv = self.FindPathUncached(start, goal)
+                self.pathcache.Put(rv, self.version)
+        if self.stats is not None:
+            self.RecordSearch("findpath", time.perf_counter() - t0, cached)
+        return rv
+
+    def RecordSearch(self, phase: str, secs: float, cached: bool = False):
+        """
+        Add the counts of the last search and its time as phase to stats
+        """
+        st = self.stats
+        st.AddTime(phase, secs)
+        st.searches += 1
+        if cached:
+            st.cachedsearches += 1
+            return
+        st.expansions += self.expansions
+        st.openpushes += self.openpushes
+        # entries only leave openheap by being popped
+        st.openpops += self.openpops if self.openpops else self.openpushes - len(self.openheap)
+
+    def FindPathUncached(self, start: str, goal: str, scenename="Scene", stepplot=False,
+                         finplot=False) -> list[str]:
         # global nodedict, nbr, edgecost
-        self.openlist = [start]
-        self.closedlist = []
+        if self.bidirectional and not (stepplot or finplot):
+            return self.FindPathBidirectional(start, goal)
+        self.ResetSearch()
         if stepplot:
             finplot = False
         if start not in self.nodedict.keys():
@@ -319,11 +406,16 @@ class AStar:
             print(f'Error Goal node "{goal}" not in nodedict')
             return []
 
+        self.gcost[start] = 0.0
+        self.fcost[start] = self.Heuristic(start, goal)
+        self.AddNodeToOpenList(start)
+
         if stepplot or finplot:
             self.SetupPlot(f"A* for {scenename} from {start} to {goal}")
-        while len(self.openlist) > 0:
+        while len(self.openset) > 0:
             n: str = self.GetSeeminglyClosestNodeToTarget()
-            self.openlist.remove(n)
+            self.RemoveNodeFromOpenList(n)
+            self.expansions += 1
             if n == goal:
                 rv = self.GetParentList(n)
                 rv.reverse()
@@ -331,17 +423,18 @@ class AStar:
                     self.DoSubPlot(n, f"Solution", isSubPlot=not finplot)
                 return rv
             for n2 in self.nbr[n]:
-                if n2 in self.closedlist:
+                if n2 in self.closedset:
                     continue
-                if n2 not in self.openlist:
+                if n2 not in self.openset:
                     self.AssignParent(n2, n, goal)
                     self.AddNodeToOpenList(n2)
                     if stepplot:
                         self.DoSubPlot(n2, f"added {n2} to openlist")
                 else:
                     # if the nodes is in the openlist then we might need to reset the costs if we found a better path
-                    if self.nodedict[n2]["cost"] > self.nodedict[n]["cost"] + self.edgecost[f"{n}:{n2}"]:
+                    if self.gcost[n2] > self.gcost[n] + self.edgecost[f"{n}:{n2}"]:
                         self.AssignParent(n2, n, goal)
+                        self.AddNodeToOpenList(n2)
             self.AddNodeToClosedList(n)
             if stepplot:
                 self.DoSubPlot(n, f"added {n} to closed")
@@ -351,6 +444,306 @@ class AStar:
             self.DoSubPlot(n, f"No Solution Found", isSubPlot=not finplot)
         return []
 
+    def FindPathBidirectional(self, start: str, goal: str) -> list[str]:
+        """
+        Bidirectional A* that grows one search from start and one from goal over the undirected graph.
+        Both searches use the balanced potential p(n) = (Distance(n,goal) - Distance(n,start))/2, forward keys
+        are cost+p and backward keys cost-p, which keeps both consistent. The search stops as soon as the two
+        smallest open keys add up to at least the best path through a node reached from both sides,
+        so the cost is the same as that of FindPath. Expansions are counted per direction
+        """
+        self.ResetSearch()
+        self.expansionsfwd = 0
+        self.expansionsrev = 0
+        if start not in self.nodedict:
+            print(f'Error Start node "{start}" not in nodedict')
+            return []
+        if goal not in self.nodedict:
+            print(f'Error Goal node "{goal}" not in nodedict')
+            return []
+        if start == goal:
+            return [start]
+
+        def Potential(n: str) -> float:
+            return (self.Heuristic(n, goal) - self.Heuristic(n, start)) / 2
+
+        # per direction: cost so far, parent, closed set and heap of (key, node), +1 forward and -1 backward
+        cost = ({start: 0.0}, {goal: 0.0})
+        parent = ({}, {})
+        closed = (set(), set())
+        heaps = ([(Potential(start), start)], [(-Potential(goal), goal)])
+        sign = (1, -1)
+        best = float("inf")
+        meet = None
+        npush = 2
+        while heaps[0] and heaps[1]:
+            if heaps[0][0][0] + heaps[1][0][0] >= best:
+                break
+            # grow the side with fewer open entries, that keeps the two frontiers about the same size
+            d = 0 if len(heaps[0]) <= len(heaps[1]) else 1
+            _, n = heapq.heappop(heaps[d])
+            if n in closed[d]:
+                continue
+            closed[d].add(n)
+            if d == 0:
+                self.expansionsfwd += 1
+            else:
+                self.expansionsrev += 1
+            cd = cost[d]
+            other = cost[1-d]
+            for n2 in self.nbr[n]:
+                if n2 in closed[d]:
+                    continue
+                c2 = cd[n] + self.edgecost[f"{n}:{n2}"]
+                if c2 < cd.get(n2, float("inf")):
+                    cd[n2] = c2
+                    parent[d][n2] = n
+                    heapq.heappush(heaps[d], (c2 + sign[d]*Potential(n2), n2))
+                    npush += 1
+                if n2 in other and c2 + other[n2] < best:
+                    best = c2 + other[n2]
+                    meet = (n, n2) if d == 0 else (n2, n)
+        self.expansions = self.expansionsfwd + self.expansionsrev
+        self.openpushes = npush
+        self.openpops = npush - len(heaps[0]) - len(heaps[1])
+        if self.verbosity > 0:
+            print(f"Bidirectional expansions forward:{self.expansionsfwd} backward:{self.expansionsrev}")
+        if meet is None:
+            print("No path found")
+            return []
+        # meet is an edge of the best path, n1 reached forward and n2 backward
+        n1, n2 = meet
+        rv = [n1]
+        while rv[-1] in parent[0]:
+            rv.append(parent[0][rv[-1]])
+        rv.reverse()
+        rv.append(n2)
+        while rv[-1] in parent[1]:
+            rv.append(parent[1][rv[-1]])
+        return rv
+
+    def FindPathsFrom(self, source: str, goals: list[str]) -> dict[str, tuple[list[str], float]]:
+        """
+        One Dijkstra sweep from source that stops as soon as every goal is settled,
+        returns (path, cost) per goal, ([], inf) for goals that cannot be reached
+        """
+        t0 = time.perf_counter()
+        self.ResetSearch()
+        rv = {}
+        if source not in self.nodedict:
+            print(f'Error Source node "{source}" not in nodedict')
+            return {g: ([], float("inf")) for g in goals}
+        todo = set()
+        for g in goals:
+            if g in self.nodedict:
+                todo.add(g)
+            else:
+                print(f'Error Goal node "{g}" not in nodedict')
+        ngoals = len(todo)
+        # no heuristic serves every goal at once, so this is A* with a zero heuristic
+        cost = self.gcost
+        cost[source] = 0.0
+        heap = [(0.0, source)]
+        npush = 1
+        while heap and todo:
+            c, n = heapq.heappop(heap)
+            if n in self.closedset:
+                continue
+            self.closedset.add(n)
+            self.expansions += 1
+            todo.discard(n)
+            for n2 in self.nbr[n]:
+                if n2 in self.closedset:
+                    continue
+                c2 = c + self.edgecost[f"{n}:{n2}"]
+                if c2 < cost.get(n2, float("inf")):
+                    cost[n2] = c2
+                    self.parentnode[n2] = n
+                    heapq.heappush(heap, (c2, n2))
+                    npush += 1
+        self.openpushes = npush
+        self.openpops = npush - len(heap)
+        for g in goals:
+            if g in self.closedset:
+                path = self.GetParentList(g)
+                path.reverse()
+                rv[g] = (path, cost[g])
+            else:
+                rv[g] = ([], float("inf"))
+        if self.verbosity > 0:
+            print(f"FindPathsFrom {source} settled {len(self.closedset)} nodes for {ngoals} known goals")
+        if self.stats is not None:
+            self.RecordSearch("findpathsfrom", time.perf_counter() - t0)
+        return rv
+
+    def CostMatrix(self, sources: list[str],
+                   goals: list[str]) -> tuple[numpy.ndarray, dict[tuple[str, str], list[str]]]:
+        """
+        Shortest path costs between every source and every goal, one FindPathsFrom sweep per source,
+        or per goal when there are fewer goals since the graph is undirected.
+        Returns the (len(sources),len(goals)) cost matrix, inf where there is no path, and the paths keyed on
+        (source, goal)
+        """
+        mat = numpy.full((len(sources), len(goals)), numpy.inf)
+        paths = {}
+        expansions = 0
+        if len(goals) < len(sources):
+            for j, g in enumerate(goals):
+                found = self.FindPathsFrom(g, sources)
+                expansions += self.expansions
+                for i, s in enumerate(sources):
+                    path, mat[i, j] = found[s]
+                    paths[(s, g)] = path[::-1]
+        else:
+            for i, s in enumerate(sources):
+                found = self.FindPathsFrom(s, goals)
+                expansions += self.expansions
+                for j, g in enumerate(goals):
+                    paths[(s, g)] = found[g][0]
+                    mat[i, j] = found[g][1]
+        self.expansions = expansions
+        return mat, paths
+
+    def FindPathAnytime(self, start: str, goal: str, budget: float, eps0: float = 3.0,
+                        epsstep: float = 0.5) -> AnytimeResult:
+        """
+        Anytime repairing A* (ARA*) that returns within budget seconds with the best path found so far.
+        The first search inflates the heuristic by eps0 to find a path quickly, every further search lowers the
+        inflation by epsstep and only re-expands the nodes whose cost improved, down to 1 where the path is optimal.
+        The bound of the result is the smaller of the inflation and cost / (least g+h left open), which both bound
+        the ratio to the optimal cost. A new call for the same query on an unchanged graph continues the search,
+        so a path keeps improving as more calls are given time
+        """
+        t0 = time.perf_counter()
+        deadline = t0 + budget
+        st = self.anytime
+        if st is None or st["key"] != (start, goal, self.version):
+            for n in (start, goal):
+                if n not in self.nodedict:
+                    print(f'Error node "{n}" not in nodedict')
+                    rv = AnytimeResult()
+                    rv.reason = "error"
+                    return rv
+            st = {"key": (start, goal, self.version), "g": {start: 0.0}, "h": {}, "parent": {}, "open": {},
+                  "closed": set(), "incons": set(), "heap": [], "seq": 0, "eps": max(1.0, eps0),
+                  "phasedone": False, "result": AnytimeResult()}
+            self.anytime = st
+            self.PushAnytime(st, start, goal)
+        rv = st["result"]
+        expansions = rv.expansions
+        while True:
+            if not st["phasedone"]:
+                if not self.ImprovePathAnytime(st, goal, deadline):
+                    rv.reason = "deadline"
+                    break
+                st["phasedone"] = True
+                rv.phases += 1
+                g = st["g"]
+                if goal not in g:
+                    # the open list ran empty without reaching goal
+                    rv.reason = "nopath"
+                    break
+                path = [goal]
+                while path[-1] != start:
+                    path.append(st["parent"][path[-1]])
+                path.reverse()
+                # nodes on the path may have improved after goal got its parent, so the path can beat g[goal]
+                cost = self.AstarCost(path)
+                left = [g[n] + st["h"][n] for n in itertools.chain(st["open"], st["incons"])]
+                lb = min(left, default=cost)
+                rv.path = path
+                rv.cost = cost
+                rv.epsilon = st["eps"]
+                rv.bound = max(1.0, min(st["eps"], cost/lb if lb > 0 else st["eps"]))
+            if rv.bound <= 1.0:
+                rv.reason = "optimal"
+                break
+            if time.perf_counter() >= deadline:
+                rv.reason = "deadline"
+                break
+            # next phase: lower the inflation, reopen the nodes that improved after they were closed
+            st["eps"] = max(1.0, min(st["eps"] - epsstep, rv.bound))
+            for n in st["incons"]:
+                st["open"][n] = True
+            st["incons"] = set()
+            st["closed"] = set()
+            st["heap"] = []
+            for n in list(st["open"]):
+                self.PushAnytime(st, n, goal)
+            st["phasedone"] = False
+        rv.elapsed = time.perf_counter() - t0
+        self.expansions = rv.expansions - expansions
+        if self.stats is not None:
+            self.stats.AddTime("anytime", rv.elapsed)
+            self.stats.searches += 1
+            self.stats.expansions += self.expansions
+        if self.verbosity > 0:
+            print(rv)
+        return copy.copy(rv)
+
+    def PushAnytime(self, st: dict, n: str, goal: str):
+        h = st["h"].get(n)
+        if h is None:
+            h = st["h"][n] = self.Heuristic(n, goal)
+        st["seq"] += 1
+        st["open"][n] = st["seq"]
+        heapq.heappush(st["heap"], (st["g"][n] + st["eps"]*h, st["seq"], n))
+
+    def ImprovePathAnytime(self, st: dict, goal: str, deadline: float) -> bool:
+        """
+        One ARA* search phase with the current inflation, returns False if it ran into the deadline
+        """
+        g = st["g"]
+        heap = st["heap"]
+        openset = st["open"]
+        closed = st["closed"]
+        rv = st["result"]
+        while heap:
+            key, seq, n = heap[0]
+            if openset.get(n) != seq:
+                heapq.heappop(heap)
+                continue
+            if g.get(goal, float("inf")) <= key:
+                return True
+            if time.perf_counter() >= deadline:
+                return False
+            heapq.heappop(heap)
+            del openset[n]
+            closed.add(n)
+            rv.expansions += 1
+            for n2 in self.nbr[n]:
+                c2 = g[n] + self.edgecost[f"{n}:{n2}"]
+                if c2 < g.get(n2, float("inf")):
+                    g[n2] = c2
+                    st["parent"][n2] = n
+                    if n2 in closed:
+                        st["incons"].add(n2)
+                    else:
+                        self.PushAnytime(st, n2, goal)
+        return True
+
+    def RemoveEdge(self, n1: str, n2: str):
+        """
+        Remove the undirected edge between n1 and n2
+        """
+        self.BumpVersion()
+        self.edgecost.pop(f"{n1}:{n2}", None)
+        self.edgecost.pop(f"{n2}:{n1}", None)
+        self.nbr[n1] = [n for n in self.nbr[n1] if n != n2]
+        self.nbr[n2] = [n for n in self.nbr[n2] if n != n1]
+
+    def RemoveNode(self, n: str):
+        """
+        Remove node n and all of its edges
+        """
+        self.BumpVersion()
+        for n2 in set(self.nbr[n]):
+            self.RemoveEdge(n, n2)
+        del self.nbr[n]
+        del self.nodedict[n]
+        self.nodestat.pop(n, None)
+        self.parentnode.pop(n, None)
+
     def AstarCost(self, path) -> float:
         # global nodedict, edgecost
         cost = 0
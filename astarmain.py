@@ -1,5 +1,10 @@
 import astar
+import landmarks
+import roadmap
+import stats
 import argparse
+import contextlib
+import time
 
 parser = argparse.ArgumentParser(prog='AstarMain',
                                  description='Calculates Astar path for a set of nodes and edges',
@@ -23,6 +28,40 @@ parser.add_argument('-fp', '--finplot', action='store_true',
                     help='Do a plot of final path')
 parser.add_argument('-sp', '--stepplot', action='store_true',
                     help='Create a plot that shows the steps to finding the final path')
+parser.add_argument('-lt', '--labelmax', type=int, default=200,
+                    help='Plot graphs with more nodes than this without labels')
+parser.add_argument('-ps', '--plotstep', type=int, default=1,
+                    help='Make every Nth search step of -sp a frame of the animation')
+parser.add_argument('-pf', '--plotfile', type=str, default="",
+                    help='Write the plot of -fp or -sp to this image file instead of showing it, '
+                         'works without a display')
+parser.add_argument('-cg', '--compact', action='store_true',
+                    help='Load into the compact array-backed roadmap and search on it (no plotting)')
+parser.add_argument('-rb', '--roadmapbin', type=str, default="",
+                    help='Name of a binary roadmap file to memory map and search instead of the csv files '
+                         '(no plotting)')
+parser.add_argument('-bd', '--bidirectional', action='store_true',
+                    help='Search from both ends at once, plots fall back to the one sided search')
+parser.add_argument('-gf', '--goalsfile', type=str, default="",
+                    help='File of goal node ids, paths from the first node to all of them are found in one sweep')
+parser.add_argument('-sf', '--sourcesfile', type=str, default="",
+                    help='File of source node ids, with a goals file a source x goal cost matrix is written')
+parser.add_argument('-po', '--pathsout', type=str, default="paths.csv",
+                    help='File the paths of a goals file query are written to')
+parser.add_argument('-mo', '--matrixout', type=str, default="costmatrix.csv",
+                    help='File the cost matrix of a sources and goals file query is written to')
+parser.add_argument('-lm', '--landmarks', type=str, default="",
+                    help='Name of a landmark file, loaded if it matches the roadmap and otherwise built and saved')
+parser.add_argument('-nl', '--numlandmarks', type=int, default=0,
+                    help='Number of landmarks to build for the ALT heuristic when no matching landmark file exists')
+parser.add_argument('-dl', '--deadline', type=float, default=0.0,
+                    help='Seconds each anytime (ARA*) call may take, 0 runs the plain search to completion')
+parser.add_argument('-nc', '--ncalls', type=int, default=1,
+                    help='Anytime calls to make, each one continues improving the path of the previous one')
+parser.add_argument('-e0', '--epsilon', type=float, default=3.0,
+                    help='Heuristic inflation of the first anytime search')
+parser.add_argument('-so', '--statsout', type=str, default="",
+                    help='Collect counters and phase times of the dict graph search and write them to this JSON file')
 parser.add_argument('-v', '--verbose', type=int, default=0,
                     help='Verbosity level')
 
@@ -38,7 +77,23 @@ astarscene = args.scene
 dname = args.directory
 finplot = args.finplot
 stepplot = args.stepplot
+plotfile = args.plotfile
+labelmax = args.labelmax
+plotstep = args.plotstep
 verbosity = args.verbose
+compact = args.compact
+roadmapbin = args.roadmapbin
+bidirectional = args.bidirectional
+goalsfile = args.goalsfile
+sourcesfile = args.sourcesfile
+pathsout = args.pathsout
+matrixout = args.matrixout
+lmfile = args.landmarks
+numlandmarks = args.numlandmarks
+deadline = args.deadline
+ncalls = args.ncalls
+epsilon = args.epsilon
+statsout = args.statsout
 
 if verbosity > 0:
     print("prm.py args:")
@@ -51,19 +106,145 @@ if verbosity > 0:
     print("    dname:", dname)
     print("    finplot:", finplot)
     print("    stepplot:", stepplot)
+    print("    plotfile:", plotfile)
+    print("    labelmax:", labelmax)
+    print("    plotstep:", plotstep)
+    print("    compact:", compact)
+    print("    roadmapbin:", roadmapbin)
+    print("    bidirectional:", bidirectional)
+    print("    goalsfile:", goalsfile)
+    print("    sourcesfile:", sourcesfile)
+    print("    pathsout:", pathsout)
+    print("    matrixout:", matrixout)
+    print("    lmfile:", lmfile)
+    print("    numlandmarks:", numlandmarks)
+    print("    deadline:", deadline)
+    print("    ncalls:", ncalls)
+    print("    epsilon:", epsilon)
+    print("    statsout:", statsout)
     print("    verbosity:", verbosity)
 
 
+def Phase(st: stats.PlannerStats, name: str):
+    # phases are only timed when stats are collected
+    return contextlib.nullcontext() if st is None else st.Phase(name)
+
+
+def WriteStats(st: stats.PlannerStats):
+    if st is None:
+        return
+    print(st.Summary())
+    st.Dump(statsout)
+    print(f"Stats written to {statsout}")
+
+
+def ReadIdFile(fname: str) -> list[str]:
+    """
+    Node ids separated by commas or newlines, lines starting with # are comments
+    """
+    ids = []
+    with open(fname) as f:
+        for line in f:
+            if line.startswith("#"):
+                continue
+            ids.extend(fld.strip() for fld in line.split(",") if fld.strip())
+    return ids
+
+
+def RunBatch(asta: astar.AStar):
+    """
+    Answer the goals file query from the first node, or the sources x goals query when there is a sources file
+    """
+    goals = ReadIdFile(goalsfile)
+    t0 = time.perf_counter()
+    if sourcesfile:
+        sources = ReadIdFile(sourcesfile)
+        mat, paths = asta.CostMatrix(sources, goals)
+        elap = time.perf_counter() - t0
+        with open(matrixout, 'w') as file:
+            file.write("source," + ",".join(goals) + "\n")
+            for s, row in zip(sources, mat.tolist()):
+                file.write(s + "," + ",".join(f"{c:.5f}" for c in row) + "\n")
+        results = [(s, g, mat[i, j], paths[(s, g)]) for i, s in enumerate(sources) for j, g in enumerate(goals)]
+        print(f"Cost matrix of {len(sources)} sources x {len(goals)} goals in {elap:.3f} secs "
+              f"with {asta.expansions} expansions, written to {matrixout}")
+    else:
+        found = asta.FindPathsFrom(firstnode, goals)
+        elap = time.perf_counter() - t0
+        results = [(firstnode, g, found[g][1], found[g][0]) for g in goals]
+        print(f"Paths from {firstnode} to {len(goals)} goals in {elap:.3f} secs with {asta.expansions} expansions")
+    with open(pathsout, 'w') as file:
+        for s, g, cost, path in results:
+            file.write(f"{s},{g},{cost:.5f}," + ",".join(path) + "\n")
+    # queries naming a node that is not in the roadmap are reported apart from the unreachable goals
+    known = [r for r in results if r[0] in asta.nodedict and r[1] in asta.nodedict]
+    nfound = sum(1 for r in known if r[3])
+    print(f"{nfound}/{len(known)} paths found, written to {pathsout}")
+    unknown = [n for n in dict.fromkeys(r[k] for r in results for k in (0, 1)) if n not in asta.nodedict]
+    if unknown:
+        print(f"{len(results)-len(known)} queries name node ids not in the roadmap: {','.join(unknown)}")
+
+
+def RunAnytime(asta: astar.AStar) -> list[str]:
+    """
+    Make up to ncalls anytime calls of deadline seconds each, stop early once the path is optimal
+    """
+    rv = None
+    for k in range(ncalls):
+        rv = asta.FindPathAnytime(firstnode, targetnode, deadline, eps0=epsilon)
+        print(f"anytime call {k}: reason:{rv.reason} cost:{rv.cost:.5f} bound:{rv.bound:.3f} "
+              f"phases:{rv.phases} secs:{rv.elapsed:.4f}")
+        if rv.reason != "deadline":
+            break
+    return rv.path
+
+
 def main():
     fp_nodename = f"{dname}/{fnamenodes}"
     fp_edgename = f"{dname}/{fnameedges}"
     fp_obstename = f"{dname}/{fnameobstacles}"
-    asta = astar.AStar([fp_nodename], [fp_edgename], [fp_obstename], verbosity=verbosity)
-    rv = asta.FindPath(firstnode, targetnode, scenename=astarscene,
-                       stepplot=stepplot, finplot=finplot)
-    print("bestpath:", rv)
-    print(f"bestpath cost:{asta.AstarCost(rv):.5f}")
-    asta.ShowPlot()
+    fp_lmname = f"{dname}/{lmfile}" if lmfile else ""
+    st = stats.PlannerStats() if statsout else None
+    if goalsfile:
+        # the batch queries run on the dict graph
+        with Phase(st, "load"):
+            asta = astar.AStar([fp_nodename], [fp_edgename], [fp_obstename], verbosity=verbosity)
+        asta.stats = st
+        RunBatch(asta)
+        WriteStats(st)
+        return
+    if compact or roadmapbin:
+        if roadmapbin:
+            rmap = roadmap.LoadBinary(f"{dname}/{roadmapbin}", verbosity=verbosity)
+        else:
+            rmap = roadmap.FromCsv(fp_nodename, fp_edgename, fp_obstename, verbosity=verbosity)
+        if lmfile or numlandmarks > 0:
+            rmap.SetLandmarks(landmarks.LoadOrBuild(fp_lmname, rmap, numlandmarks, verbosity=verbosity))
+        rv = rmap.FindPath(firstnode, targetnode)
+        print("bestpath:", rv)
+        print(f"bestpath cost:{rmap.AstarCost(rv):.5f}")
+        print(f"expansions:{rmap.expansions}")
+    else:
+        with Phase(st, "load"):
+            asta = astar.AStar([fp_nodename], [fp_edgename], [fp_obstename], verbosity=verbosity)
+        asta.stats = st
+        asta.bidirectional = bidirectional
+        asta.labelmax = labelmax
+        asta.plotstep = plotstep
+        if lmfile or numlandmarks > 0:
+            # the csr roadmap is only made when the landmarks have to be built
+            asta.landmarks = landmarks.LoadOrBuild(fp_lmname, lambda: roadmap.FromAStar(asta), numlandmarks,
+                                                   landmarks.FingerprintAStar(asta), verbosity)
+        if deadline > 0:
+            rv = RunAnytime(asta)
+        else:
+            rv = asta.FindPath(firstnode, targetnode, scenename=astarscene,
+                               stepplot=stepplot, finplot=finplot)
+        print("bestpath:", rv)
+        print(f"bestpath cost:{asta.AstarCost(rv):.5f}")
+        print(f"expansions:{asta.expansions}")
+        asta.ShowPlot(plotfile)
+        WriteStats(st)
 
     # Write out the solution node path to "path.csv"
     nodestring = ",".join(rv)
@@ -0,0 +1,228 @@
+# Plotting for AStar and its subclasses, kept out of astar.py so that runs without plots never import matplotlib.
+# The AStar plot methods import this module on first use and pass themselves as asta.
+# Small graphs are drawn with one collection per kind of element and labels. Graphs with more than labelmax
+# nodes are drawn into images: the obstacles and edges once into a background, the nodes as pixel blocks
+# into an overlay that step plots update for the nodes that changed instead of redrawing the graph.
+import matplotlib.pyplot as plt
+import matplotlib.animation as animation
+import matplotlib.collections as collections
+import matplotlib.colors as mcolors
+from matplotlib.backends.backend_agg import FigureCanvasAgg
+from matplotlib.figure import Figure
+import numpy
+
+# Named colors: https://matplotlib.org/stable/gallery/color/named_colors.html
+statcolors = {"open": "lightseagreen", "closed": "darkgreen", "unvisited": "blue"}
+# pixels on the longer side of the images of large graphs, and the side of the pixel block of a node
+rastersize = 1200
+nodepixels = 2
+
+
+def Bounds(asta) -> tuple[float, float, float, float]:
+    xs = [nd["x"] for nd in asta.nodedict.values()]
+    ys = [nd["y"] for nd in asta.nodedict.values()]
+    if not xs:
+        return -0.5, -0.5, 0.5, 0.5
+    return min(xs), min(ys), max(xs), max(ys)
+
+
+def DrawRoadmap(asta, ax, nodestat: dict[str, str]) -> dict:
+    """
+    Draw obstacles, edges and nodes of asta into ax with one collection each, coloured by nodestat.
+    Returns the ids in the order of the node collection and the artists that animations update
+    """
+    xmin, ymin, xmax, ymax = Bounds(asta)
+    borderx = 0.1*(xmax-xmin)
+    bordery = 0.1*(ymax-ymin)
+    ax.set_xlim(xmin-borderx, xmax+borderx)
+    ax.set_ylim(ymin-bordery, ymax+bordery)
+    asta.scale = (xmax-xmin) / 2
+    ax.grid(True, which='both')
+    ids = list(asta.nodedict.keys())
+    labels = len(ids) <= asta.labelmax
+
+    nd = asta.nodedict
+    pairs = [e.split(":") for e in asta.edgecost.keys()]
+    # each undirected edge once
+    pairs = [(n1, n2) for n1, n2 in pairs if n1 < n2]
+    xy = numpy.array([[nd[n]["x"], nd[n]["y"]] for n in ids]).reshape(-1, 2)
+    index = {n: i for i, n in enumerate(ids)}
+    # (E,2,2) array of the segment end points
+    segs = numpy.stack([xy[[index[n1] for n1, _ in pairs]], xy[[index[n2] for _, n2 in pairs]]], axis=1)
+    colors = [statcolors.get(nodestat.get(n, "unvisited"), "black") for n in ids]
+    art = {"ids": ids, "xy": xy, "colors": colors, "labels": labels}
+    if labels:
+        if asta.obst:
+            ax.add_collection(ObstacleCollection(asta, ax.transData))
+        ax.add_collection(collections.LineCollection(segs, colors='green', linewidths=1))
+        for o in asta.obst:
+            ax.text(o["x"], o["y"], o["id"],
+                    fontsize=10, horizontalalignment='center', verticalalignment='center', color='white')
+        for (n1, n2), ((x1, y1), (x2, y2)) in zip(pairs, segs.tolist()):
+            ax.text((x1+x2)/2, (y1+y2)/2, f"{asta.edgecost[f'{n1}:{n2}']:.3f}",
+                    fontsize=10, horizontalalignment='center', verticalalignment='center')
+        rad = 2*asta.scale*0.07
+        art["nodes"] = collections.EllipseCollection(rad, rad, 0.0, units='xy', offsets=xy,
+                                                     offset_transform=ax.transData, facecolors=colors, zorder=3)
+        ax.add_collection(art["nodes"])
+        for n, (x, y) in zip(ids, xy.tolist()):
+            # remove trailing zeros if they are in the label
+            ax.text(x, y, n.replace(".000000", ""), fontsize=10, horizontalalignment='center',
+                    verticalalignment='center', color='white', zorder=4)
+    else:
+        x0, x1 = ax.get_xlim()
+        y0, y1 = ax.get_ylim()
+        scale = rastersize / max(x1-x0, y1-y0)
+        w = max(1, int((x1-x0)*scale))
+        h = max(1, int((y1-y0)*scale))
+        extent = (x0, x1, y0, y1)
+        ax.imshow(RenderBackground(asta, segs, extent, w, h), extent=extent, origin='upper', zorder=1)
+        # top left corner of the pixel block of every node, row 0 is the top of the image
+        art["cols"] = numpy.clip(((xy[:, 0]-x0)*scale).astype(numpy.int64), 0, w-nodepixels)
+        art["rows"] = numpy.clip(((y1-xy[:, 1])*scale).astype(numpy.int64), 0, h-nodepixels)
+        art["overlay"] = numpy.zeros((h, w, 4))
+        art["nodes"] = ax.imshow(art["overlay"], extent=extent, origin='upper', zorder=3)
+        SetNodeColors(art, numpy.arange(len(ids)))
+        ax.set_xlim(x0, x1)
+        ax.set_ylim(y0, y1)
+    art["path"], = ax.plot([], [], color='red', linewidth=2 if labels else 1, zorder=5)
+    return art
+
+
+def ObstacleCollection(asta, transform):
+    oxy = numpy.array([[o["x"], o["y"]] for o in asta.obst])
+    diam = numpy.array([o["diam"] for o in asta.obst])
+    return collections.EllipseCollection(diam, diam, 0.0, units='xy', offsets=oxy, offset_transform=transform,
+                                         color='grey')
+
+
+def RenderBackground(asta, segs, extent, w: int, h: int):
+    """
+    Obstacles and edges drawn once into a w by h RGBA image that covers extent.
+    The edges are a single line broken by nans, a collection would make a path object per edge
+    """
+    fig = Figure(figsize=(w/100, h/100), dpi=100)
+    canvas = FigureCanvasAgg(fig)
+    ax = fig.add_axes((0, 0, 1, 1))
+    ax.set_axis_off()
+    ax.set_xlim(extent[0], extent[1])
+    ax.set_ylim(extent[2], extent[3])
+    if asta.obst:
+        ax.add_collection(ObstacleCollection(asta, ax.transData), autolim=False)
+    line = numpy.full((len(segs), 3, 2), numpy.nan)
+    line[:, :2] = segs
+    line = line.reshape(-1, 2)
+    ax.plot(line[:, 0], line[:, 1], color='green', linewidth=0.3, scalex=False, scaley=False)
+    # agg cannot draw a path this long in one piece
+    with plt.rc_context({"agg.path.chunksize": 10000}):
+        canvas.draw()
+    return numpy.asarray(canvas.buffer_rgba()).copy()
+
+
+def SetNodeColors(art: dict, idx):
+    """
+    Show the colors of the nodes at the positions idx of art["ids"]
+    """
+    if art["labels"]:
+        art["nodes"].set_facecolors(art["colors"])
+        return
+    idx = numpy.asarray(idx, dtype=numpy.int64)
+    rgba = numpy.array([mcolors.to_rgba(art["colors"][i]) for i in idx.tolist()]).reshape(-1, 4)
+    rows = art["rows"][idx]
+    cols = art["cols"][idx]
+    for dr in range(nodepixels):
+        for dc in range(nodepixels):
+            art["overlay"][rows+dr, cols+dc] = rgba
+    art["nodes"].set_data(art["overlay"])
+
+
+def HighlightPath(asta, ax, art: dict, path: list[str], cost, actionline: str):
+    ax.set_title("-".join(path) + f" cost:{cost:.3f}\n{actionline}" if art["labels"]
+                 else f"{len(path)} nodes cost:{cost:.3f}\n{actionline}")
+    art["path"].set_data([asta.nodedict[n]["x"] for n in path], [asta.nodedict[n]["y"] for n in path])
+
+
+def PlotNodesWithNames(asta, iplt: int, isSubplot=True):
+    if isSubplot:
+        ax = asta.fig.add_subplot(asta.nrows, asta.ncols, iplt, aspect='equal')  # type: ignore
+    else:
+        ax = asta.fig.add_subplot(1, 1, 1, aspect='equal')  # type: ignore
+    asta.plotart = DrawRoadmap(asta, ax, asta.nodestat)
+    plt.draw()
+
+
+def HightlightNodesInPath(asta, path: list[str], cost, actionline: str):
+    HighlightPath(asta, plt.gca(), asta.plotart, path, cost, actionline)
+
+
+def SetupPlot(asta, tit: str):
+    asta.iplot = 1
+    asta.fig = plt.figure()
+    asta.fig.suptitle(tit)
+
+
+def Animate(asta) -> tuple[int, object]:
+    """
+    Draw the graph for the steps recorded during a step plot, returns the number of frames and the function
+    that moves the plot to a frame by recolouring the nodes that changed and redrawing the current path.
+    Every plotstep-th step becomes a frame
+    """
+    ax = asta.fig.add_subplot(1, 1, 1, aspect='equal')
+    art = DrawRoadmap(asta, ax, asta.plotstart)
+    index = {n: i for i, n in enumerate(art["ids"])}
+    colors = art["colors"]
+    parent = {}
+    steps = asta.plotsteps
+    state = {"next": 0}
+    stride = max(1, asta.plotstep)
+
+    def Update(k: int):
+        # replay the steps up to frame k, frames only ever move forward
+        last = min(len(steps), (k+1)*stride)
+        changed = []
+        for n, stat, par, _ in steps[state["next"]:last]:
+            changed.append(index[n])
+            colors[changed[-1]] = statcolors.get(stat, "black")
+            if par is not None:
+                parent[n] = par
+        state["next"] = last
+        SetNodeColors(art, changed)
+        n, _, _, actionline = steps[last-1]
+        path = [n]
+        while path[-1] in parent and len(path) <= len(parent):
+            path.append(parent[path[-1]])
+        path.reverse()
+        HighlightPath(asta, ax, art, path, asta.AstarCost(path), actionline)
+        return [art["nodes"], art["path"]]
+
+    return (len(steps) + stride - 1) // stride, Update
+
+
+def ShowPlot(asta, fname: str = ""):
+    """
+    Show the figure, or write it to fname: the last frame to an image file, the whole step plot to a .gif,
+    or to .mp4 and the other formats of ffmpeg if it is installed. Writing works without a display
+    """
+    nframes, update = Animate(asta) if asta.plotsteps else (0, None)
+    ext = fname.rsplit(".", 1)[-1].lower()
+    if nframes > 0 and (not fname or ext not in ("png", "jpg", "jpeg", "svg", "pdf")):
+        # the animation only runs while a reference to it is held
+        asta.anim = animation.FuncAnimation(asta.fig, update, frames=nframes, interval=200, repeat=False)
+    if not fname:
+        plt.show()
+        return
+    if nframes == 0 or ext in ("png", "jpg", "jpeg", "svg", "pdf"):
+        if nframes > 0:
+            # the last frame holds the final state of the search
+            update(nframes-1)
+        asta.fig.savefig(fname)
+    else:
+        if ext == "gif":
+            writer = animation.PillowWriter(fps=5)
+        elif animation.writers.is_available("ffmpeg"):
+            writer = animation.FFMpegWriter(fps=5)
+        else:
+            print(f"Cannot write {fname}: ffmpeg is not installed, use a .gif or an image file")
+            return
+        asta.anim.save(fname, writer=writer)
+    print(f"Plot written to {fname}")
@@ -0,0 +1,226 @@
+import prm
+import argparse
+import contextlib
+import io
+import itertools
+import json
+import math
+import os
+import platform
+import random
+import sys
+import tempfile
+import time
+import tracemalloc
+import numpy
+
+parser = argparse.ArgumentParser(prog='Bench',
+                                 description='Times the roadmap build and query phases on synthetic scenes',
+                                 epilog='Comma separated values of -n2g, -no, -den and -mxl are combined into cases')
+
+parser.add_argument('-n2g', '--nodes_to_gen', type=str, default="1000,3000",
+                    help='PRM nodes to generate, comma separated')
+parser.add_argument('-no', '--numobstacles', type=str, default="100,1000",
+                    help='Obstacles in the scene, comma separated')
+parser.add_argument('-den', '--density', type=str, default="0.2",
+                    help='Fraction of the scene covered by obstacles, comma separated')
+parser.add_argument('-mxl', '--maxlinks', type=str, default="3",
+                    help='Max links to add to a PRM node, comma separated')
+parser.add_argument('-q', '--queries', type=int, default=5,
+                    help='Queries per case, the first goes corner to corner and the rest between random nodes')
+parser.add_argument('-r', '--repeats', type=int, default=1,
+                    help='Timed runs per case, the fastest time of each phase is kept')
+parser.add_argument('-si', '--spatialindex', type=str, default="kdtree", choices=["kdtree", "grid", "none"],
+                    help='Nearest neighbour index used to connect the generated nodes')
+parser.add_argument('-bs', '--bulksample', action='store_true',
+                    help='Draw the samples in NumPy blocks from a seeded numpy Generator')
+parser.add_argument('-nm', '--nomemory', action='store_true',
+                    help='Skip the extra tracemalloc run that measures the peak memory of each phase')
+parser.add_argument('-sd', '--scenedir', type=str, default="",
+                    help='Directory the generated scenes are written to and kept in, a temporary one if empty')
+parser.add_argument('-o', '--output', type=str, default="bench.json",
+                    help='File the results are written to as JSON')
+parser.add_argument('-b', '--baseline', type=str, default="",
+                    help='JSON results of an earlier run to compare against, regressions set the exit status')
+parser.add_argument('-tol', '--tolerance', type=float, default=0.25,
+                    help='Relative slowdown of a phase against the baseline that counts as a regression')
+parser.add_argument('-mt', '--mintime', type=float, default=0.01,
+                    help='Phases that slow down by less than this many seconds are not reported as regressions')
+parser.add_argument('-seed', '--seed', type=int, default=1234,
+                    help='Random seed value')
+parser.add_argument('-v', '--verbose', type=int, default=0,
+                    help='Verbosity level')
+
+
+args = parser.parse_args()
+
+phases = ["load", "sample", "connect", "findpath"]
+
+
+def IntList(s: str) -> list[int]:
+    return [int(v) for v in s.split(",") if v.strip()]
+
+
+def FloatList(s: str) -> list[float]:
+    return [float(v) for v in s.split(",") if v.strip()]
+
+
+def GenScene(dname: str, nobst: int, density: float, seed: int):
+    """
+    Write a scene of nobst equal circles that cover about density of the unit square centred on 0,0,
+    with node 1 in the lower left and node 2 in the upper right corner kept clear of obstacles
+    """
+    rng = random.Random(seed)
+    diam = math.sqrt(4*density/(math.pi*nobst)) if nobst > 0 else 0.0
+    corners = [(-0.45, -0.45), (0.45, 0.45)]
+    os.makedirs(dname, exist_ok=True)
+    with open(f"{dname}/nodes.csv", "w") as f:
+        for k, (x, y) in enumerate(corners):
+            f.write(f"{k+1},{x:.6f},{y:.6f},0\n")
+    with open(f"{dname}/edges.csv", "w") as f:
+        pass
+    with open(f"{dname}/obstacles.csv", "w") as f:
+        k = 0
+        while k < nobst:
+            x = rng.uniform(-0.5, 0.5)
+            y = rng.uniform(-0.5, 0.5)
+            # PRM samples keep one diameter from obstacle centres, the corner nodes get the same clearance
+            if any(math.hypot(x-cx, y-cy) < 1.5*diam for cx, cy in corners):
+                continue
+            f.write(f"{x:.6f},{y:.6f},{diam:.6f}\n")
+            k += 1
+
+
+class PhaseRecorder:
+    """
+    Wall time of each phase and, when tracing, the peak of the memory allocated by python during it
+    """
+
+    def __init__(self, traced: bool):
+        self.traced = traced
+        self.times: dict[str, float] = {}
+        self.peakmb: dict[str, float] = {}
+
+    @contextlib.contextmanager
+    def Phase(self, name: str):
+        if self.traced:
+            tracemalloc.reset_peak()
+            base = tracemalloc.get_traced_memory()[0]
+        t0 = time.perf_counter()
+        yield
+        self.times[name] = time.perf_counter() - t0
+        if self.traced:
+            self.peakmb[name] = (tracemalloc.get_traced_memory()[1] - base)/2**20
+
+
+def RunCase(dname: str, n2g: int, maxlinks: int, traced: bool) -> dict:
+    """
+    Load the scene in dname, build a roadmap of n2g nodes and answer the queries, one PhaseRecorder run
+    """
+    rec = PhaseRecorder(traced)
+    # the constructors print regardless of the verbosity
+    out = sys.stdout if args.verbose > 0 else io.StringIO()
+    with contextlib.redirect_stdout(out):
+        with rec.Phase("load"):
+            prma = prm.PrmGen([f"{dname}/nodes.csv"], [f"{dname}/edges.csv"], [f"{dname}/obstacles.csv"],
+                              verbosity=args.verbose, seed=args.seed, spatialindex=args.spatialindex)
+        with rec.Phase("build"):
+            prma.GenNodesAndEdges(n2g, -0.5, -0.5, 0.5, 0.5, maxlinks, bulk=args.bulksample)
+        rec.times.pop("build")
+        rec.times.update(prma.phasetimes)
+        rng = random.Random(args.seed)
+        ids = sorted(prma.nodedict.keys())
+        queries = ([("1", "2")] + [tuple(rng.sample(ids, 2)) for _ in range(args.queries-1)])[:args.queries]
+        found = 0
+        expansions = 0
+        cost = 0.0
+        with rec.Phase("findpath"):
+            for s, g in queries:
+                rv = prma.FindPath(s, g)
+                expansions += prma.expansions
+                if rv:
+                    found += 1
+                    cost += prma.AstarCost(rv)
+    return {"times": rec.times, "peakmb": rec.peakmb, "nodes": len(prma.nodedict),
+            "edges": len(prma.edgecost)//2, "queries": len(queries), "found": found,
+            "expansions": expansions, "cost": round(cost, 6)}
+
+
+def Compare(results: dict, baseline: dict) -> int:
+    """
+    Print the phase times against the baseline, returns the number of regressions
+    """
+    base = {c["name"]: c for c in baseline["cases"]}
+    nreg = 0
+    print(f"Compared with {args.baseline} ({baseline['meta'].get('date', '?')}):")
+    for case in results["cases"]:
+        old = base.get(case["name"])
+        if old is None:
+            print(f"  {case['name']}: not in the baseline")
+            continue
+        for ph in phases:
+            t = case["times"].get(ph)
+            t0 = old["times"].get(ph)
+            if t is None or t0 is None:
+                continue
+            ratio = t/t0 if t0 > 0 else float("inf")
+            flag = ""
+            if t > t0*(1+args.tolerance) and t - t0 > args.mintime:
+                flag = "  REGRESSION"
+                nreg += 1
+            print(f"  {case['name']:36s} {ph:9s} {t0:9.4f} -> {t:9.4f} secs x{ratio:5.2f}{flag}")
+        if case["found"] != old["found"] or not math.isclose(case["cost"], old["cost"], rel_tol=1e-6):
+            print(f"  {case['name']}: results differ from the baseline, found {old['found']} -> {case['found']} "
+                  f"cost {old['cost']:.5f} -> {case['cost']:.5f}")
+    return nreg
+
+
+def main():
+    if args.verbose > 0:
+        print("bench.py args:")
+        for k, v in vars(args).items():
+            print(f"    {k}:", v)
+    scenedir = args.scenedir or tempfile.mkdtemp(prefix="prmbench")
+    results = {"meta": {"date": time.strftime("%Y-%m-%d %H:%M:%S"), "python": platform.python_version(),
+                        "numpy": numpy.__version__, "platform": platform.platform(),
+                        "spatialindex": args.spatialindex, "bulksample": args.bulksample,
+                        "repeats": args.repeats, "seed": args.seed},
+               "cases": []}
+    print(f"{'case':36s} {'nodes':>7s} {'edges':>8s} " + " ".join(f"{ph:>9s}" for ph in phases) + "  peak MB")
+    for nobst, density in itertools.product(IntList(args.numobstacles), FloatList(args.density)):
+        dname = f"{scenedir}/obst{nobst}_den{density:.2f}"
+        GenScene(dname, nobst, density, args.seed)
+        for n2g, maxlinks in itertools.product(IntList(args.nodes_to_gen), IntList(args.maxlinks)):
+            name = f"n2g{n2g}_obst{nobst}_den{density:.2f}_mxl{maxlinks}"
+            case = None
+            for _ in range(max(1, args.repeats)):
+                run = RunCase(dname, n2g, maxlinks, False)
+                if case is None:
+                    case = run
+                else:
+                    case["times"] = {ph: min(t, run["times"][ph]) for ph, t in case["times"].items()}
+            if not args.nomemory:
+                tracemalloc.start()
+                case["peakmb"] = RunCase(dname, n2g, maxlinks, True)["peakmb"]
+                tracemalloc.stop()
+            case = {"name": name, "nodes_to_gen": n2g, "obstacles": nobst, "density": density,
+                    "maxlinks": maxlinks, **case}
+            results["cases"].append(case)
+            peak = max(case["peakmb"].values(), default=float("nan"))
+            print(f"{name:36s} {case['nodes']:7d} {case['edges']:8d} "
+                  + " ".join(f"{case['times'].get(ph, float('nan')):9.4f}" for ph in phases) + f"  {peak:7.1f}")
+
+    with open(args.output, "w") as f:
+        json.dump(results, f, indent=1)
+    print(f"Results written to {args.output}")
+    if args.baseline:
+        with open(args.baseline) as f:
+            baseline = json.load(f)
+        nreg = Compare(results, baseline)
+        print(f"{nreg} regressions")
+        if nreg > 0:
+            sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,157 @@
+import astar
+import roadmap
+import argparse
+import math
+import random
+import sys
+import time
+
+parser = argparse.ArgumentParser(prog='BenchAstar',
+                                 description='Compares A* expansion throughput of the sorted-list and heap open lists',
+                                 epilog='Text at the bottom of help')
+
+parser.add_argument('-n', '--nodes', type=int, default=10000,
+                    help='Approximate number of nodes in the synthetic roadmap')
+parser.add_argument('-q', '--queries', type=int, default=3,
+                    help='Number of corner to corner queries to time')
+parser.add_argument('-sk', '--skipold', action='store_true',
+                    help='Skip the (slow) sorted-list open list')
+parser.add_argument('-seed', '--seed', type=int, default=1234,
+                    help='Random seed value')
+parser.add_argument('-v', '--verbose', type=int, default=0,
+                    help='Verbosity level')
+
+
+args = parser.parse_args()
+
+
+class SortedListAStar(astar.AStar):
+    """
+    AStar with the original sorted python list open list, kept only as a benchmark reference
+    """
+
+    def AddNodeToSortedOpenList(self, n: str):
+        ntentcost = self.fcost[n]
+        for i in range(len(self.openlist)):
+            if ntentcost < self.fcost[self.openlist[i]]:
+                self.openlist.insert(i, n)
+                self.nodestat[n] = "open"
+                return
+        self.openlist.append(n)
+        self.nodestat[n] = "open"
+
+    def FindPathSortedList(self, start: str, goal: str) -> list[str]:
+        self.ResetSearch()
+        self.gcost[start] = 0.0
+        self.fcost[start] = self.Heuristic(start, goal)
+        self.openlist = [start]
+        self.closedlist = []
+        while len(self.openlist) > 0:
+            n: str = self.openlist[0]
+            self.openlist.remove(n)
+            self.expansions += 1
+            if n == goal:
+                rv = self.GetParentList(n)
+                rv.reverse()
+                return rv
+            for n2 in self.nbr[n]:
+                if n2 in self.closedlist:
+                    continue
+                if n2 not in self.openlist:
+                    self.AssignParent(n2, n, goal)
+                    self.AddNodeToSortedOpenList(n2)
+                else:
+                    if self.gcost[n2] > self.gcost[n] + self.edgecost[f"{n}:{n2}"]:
+                        self.AssignParent(n2, n, goal)
+            self.closedlist.append(n)
+            self.nodestat[n] = "closed"
+        return []
+
+
+def GenGridRoadmap(nnodes: int, seed: int) -> tuple[list[str], list[str], list[str]]:
+    """
+    Generate a jittered grid roadmap with 8-connectivity as node and edge csv lines
+    """
+    rng = random.Random(seed)
+    side = max(2, int(math.sqrt(nnodes)))
+    step = 1.0 / (side-1)
+    xy = {}
+    nodetxt = []
+    for i in range(side):
+        for j in range(side):
+            id = f"{i*side+j+1}"
+            x = -0.5 + i*step + rng.uniform(-0.2, 0.2)*step
+            y = -0.5 + j*step + rng.uniform(-0.2, 0.2)*step
+            xy[id] = (x, y)
+            nodetxt.append(f"{id},{x:.6f},{y:.6f},0\n")
+    edgetxt = []
+    for i in range(side):
+        for j in range(side):
+            id1 = f"{i*side+j+1}"
+            for di, dj in ((1, 0), (0, 1), (1, 1), (1, -1)):
+                ii = i+di
+                jj = j+dj
+                if ii >= side or jj < 0 or jj >= side:
+                    continue
+                id2 = f"{ii*side+jj+1}"
+                x1, y1 = xy[id1]
+                x2, y2 = xy[id2]
+                # inflate costs a bit so the euclidean heuristic is not exact and the search has to work
+                cost = math.sqrt((x2-x1)**2 + (y2-y1)**2) * rng.uniform(1.0, 1.5)
+                edgetxt.append(f"{id1},{id2},{cost:.6f}\n")
+    return nodetxt, edgetxt, [f"{side*side}"]
+
+
+def TimeQueries(findpath, asta: astar.AStar, start: str, goal: str, nqueries: int) -> tuple[float, int, float]:
+    elap = 0.0
+    nexp = 0
+    cost = 0.0
+    for _ in range(nqueries):
+        t0 = time.perf_counter()
+        rv = findpath(start, goal)
+        elap += time.perf_counter() - t0
+        nexp += asta.expansions
+        cost = asta.AstarCost(rv)
+    return elap, nexp, cost
+
+
+def DictEdgeBytes(asta: astar.AStar) -> int:
+    """
+    Rough size of the edgecost and nbr dicts including their keys and values
+    """
+    nbytes = sys.getsizeof(asta.edgecost) + sys.getsizeof(asta.nbr)
+    for k, v in asta.edgecost.items():
+        nbytes += sys.getsizeof(k) + sys.getsizeof(v)
+    for v in asta.nbr.values():
+        nbytes += sys.getsizeof(v)
+    return nbytes
+
+
+def main():
+    nodetxt, edgetxt, last = GenGridRoadmap(args.nodes, args.seed)
+    asta = SortedListAStar(nodetxt, edgetxt, None, verbosity=args.verbose)
+    start = "1"
+    goal = last[0]
+    print(f"Roadmap has {len(asta.nodedict)} nodes and {len(asta.edgecost)//2} edges, query {start} -> {goal}")
+
+    elap, nexp, cost = TimeQueries(asta.FindPath, asta, start, goal, args.queries)
+    print(f"heap open list:   {elap:8.3f} secs {nexp:8d} expansions {nexp/elap:12.0f} exp/sec cost:{cost:.5f}")
+
+    asta.bidirectional = True
+    elap, nexp, cost = TimeQueries(asta.FindPath, asta, start, goal, args.queries)
+    print(f"bidirectional:    {elap:8.3f} secs {nexp:8d} expansions {nexp/elap:12.0f} exp/sec cost:{cost:.5f}")
+    asta.bidirectional = False
+
+    rmap = roadmap.FromAStar(asta)
+    elap, nexp, cost = TimeQueries(rmap.FindPath, rmap, start, goal, args.queries)
+    print(f"csr roadmap:      {elap:8.3f} secs {nexp:8d} expansions {nexp/elap:12.0f} exp/sec cost:{cost:.5f}")
+    nedges = max(1, rmap.NumEdges())
+    print(f"bytes per edge dicts:{DictEdgeBytes(asta)/nedges:.1f} csr:{rmap.NumBytes()/nedges:.1f}")
+
+    if not args.skipold:
+        elap, nexp, cost = TimeQueries(asta.FindPathSortedList, asta, start, goal, args.queries)
+        print(f"sorted list open: {elap:8.3f} secs {nexp:8d} expansions {nexp/elap:12.0f} exp/sec cost:{cost:.5f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,94 @@
+import argparse
+import os
+import shlex
+import statistics
+import subprocess
+import sys
+import time
+
+parser = argparse.ArgumentParser(prog='BenchStart',
+                                 description='Times the cold start of short planner runs and checks what they import',
+                                 epilog='Text at the bottom of help')
+
+parser.add_argument('-c', '--command', type=str, default="astarmain.py -d scene5",
+                    help='Script and arguments to run with this python')
+parser.add_argument('-n', '--runs', type=int, default=10,
+                    help='Number of timed runs')
+parser.add_argument('-mx', '--maxms', type=float, default=0.0,
+                    help='Fail if the median run takes longer than this many milliseconds, 0 does not check')
+parser.add_argument('-nm', '--notmodules', type=str, default="matplotlib",
+                    help='Comma separated top level modules a run without plots must not import')
+parser.add_argument('-t', '--top', type=int, default=10,
+                    help='Number of slowest imports to list')
+parser.add_argument('-v', '--verbose', type=int, default=0,
+                    help='Verbosity level')
+
+
+args = parser.parse_args()
+
+
+def TimeRuns(cmd: list[str], nruns: int) -> list[float]:
+    """
+    Wall time in milliseconds of nruns runs of cmd, after one untimed run that warms the file cache
+    """
+    subprocess.run(cmd, stdout=subprocess.DEVNULL, check=True)
+    rv = []
+    for _ in range(nruns):
+        t0 = time.perf_counter()
+        subprocess.run(cmd, stdout=subprocess.DEVNULL, check=True)
+        rv.append((time.perf_counter() - t0)*1000)
+    return rv
+
+
+def ImportTimes(cmd: list[str]) -> dict[str, int]:
+    """
+    Cumulative import time in microseconds per module from python -X importtime
+    """
+    res = subprocess.run(cmd[:1] + ["-X", "importtime"] + cmd[1:], stdout=subprocess.DEVNULL,
+                         stderr=subprocess.PIPE, text=True, check=True)
+    rv = {}
+    for line in res.stderr.splitlines():
+        if not line.startswith("import time:") or "|" not in line:
+            continue
+        _, cumul, name = line[len("import time:"):].split("|")
+        if cumul.strip().isdigit():
+            rv[name.strip()] = int(cumul)
+    return rv
+
+
+def main():
+    if args.verbose > 0:
+        print("benchstart.py args:")
+        for k, v in vars(args).items():
+            print(f"    {k}:", v)
+    # the scripts plot with matplotlib's own backend choice, headless runs must not need a display
+    os.environ.setdefault("MPLBACKEND", "Agg")
+    cmd = [sys.executable] + shlex.split(args.command)
+    base = TimeRuns([sys.executable, "-c", "pass"], args.runs)
+    numpy = TimeRuns([sys.executable, "-c", "import numpy"], args.runs)
+    runs = TimeRuns(cmd, args.runs)
+    med = statistics.median(runs)
+    print(f"python -c pass:       median {statistics.median(base):7.1f} ms")
+    print(f"python -c import numpy: median {statistics.median(numpy):5.1f} ms")
+    print(f"{args.command}: median {med:7.1f} ms min {min(runs):7.1f} ms max {max(runs):7.1f} ms")
+
+    imports = ImportTimes(cmd)
+    print(f"Slowest imports (cumulative ms):")
+    for name, us in sorted(imports.items(), key=lambda kv: -kv[1])[:args.top]:
+        print(f"    {us/1000:8.1f} {name}")
+
+    failed = False
+    for mod in args.notmodules.split(","):
+        mod = mod.strip()
+        if mod and any(name == mod or name.startswith(mod + ".") for name in imports):
+            print(f"FAIL {mod} was imported")
+            failed = True
+    if args.maxms > 0 and med > args.maxms:
+        print(f"FAIL median {med:.1f} ms is over {args.maxms:.1f} ms")
+        failed = True
+    if failed:
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,448 @@
+import collections
+import math
+import numpy
+
+
+class ObstacleGrid:
+    """
+    Uniform grid broad phase over the circular obstacles.
+
+    Every obstacle is registered in all cells overlapped by the square of half
+    width diam around its center, which bounds both the circle (radius diam/2)
+    used by the segment test and the sample rejection zone (distance < diam).
+    Queries return the obstacles whose bounds overlap the query box so only
+    those need the exact test.
+    """
+
+    def __init__(self, obst: list[dict[str, float]], cellsize: float = 0.0):
+        """
+        Constructor
+        :param obst: obstacles as dicts with x, y and diam
+        :param cellsize: edge length of a cell, twice the median obstacle diameter if 0
+        """
+        if cellsize <= 0:
+            cellsize = 1.0
+            if len(obst) > 0:
+                diams = sorted(o["diam"] for o in obst)
+                cellsize = 2*diams[len(diams)//2]
+                # keep the cell count reasonable for scenes with a few tiny obstacles spread far apart
+                xs = [o["x"] for o in obst]
+                ys = [o["y"] for o in obst]
+                extent = max(max(xs)-min(xs), max(ys)-min(ys))
+                cellsize = max(cellsize, extent/1024, 1e-9)
+        self.cellsize = cellsize
+        self.cells: dict[tuple[int, int], list[dict[str, float]]] = {}
+        self.nobst = 0
+        for o in obst:
+            self.Insert(o)
+
+    def CellRange(self, xmin: float, ymin: float, xmax: float, ymax: float):
+        cs = self.cellsize
+        return math.floor(xmin/cs), math.floor(ymin/cs), math.floor(xmax/cs), math.floor(ymax/cs)
+
+    def Insert(self, o: dict[str, float]):
+        d = o["diam"]
+        i0, j0, i1, j1 = self.CellRange(o["x"]-d, o["y"]-d, o["x"]+d, o["y"]+d)
+        for i in range(i0, i1+1):
+            for j in range(j0, j1+1):
+                if (i, j) not in self.cells:
+                    self.cells[(i, j)] = []
+                self.cells[(i, j)].append(o)
+        self.nobst += 1
+
+    def Remove(self, o: dict[str, float]):
+        d = o["diam"]
+        i0, j0, i1, j1 = self.CellRange(o["x"]-d, o["y"]-d, o["x"]+d, o["y"]+d)
+        for i in range(i0, i1+1):
+            for j in range(j0, j1+1):
+                lst = self.cells.get((i, j), [])
+                for k, oo in enumerate(lst):
+                    if oo is o:
+                        del lst[k]
+                        break
+                if (i, j) in self.cells and len(lst) == 0:
+                    del self.cells[(i, j)]
+        self.nobst -= 1
+
+    def QueryBox(self, xmin: float, ymin: float, xmax: float, ymax: float) -> list[dict[str, float]]:
+        """
+        Obstacles registered in the cells overlapped by the box, each returned once
+        """
+        i0, j0, i1, j1 = self.CellRange(xmin, ymin, xmax, ymax)
+        if (i1-i0+1)*(j1-j0+1) > len(self.cells):
+            # the box covers more cells than are occupied, walk the occupied ones instead
+            cells = [lst for (i, j), lst in self.cells.items() if i0 <= i <= i1 and j0 <= j <= j1]
+        else:
+            cells = [self.cells[(i, j)] for i in range(i0, i1+1) for j in range(j0, j1+1) if (i, j) in self.cells]
+        if len(cells) == 1:
+            return cells[0]
+        seen = {}
+        for lst in cells:
+            for o in lst:
+                seen[id(o)] = o
+        return list(seen.values())
+
+    def SegmentCells(self, x1: float, y1: float, x2: float, y2: float):
+        """
+        Yield every cell the segment passes through, column by column
+        """
+        return SegmentCells(self.cellsize, x1, y1, x2, y2)
+
+    def SegmentCandidates(self, x1: float, y1: float, x2: float, y2: float) -> list[dict[str, float]]:
+        """
+        Obstacles registered in the cells the segment passes through, each returned once
+        """
+        seen = {}
+        for c in self.SegmentCells(x1, y1, x2, y2):
+            lst = self.cells.get(c)
+            if lst:
+                for o in lst:
+                    seen[id(o)] = o
+        return list(seen.values())
+
+    def SegmentsCandidates(self, x1, y1, x2, y2) -> list[dict[str, float]]:
+        """
+        Union of the SegmentCandidates of several segments
+        """
+        seen = {}
+        for sx1, sy1, sx2, sy2 in zip(x1, y1, x2, y2):
+            for c in self.SegmentCells(sx1, sy1, sx2, sy2):
+                lst = self.cells.get(c)
+                if lst:
+                    for o in lst:
+                        seen[id(o)] = o
+        return list(seen.values())
+
+    def PointCandidates(self, x: float, y: float) -> list[dict[str, float]]:
+        """
+        Obstacles that may be closer than one diameter to the point
+        """
+        return self.cells.get((math.floor(x/self.cellsize), math.floor(y/self.cellsize)), [])
+
+
+def SegmentCells(cs: float, x1: float, y1: float, x2: float, y2: float):
+    """
+    Yield every cell of a grid with cell size cs that the segment passes through, column by column
+    """
+    if x1 > x2:
+        x1, y1, x2, y2 = x2, y2, x1, y1
+    i0 = math.floor(x1/cs)
+    i1 = math.floor(x2/cs)
+    dx = x2 - x1
+    for i in range(i0, i1+1):
+        # part of the segment that lies in column i
+        if dx > 0:
+            ya = y1 + (max(x1, i*cs) - x1) / dx * (y2-y1)
+            yb = y1 + (min(x2, (i+1)*cs) - x1) / dx * (y2-y1)
+        else:
+            ya, yb = y1, y2
+        j0 = math.floor(min(ya, yb)/cs)
+        j1 = math.floor(max(ya, yb)/cs)
+        for j in range(j0, j1+1):
+            yield i, j
+
+
+class EdgeGrid:
+    """
+    Uniform grid over roadmap edges, every edge is registered in the cells its segment passes through.
+
+    Used to find the edges that may be blocked by a new obstacle without testing the whole roadmap,
+    the candidates still need the exact segment test.
+    """
+
+    def __init__(self, cellsize: float):
+        """
+        Constructor
+        :param cellsize: edge length of a cell, about the typical edge length keeps the lists short
+        """
+        self.cellsize = cellsize
+        # dicts rather than sets so queries return the edges in a reproducible order
+        self.cells: dict[tuple[int, int], dict[tuple[str, str], None]] = {}
+        self.nedges = 0
+
+    def Insert(self, n1: str, n2: str, x1: float, y1: float, x2: float, y2: float):
+        key = (n1, n2) if n1 < n2 else (n2, n1)
+        for c in SegmentCells(self.cellsize, x1, y1, x2, y2):
+            if c not in self.cells:
+                self.cells[c] = {}
+            self.cells[c][key] = None
+        self.nedges += 1
+
+    def Remove(self, n1: str, n2: str, x1: float, y1: float, x2: float, y2: float):
+        key = (n1, n2) if n1 < n2 else (n2, n1)
+        for c in SegmentCells(self.cellsize, x1, y1, x2, y2):
+            keys = self.cells.get(c)
+            if keys is not None:
+                keys.pop(key, None)
+                if len(keys) == 0:
+                    del self.cells[c]
+        self.nedges -= 1
+
+    def QueryBox(self, xmin: float, ymin: float, xmax: float, ymax: float) -> list[tuple[str, str]]:
+        """
+        Node pairs of the edges registered in the cells overlapped by the box, each returned once
+        """
+        cs = self.cellsize
+        i0, j0, i1, j1 = math.floor(xmin/cs), math.floor(ymin/cs), math.floor(xmax/cs), math.floor(ymax/cs)
+        seen = {}
+        for i in range(i0, i1+1):
+            for j in range(j0, j1+1):
+                for key in self.cells.get((i, j), ()):
+                    seen[key] = True
+        return list(seen)
+
+
+class CollisionChecker:
+    """
+    Batched collision checks of points and segments against all circular obstacles using NumPy broadcasting.
+
+    The tests give the same answers as PrmGen.LineCircleIntersect and the sample
+    rejection in PrmGen.GenNodesAndEdges, work is done in chunks so that no more
+    than maxelems segment/obstacle pairs are held in memory at once.
+    """
+
+    maxelems: int = 1 << 20
+    # below this many obstacles testing every point against all of them beats bucketing the points by cell
+    directobst: int = 32
+
+    def __init__(self, obst: list[dict[str, float]], grid: ObstacleGrid = None, maxelems: int = 0):
+        """
+        Constructor
+        :param obst: obstacles as dicts with x, y and diam
+        :param grid: optional broad phase over the same obstacles
+        :param maxelems: bound on the number of segment/obstacle pairs per chunk
+        """
+        if maxelems > 0:
+            self.maxelems = maxelems
+        self.grid = grid
+        self.Update(obst)
+
+    def Update(self, obst: list[dict[str, float]]):
+        """
+        Refresh the obstacle arrays after self.obst was changed
+        """
+        self.ox = numpy.array([o["x"] for o in obst], dtype=numpy.float64)
+        self.oy = numpy.array([o["y"] for o in obst], dtype=numpy.float64)
+        self.diam = numpy.array([o["diam"] for o in obst], dtype=numpy.float64)
+        self.rad = self.diam/2
+
+    def NumObst(self) -> int:
+        return len(self.ox)
+
+    def SegmentsClear(self, x1, y1, x2, y2, ox=None, oy=None, rad=None):
+        """
+        Return a bool array that is true for the segments (x1,y1)-(x2,y2) that do not intersect any obstacle
+        ox, oy and rad can restrict the test to a subset of the obstacles
+        """
+        x1 = numpy.asarray(x1, dtype=numpy.float64).reshape(-1)
+        y1 = numpy.asarray(y1, dtype=numpy.float64).reshape(-1)
+        x2 = numpy.asarray(x2, dtype=numpy.float64).reshape(-1)
+        y2 = numpy.asarray(y2, dtype=numpy.float64).reshape(-1)
+        nseg = len(x1)
+        if ox is None and self.grid is not None and nseg > 0:
+            # only test the obstacles registered in the cells the segments pass through
+            near = self.grid.SegmentsCandidates(x1.tolist(), y1.tolist(), x2.tolist(), y2.tolist())
+            if len(near) < self.NumObst():
+                ox, oy, rad = ObstArrays(near)
+        if ox is None:
+            ox, oy, rad = self.ox, self.oy, self.rad
+        clear = numpy.ones(nseg, dtype=bool)
+        if len(ox) == 0 or nseg == 0:
+            return clear
+        chunk = max(1, self.maxelems // len(ox))
+        for lo in range(0, nseg, chunk):
+            hi = min(nseg, lo+chunk)
+            sx1 = x1[lo:hi, None]
+            sy1 = y1[lo:hi, None]
+            dx = x2[lo:hi, None] - sx1
+            dy = y2[lo:hi, None] - sy1
+            a = dx*dx + dy*dy
+            # degenerate segments are tested as points
+            a = numpy.where(a > 0, a, 1.0)
+            t = (dx*(ox-sx1) + dy*(oy-sy1)) / a
+            x = sx1 + t*dx
+            y = sy1 + t*dy
+            dist = numpy.sqrt((x-ox)**2 + (y-oy)**2)
+            hit = (t >= 0) & (t <= 1) & (dist <= rad)
+            clear[lo:hi] = ~hit.any(axis=1)
+        return clear
+
+    def PointsClear(self, x, y):
+        """
+        Return a bool array that is true for the points that are at least one diameter away from every obstacle center
+        """
+        x = numpy.asarray(x, dtype=numpy.float64).reshape(-1)
+        y = numpy.asarray(y, dtype=numpy.float64).reshape(-1)
+        npts = len(x)
+        clear = numpy.ones(npts, dtype=bool)
+        if self.NumObst() == 0 or npts == 0:
+            return clear
+        if self.grid is not None and self.NumObst() > self.directobst:
+            return self.PointsClearGrid(x, y)
+        # one obstacle at a time over a chunk of points with in-place temporaries,
+        # this touches much less memory than a points x obstacles matrix
+        chunk = self.maxelems
+        for lo in range(0, npts, chunk):
+            hi = min(npts, lo+chunk)
+            cx = x[lo:hi]
+            cy = y[lo:hi]
+            cclear = clear[lo:hi]
+            tmp = numpy.empty(hi-lo)
+            tmp2 = numpy.empty(hi-lo)
+            for ox, oy, diam in zip(self.ox.tolist(), self.oy.tolist(), self.diam.tolist()):
+                numpy.subtract(cx, ox, out=tmp)
+                numpy.multiply(tmp, tmp, out=tmp)
+                numpy.subtract(cy, oy, out=tmp2)
+                numpy.multiply(tmp2, tmp2, out=tmp2)
+                numpy.add(tmp, tmp2, out=tmp)
+                numpy.sqrt(tmp, out=tmp)
+                cclear &= tmp >= diam
+        return clear
+
+    def PointsClearGrid(self, x, y):
+        """
+        PointsClear that buckets the points by grid cell and tests each bucket against the obstacles of its cell
+        """
+        clear = numpy.ones(len(x), dtype=bool)
+        cs = self.grid.cellsize
+        ci = numpy.floor(x/cs).astype(numpy.int64)
+        cj = numpy.floor(y/cs).astype(numpy.int64)
+        # one sort on a combined cell key is cheaper than a lexsort on both
+        cjmin = cj.min()
+        key = ci*(cj.max()-cjmin+1) + (cj-cjmin)
+        order = numpy.argsort(key)
+        key = key[order]
+        ci = ci[order]
+        cj = cj[order]
+        starts = numpy.flatnonzero(numpy.concatenate([[True], key[1:] != key[:-1]]))
+        ends = numpy.append(starts[1:], len(order))
+        for lo, hi, i, j in zip(starts.tolist(), ends.tolist(), ci[starts].tolist(), cj[starts].tolist()):
+            near = self.grid.cells.get((i, j))
+            if not near:
+                continue
+            ox, oy, rad = ObstArrays(near)
+            chunk = max(1, self.maxelems // len(near))
+            for clo in range(lo, hi, chunk):
+                idx = order[clo:min(hi, clo+chunk)]
+                d2o = numpy.sqrt((x[idx, None]-ox)**2 + (y[idx, None]-oy)**2)
+                clear[idx] = ~(d2o < 2*rad).any(axis=1)
+        return clear
+
+
+class PairCache:
+    """
+    Bounded LRU cache of collision results keyed on unordered node pairs, both clear and blocked outcomes are kept.
+
+    With a cell size the entries put with their segment are also registered in the grid cells it passes through,
+    so dropping the results an obstacle change can affect only visits the entries near the obstacle.
+    """
+
+    def __init__(self, maxsize: int = 1 << 16, cellsize: float = 0.0):
+        """
+        Constructor
+        :param maxsize: number of pairs kept before the least recently used ones are evicted, 0 disables the cache
+        :param cellsize: edge length of the cells the entries are registered in, 0 keeps no cells
+        """
+        self.maxsize = maxsize
+        self.entries: collections.OrderedDict[tuple, bool] = collections.OrderedDict()
+        self.cellsize = cellsize
+        # entries put without a segment are kept under the cell None, which every Drop visits
+        self.cells: dict[tuple[int, int], dict[tuple, None]] = {}
+        self.cellsof: dict[tuple, list] = {}
+        # bumped when a node moves or goes away, its old entries no longer match and age out of the LRU order
+        self.epoch: dict[str, int] = {}
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def Key(self, n1: str, n2: str) -> tuple:
+        ep = self.epoch
+        if n1 < n2:
+            return (n1, n2, ep.get(n1, 0), ep.get(n2, 0))
+        return (n2, n1, ep.get(n2, 0), ep.get(n1, 0))
+
+    def Get(self, n1: str, n2: str):
+        """
+        Cached result for the pair, None if it is not cached
+        """
+        key = self.Key(n1, n2)
+        rv = self.entries.get(key)
+        if rv is None:
+            self.misses += 1
+            return None
+        self.entries.move_to_end(key)
+        self.hits += 1
+        return rv
+
+    def Put(self, n1: str, n2: str, clear: bool, seg: tuple = None):
+        """
+        Cache the result for the pair, seg is the x1,y1,x2,y2 of its segment
+        """
+        if self.maxsize <= 0:
+            return
+        key = self.Key(n1, n2)
+        if key in self.entries:
+            self.entries.move_to_end(key)
+        elif self.cellsize > 0:
+            cells = list(SegmentCells(self.cellsize, *seg)) if seg is not None else [None]
+            self.cellsof[key] = cells
+            for c in cells:
+                if c not in self.cells:
+                    self.cells[c] = {}
+                self.cells[c][key] = None
+        self.entries[key] = clear
+        if len(self.entries) > self.maxsize:
+            key, _ = self.entries.popitem(last=False)
+            self.Unregister(key)
+            self.evictions += 1
+
+    def Unregister(self, key: tuple):
+        for c in self.cellsof.pop(key, ()):
+            keys = self.cells[c]
+            del keys[key]
+            if len(keys) == 0:
+                del self.cells[c]
+
+    def Forget(self, n: str):
+        """
+        Invalidate every cached pair that node n is part of
+        """
+        self.epoch[n] = self.epoch.get(n, 0) + 1
+
+    def Clear(self):
+        self.entries.clear()
+        self.cells.clear()
+        self.cellsof.clear()
+
+    def Drop(self, clear: bool, box: tuple = None):
+        """
+        Drop the cached results equal to clear, used when an obstacle change can only invalidate one outcome.
+        With a box xmin,ymin,xmax,ymax and a cell size only the entries whose segment passes the cells of the
+        box are dropped, the others cannot touch an obstacle inside it
+        """
+        if box is None or self.cellsize <= 0:
+            near = self.entries
+        else:
+            cs = self.cellsize
+            near = dict(self.cells.get(None, {}))
+            for i in range(math.floor(box[0]/cs), math.floor(box[2]/cs)+1):
+                for j in range(math.floor(box[1]/cs), math.floor(box[3]/cs)+1):
+                    near.update(self.cells.get((i, j), {}))
+        for key in [key for key in near if self.entries.get(key) == clear]:
+            del self.entries[key]
+            self.Unregister(key)
+
+    def Stats(self) -> str:
+        nlook = max(1, self.hits + self.misses)
+        return (f"collision cache size:{len(self.entries)}/{self.maxsize} hits:{self.hits} misses:{self.misses} "
+                f"hitrate:{self.hits/nlook:.3f} evictions:{self.evictions}")
+
+
+def ObstArrays(obst: list[dict[str, float]]):
+    """
+    x, y and radius arrays of a list of obstacles
+    """
+    ox = numpy.array([o["x"] for o in obst], dtype=numpy.float64)
+    oy = numpy.array([o["y"] for o in obst], dtype=numpy.float64)
+    rad = numpy.array([o["diam"] for o in obst], dtype=numpy.float64)/2
+    return ox, oy, rad
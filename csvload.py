@@ -0,0 +1,220 @@
+import io
+import itertools
+import os
+import numpy
+
+# bytes read per block from a file and lines per block from a list of lines,
+# bounds the temporaries held while converting a large file
+blockbytes = 1 << 22
+chunklines = 1 << 16
+
+
+class LoadReport:
+    """
+    Aggregated record of the rows that were skipped while loading csv files, replaces a print per bad line
+    """
+
+    maxexamples: int = 5
+
+    def __init__(self):
+        self.counts: dict[str, int] = {}
+        self.examples: dict[str, list[str]] = {}
+
+    def Add(self, kind: str, where: str):
+        self.counts[kind] = self.counts.get(kind, 0) + 1
+        lst = self.examples.setdefault(kind, [])
+        if len(lst) < self.maxexamples:
+            lst.append(where)
+
+    def NumErrors(self) -> int:
+        return sum(self.counts.values())
+
+    def Print(self):
+        for kind, cnt in self.counts.items():
+            more = ", ..." if cnt > len(self.examples[kind]) else ""
+            print(f"Error {cnt} {kind}: {', '.join(self.examples[kind])}{more}")
+
+
+def IterBlocks(src):
+    """
+    Yield blocks of text that hold whole lines, each ending in a newline, from a file name or an iterable of lines
+    """
+    if isinstance(src, str):
+        if not os.path.isfile(src):
+            return
+        with open(src) as f:
+            rest = ""
+            while True:
+                data = f.read(blockbytes)
+                if not data:
+                    break
+                data = rest + data
+                cut = data.rfind("\n") + 1
+                rest = data[cut:]
+                if cut > 0:
+                    yield data[:cut]
+            if rest:
+                yield rest + "\n"
+        return
+    src = iter(src)
+    while True:
+        lines = list(itertools.islice(src, chunklines))
+        if len(lines) == 0:
+            return
+        yield "".join(line if line.endswith("\n") else line + "\n" for line in lines)
+
+
+def IterChunks(src, fname: str, ncols: int, report: LoadReport):
+    """
+    Yield (text, width) for each block of src, text holds the rows with ncols fields and width bounds their length
+    Comment and blank lines are dropped, rows with the wrong number of fields are recorded in report
+    """
+    lineno = 0
+    for text in IterBlocks(src):
+        # count the commas of every line at once, only blocks with a bad line are split line by line
+        b = numpy.frombuffer(text.encode(), dtype=numpy.uint8)
+        ends = numpy.flatnonzero(b == ord("\n"))
+        starts = numpy.concatenate([[0], ends[:-1]+1])
+        ncomma = numpy.diff(numpy.searchsorted(numpy.flatnonzero(b == ord(",")), ends), prepend=0)
+        good = (ncomma == ncols-1) & (b[starts] != ord("#"))
+        width = max(1, int((ends-starts).max()))
+        if not good.all():
+            lines = text.split("\n")
+            for k in numpy.flatnonzero(~good).tolist():
+                line = lines[k]
+                if line.strip() and not line.startswith("#"):
+                    report.Add(f"rows without {ncols} fields", f"{fname}:{lineno+k+1}")
+            text = "".join(lines[k] + "\n" for k in numpy.flatnonzero(good).tolist())
+        lineno += len(ends)
+        if text:
+            yield text, width
+
+
+def FloatColumn(strs: list[str], bad: numpy.ndarray):
+    """
+    Convert the strings to a float array, entries that do not parse are flagged in bad and set to 0
+    """
+    vals = numpy.zeros(len(strs))
+    for k, s in enumerate(strs):
+        try:
+            vals[k] = float(s)
+        except ValueError:
+            bad[k] = True
+    return vals
+
+
+def ParseRows(text: str, fname: str, ncols: int, strcols: int, width: int, report: LoadReport):
+    """
+    Parse rows of ncols fields, returns the first strcols columns as lists of str and the others as a float array
+    """
+    dtype = [(f"f{c}", f"U{width}" if c < strcols else "f8") for c in range(ncols)]
+    try:
+        arr = numpy.loadtxt(io.StringIO(text), delimiter=",", dtype=dtype, comments=None, ndmin=1)
+        return [arr[f"f{c}"].tolist() for c in range(strcols)], \
+            numpy.column_stack([arr[f"f{c}"] for c in range(strcols, ncols)])
+    except ValueError:
+        pass
+    # only a block with a malformed number pays for converting field by field
+    flat = text[:-1].replace("\n", ",").split(",")
+    cols = [flat[c::ncols] for c in range(ncols)]
+    bad = numpy.zeros(len(cols[0]), dtype=bool)
+    vals = numpy.column_stack([FloatColumn(cols[c], bad) for c in range(strcols, ncols)])
+    for k in numpy.flatnonzero(bad).tolist():
+        report.Add("rows with a field that is not a number", f"{fname}:{','.join(col[k] for col in cols)}")
+    keep = (~bad).tolist()
+    return [list(itertools.compress(cols[c], keep)) for c in range(strcols)], vals[~bad]
+
+
+def ReadTable(src, fname: str, ncols: int, strcols: int, report: LoadReport):
+    """
+    Read a csv table whose first strcols fields are strings and the remaining ones numbers
+    Returns the string columns as lists and the numeric ones as an (n,ncols-strcols) float array
+    """
+    if isinstance(src, str):
+        fname = src
+    strout = [[] for _ in range(strcols)]
+    numout = []
+    for text, width in IterChunks(src, fname, ncols, report):
+        strs, vals = ParseRows(text, fname, ncols, strcols, width, report)
+        for c in range(strcols):
+            strout[c].extend(strs[c])
+        numout.append(vals)
+    if numout:
+        nums = numpy.concatenate(numout)
+    else:
+        nums = numpy.zeros((0, ncols-strcols))
+    return strout, nums
+
+
+def ReadNodes(src, report: LoadReport):
+    """
+    Read id,x,y,cost node lines, returns the ids, an (n,2) coordinate array and the cost array
+    """
+    (ids,), nums = ReadTable(src, "nodes", 4, 1, report)
+    return ids, nums[:, 0:2], nums[:, 2]
+
+
+def ReadObstacles(src, report: LoadReport):
+    """
+    Read x,y,diam obstacle lines into an (m,3) array
+    """
+    _, nums = ReadTable(src, "obstacles", 3, 0, report)
+    return nums
+
+
+def IntIds(names: list[str]):
+    """
+    int64 values of names if every name is a plain decimal integer such as PrmGen writes, None otherwise
+    """
+    try:
+        vals = numpy.array(names, dtype=numpy.int64)
+    except (ValueError, OverflowError):
+        return None
+    # "01", "+1" or " 1" parse as 1 but are different ids, so the length must match the digit count
+    lens = numpy.fromiter(map(len, names), dtype=numpy.int64, count=len(names))
+    ndigits = numpy.searchsorted(10**numpy.arange(1, 19), numpy.abs(vals), side="right") + 1 + (vals < 0)
+    if (lens != ndigits).any():
+        return None
+    return vals
+
+
+def ResolveIds(known: list[str], names: list[str]):
+    """
+    Index into known of every entry of names in one vectorized lookup, -1 for names that are not in known
+    """
+    if len(names) == 0:
+        return numpy.zeros(0, dtype=numpy.int64)
+    if len(known) == 0:
+        return numpy.full(len(names), -1, dtype=numpy.int64)
+    # integer ids are searched as numbers, which is several times faster than comparing strings
+    karr = IntIds(known)
+    narr = IntIds(names) if karr is not None else None
+    if narr is None:
+        karr = numpy.array(known)
+        narr = numpy.array(names)
+    elif karr.min() >= 0 and karr.max() < 4*len(karr):
+        # dense integer ids, such as the 1..n of PrmGen, resolve through a lookup table
+        table = numpy.full(int(karr.max())+1, -1, dtype=numpy.int64)
+        table[karr[::-1]] = numpy.arange(len(karr)-1, -1, -1)
+        inrange = (narr >= 0) & (narr < len(table))
+        return numpy.where(inrange, table[numpy.where(inrange, narr, 0)], -1)
+    order = numpy.argsort(karr, kind="stable")
+    skeys = karr[order]
+    pos = numpy.minimum(numpy.searchsorted(skeys, narr), len(skeys)-1)
+    return numpy.where(skeys[pos] == narr, order[pos], -1)
+
+
+def ReadEdges(src, known: list[str], report: LoadReport):
+    """
+    Read n1,n2,cost edge lines and resolve both endpoints against the node ids in known
+    Returns the endpoint index arrays and the cost array, edges with an unknown endpoint are left out
+    """
+    (n1, n2), nums = ReadTable(src, "edges", 3, 2, report)
+    ii = ResolveIds(known, n1 + n2)
+    i1 = ii[:len(n1)]
+    i2 = ii[len(n1):]
+    ok = (i1 >= 0) & (i2 >= 0)
+    if not ok.all():
+        for k in numpy.flatnonzero(~ok).tolist():
+            report.Add("edges with an endpoint that is not a node", f'"{n1[k]}","{n2[k]}"')
+    return i1[ok], i2[ok], nums[ok, 0]
@@ -0,0 +1,177 @@
+import heapq
+import math
+import numpy
+import os
+import roadmap
+
+
+class LandmarkTable:
+    """
+    Exact graph distances from a few landmark nodes to every roadmap node, for the ALT heuristic.
+
+    For every landmark L the triangle inequality gives |d(L,goal) - d(L,n)| <= d(n,goal),
+    the largest of these bounds is a consistent heuristic that, unlike the euclidean one,
+    knows about the detours obstacles force. dist is an (N,L) array whose row i holds the
+    distances of node ids[i] to the landmarks, inf where a landmark cannot be reached.
+    The distances are only valid for the roadmap they were computed on, fingerprint
+    identifies that roadmap so stale tables can be detected when they are loaded.
+    """
+
+    def __init__(self, ids: list[str], landmarks: list[str], dist, fingerprint: tuple[int, int, float]):
+        """
+        Constructor
+        :param ids: node ids, ids[i] is the node of row i of dist
+        :param landmarks: ids of the landmark nodes, one per column of dist
+        :param dist: (N,L) array of graph distances
+        :param fingerprint: node count, edge count and summed edge cost of the roadmap, see Fingerprint
+        """
+        self.ids = list(ids)
+        self.index = {id: i for i, id in enumerate(self.ids)}
+        self.landmarks = list(landmarks)
+        self.dist = numpy.asarray(dist, dtype=numpy.float64).reshape(len(self.ids), len(self.landmarks))
+        self.fingerprint = fingerprint
+        # the goal of the last lookup and its row, one tuple so searches in other threads never see a mixed pair
+        self.goalrow = (None, None)
+
+    def NumLandmarks(self) -> int:
+        return len(self.landmarks)
+
+    def LowerBound(self, n: str, goal: str) -> float:
+        """
+        ALT lower bound on the graph distance from n to goal, 0 if either node is not in the table
+        """
+        lastgoal, goalrow = self.goalrow
+        if goal != lastgoal:
+            i = self.index.get(goal)
+            goalrow = None if i is None else self.dist[i]
+            self.goalrow = (goal, goalrow)
+        i = self.index.get(n)
+        if i is None or goalrow is None or len(self.landmarks) == 0:
+            return 0.0
+        # fmax skips the nan of landmarks that reach neither node
+        h = float(numpy.fmax.reduce(numpy.abs(self.dist[i] - goalrow)))
+        return h if h > 0 else 0.0
+
+    def Aligned(self, ids: list[str]):
+        """
+        Rows of dist in the order of ids, nan rows for ids that are not in the table
+        """
+        rows = numpy.array([self.index.get(id, -1) for id in ids], dtype=numpy.int64)
+        rv = self.dist[numpy.maximum(rows, 0)]
+        rv[rows < 0] = numpy.nan
+        return rv
+
+    def Matches(self, fingerprint: tuple[int, int, float]) -> bool:
+        """
+        True if the table was computed on a roadmap with this fingerprint
+        """
+        nn, ne, csum = self.fingerprint
+        return nn == fingerprint[0] and ne == fingerprint[1] and math.isclose(csum, fingerprint[2], rel_tol=1e-9)
+
+    def Save(self, fname: str):
+        # through a file object so numpy does not append .npz to the name
+        with open(fname, "wb") as f:
+            numpy.savez(f, ids=numpy.array(self.ids), landmarks=numpy.array(self.landmarks), dist=self.dist,
+                        fingerprint=numpy.array(self.fingerprint, dtype=numpy.float64))
+
+
+def Load(fname: str, verbosity: int = 0) -> LandmarkTable:
+    """
+    Read a table written by LandmarkTable.Save
+    """
+    with numpy.load(fname) as data:
+        nn, ne, csum = data["fingerprint"].tolist()
+        table = LandmarkTable(data["ids"].tolist(), data["landmarks"].tolist(), data["dist"],
+                              (int(nn), int(ne), csum))
+    if verbosity > 0:
+        print(f"Loaded {table.NumLandmarks()} landmarks for {len(table.ids)} nodes from {fname}")
+    return table
+
+
+def Fingerprint(rmap: roadmap.CsrRoadmap) -> tuple[int, int, float]:
+    return rmap.NumNodes(), rmap.NumEdges(), float(rmap.costs.sum())/2
+
+
+def FingerprintAStar(asta) -> tuple[int, int, float]:
+    """
+    Fingerprint of the dict based graph of an AStar or PrmGen, the same as that of its CsrRoadmap
+    """
+    return len(asta.nodedict), len(asta.edgecost)//2, sum(asta.edgecost.values())/2
+
+
+def DijkstraAll(rmap: roadmap.CsrRoadmap, s: int):
+    """
+    Graph distance from node index s to every node, inf for the nodes that cannot be reached
+    """
+    dist = numpy.full(rmap.NumNodes(), numpy.inf)
+    closed = numpy.zeros(rmap.NumNodes(), dtype=bool)
+    dist[s] = 0.0
+    heap = [(0.0, s)]
+    while heap:
+        d, n = heapq.heappop(heap)
+        if closed[n]:
+            continue
+        closed[n] = True
+        nb, c = rmap.Neighbours(n)
+        newdist = d + c
+        better = newdist < dist[nb]
+        if not better.any():
+            continue
+        nb = nb[better]
+        newdist = newdist[better]
+        dist[nb] = newdist
+        for nd, n2 in zip(newdist.tolist(), nb.tolist()):
+            heapq.heappush(heap, (nd, n2))
+    return dist
+
+
+def Build(rmap: roadmap.CsrRoadmap, nlandmarks: int, verbosity: int = 0) -> LandmarkTable:
+    """
+    Pick nlandmarks landmarks by farthest point selection on the graph distance and compute their tables.
+    The first landmark is the node farthest from node 0, each next one the node farthest from all chosen ones,
+    a node that none of them reaches counts as farthest so every component gets a landmark
+    """
+    nn = rmap.NumNodes()
+    nlandmarks = min(nlandmarks, nn)
+    cols = []
+    chosen = []
+    if nlandmarks > 0:
+        mindist = DijkstraAll(rmap, 0)
+    while len(chosen) < nlandmarks:
+        far = numpy.where(numpy.isinf(mindist), numpy.finfo(numpy.float64).max, mindist)
+        far[chosen] = -1.0
+        lm = int(numpy.argmax(far))
+        d = DijkstraAll(rmap, lm)
+        chosen.append(lm)
+        cols.append(d)
+        mindist = numpy.minimum(mindist, d) if len(chosen) > 1 else d
+        if verbosity > 1:
+            print(f"Landmark {len(chosen)}: {rmap.NodeId(lm)}")
+    dist = numpy.column_stack(cols) if cols else numpy.zeros((nn, 0))
+    table = LandmarkTable(rmap.IdList(), [rmap.NodeId(i) for i in chosen], dist, Fingerprint(rmap))
+    if verbosity > 0:
+        print(f"Built {table.NumLandmarks()} landmarks for {nn} nodes")
+    return table
+
+
+def LoadOrBuild(fname: str, rmap: roadmap.CsrRoadmap, nlandmarks: int, fingerprint=None,
+                verbosity: int = 0) -> LandmarkTable:
+    """
+    Load the table in fname if it matches the roadmap, otherwise build nlandmarks landmarks and save them to fname.
+    rmap may be a function returning the roadmap so it is only made when a table has to be built
+    """
+    if fingerprint is None:
+        fingerprint = Fingerprint(rmap)
+    if fname and os.path.isfile(fname):
+        table = Load(fname, verbosity)
+        if table.Matches(fingerprint):
+            return table
+        print(f"Landmark file {fname} was computed on another roadmap, rebuilding it")
+    if nlandmarks <= 0:
+        return None
+    if callable(rmap):
+        rmap = rmap()
+    table = Build(rmap, nlandmarks, verbosity)
+    if fname:
+        table.Save(fname)
+    return table
@@ -0,0 +1,109 @@
+import collision
+import concurrent.futures
+import itertools
+import numpy
+import spatial
+from multiprocessing import shared_memory
+
+# Per worker process state, set up once by InitWorker
+workerstate: dict = {}
+
+
+def ShareArray(arr) -> tuple[shared_memory.SharedMemory, tuple[str, tuple, str]]:
+    """
+    Copy arr into a new shared memory block, returns the block and the (name, shape, dtype) needed to attach to it
+    """
+    arr = numpy.ascontiguousarray(arr)
+    shm = shared_memory.SharedMemory(create=True, size=max(1, arr.nbytes))
+    view = numpy.ndarray(arr.shape, dtype=arr.dtype, buffer=shm.buf)
+    view[...] = arr
+    return shm, (shm.name, arr.shape, arr.dtype.str)
+
+
+def AttachArray(desc: tuple[str, tuple, str]):
+    name, shape, dtype = desc
+    shm = shared_memory.SharedMemory(name=name)
+    return shm, numpy.ndarray(shape, dtype=numpy.dtype(dtype), buffer=shm.buf)
+
+
+def InitWorker(ids: list[str], xydesc, obstdesc, norg: int, kind: str, batchsize: int):
+    """
+    Attach to the shared coordinate and obstacle arrays and build the worker's spatial index and collision checker
+    """
+    xyshm, xy = AttachArray(xydesc)
+    obstshm, obstarr = AttachArray(obstdesc)
+    obst = [{"id": str(k), "x": x, "y": y, "diam": d} for k, (x, y, d) in enumerate(obstarr.tolist())]
+    workerstate["shm"] = (xyshm, obstshm)
+    workerstate["ids"] = ids
+    workerstate["xy"] = xy
+    workerstate["norg"] = norg
+    workerstate["batchsize"] = batchsize
+    workerstate["pos"] = {id: i for i, id in enumerate(ids)}
+    workerstate["index"] = spatial.MakeIndex(kind, ids, xy[:, 0].tolist(), xy[:, 1].tolist())
+    workerstate["collision"] = collision.CollisionChecker(obst, collision.ObstacleGrid(obst))
+
+
+def ProposeLinks(lo: int, hi: int, maxlinks: int, maxcand: int) -> list[list[str]]:
+    """
+    For the nodes lo..hi-1 return the ids of the closest candidates with a clear line of sight, at most maxlinks each.
+    This is the first pass of PrmGen.TryConnectIndexClosestK, which only depends on the geometry:
+    original nodes (the first norg) only link to generated ones, generated nodes may link to any other node.
+    """
+    ids = workerstate["ids"]
+    xy = workerstate["xy"]
+    norg = workerstate["norg"]
+    pos = workerstate["pos"]
+    index = workerstate["index"]
+    checker = workerstate["collision"]
+    batchsize = workerstate["batchsize"]
+    rv = []
+    for i in range(lo, hi):
+        x, y = xy[i].tolist()
+        id_i = ids[i]
+        isorg = i < norg
+        cand = (id_j for _, id_j in index.Nearest(x, y) if id_j != id_i and not (isorg and pos[id_j] < norg))
+        if maxcand > 0:
+            cand = itertools.islice(cand, maxcand)
+        links = []
+        while len(links) < maxlinks:
+            batch = list(itertools.islice(cand, batchsize))
+            if len(batch) == 0:
+                break
+            j = [pos[id_j] for id_j in batch]
+            n = len(batch)
+            clear = checker.SegmentsClear([x]*n, [y]*n, xy[j, 0], xy[j, 1]).tolist()
+            for id_j, isclear in zip(batch, clear):
+                if isclear:
+                    links.append(id_j)
+                    if len(links) >= maxlinks:
+                        break
+        rv.append(links)
+    return rv
+
+
+def ProposeLinksParallel(ids: list[str], xy, obst: list[dict[str, float]], norg: int, kind: str,
+                         maxlinks: int, maxcand: int, nworkers: int, batchsize: int = 8) -> list[list[str]]:
+    """
+    Run ProposeLinks for every node on a process pool, coordinates and obstacles are passed through shared memory.
+    The result lists are in node order, so merging them in order gives the same roadmap as a serial build.
+    """
+    obstarr = numpy.array([[o["x"], o["y"], o["diam"]] for o in obst], dtype=numpy.float64).reshape(-1, 3)
+    xyshm, xydesc = ShareArray(numpy.asarray(xy, dtype=numpy.float64).reshape(-1, 2))
+    obstshm, obstdesc = ShareArray(obstarr)
+    try:
+        nn = len(ids)
+        # a few chunks per worker so a slow region of the roadmap does not hold up the others
+        chunk = max(1, -(-nn // (4*nworkers)))
+        ranges = [(lo, min(nn, lo+chunk)) for lo in range(0, nn, chunk)]
+        with concurrent.futures.ProcessPoolExecutor(max_workers=nworkers, initializer=InitWorker,
+                                                    initargs=(ids, xydesc, obstdesc, norg, kind, batchsize)) as ex:
+            futures = [ex.submit(ProposeLinks, lo, hi, maxlinks, maxcand) for lo, hi in ranges]
+            rv = []
+            for f in futures:
+                rv.extend(f.result())
+        return rv
+    finally:
+        xyshm.close()
+        xyshm.unlink()
+        obstshm.close()
+        obstshm.unlink()
@@ -0,0 +1,119 @@
+import collections
+import threading
+
+
+class PathCache:
+    """
+    Bounded LRU cache of shortest path results for repeated start/goal queries on an unchanging roadmap.
+
+    Every suffix of a shortest path is a shortest path to the same goal, so a found path is
+    stored as next hops towards its goal for all of its nodes: per goal a tree that maps a
+    node to its successor. A later query from any node of the tree, or towards any node of
+    it in the reverse direction since the roadmap is undirected, is answered by walking the
+    tree. Results are only valid for the roadmap version they were found on, a query with
+    another version drops the whole cache first. The methods hold a lock, so searchers in
+    several threads can share one cache.
+    """
+
+    def __init__(self, maxnodes: int = 1 << 16):
+        """
+        Constructor
+        :param maxnodes: number of tree nodes kept over all goals before the least recently used goals are evicted
+        """
+        self.maxnodes = maxnodes
+        self.trees: collections.OrderedDict[str, dict[str, str]] = collections.OrderedDict()
+        # per goal the nodes that started a stored path, to tell a repeated query from one answered by a subpath
+        self.starts: dict[str, set[str]] = {}
+        self.nnodes = 0
+        self.version = None
+        self.hits = 0
+        self.subpathhits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.invalidations = 0
+        self.lock = threading.RLock()
+
+    def CheckVersion(self, version: int):
+        if version != self.version:
+            if self.trees:
+                self.invalidations += 1
+            self.Clear()
+            self.version = version
+
+    def Walk(self, start: str, goal: str) -> list[str]:
+        tree = self.trees.get(goal)
+        if tree is None or start not in tree:
+            return None
+        self.trees.move_to_end(goal)
+        rv = [start]
+        # paths stored over zero cost edges can leave a cycle in the tree, a walk longer than the tree is a miss
+        while rv[-1] != goal:
+            if len(rv) >= len(tree):
+                return None
+            rv.append(tree[rv[-1]])
+        return rv
+
+    def Get(self, start: str, goal: str, version: int) -> list[str]:
+        """
+        Cached path from start to goal found on this roadmap version, None if it is not cached
+        """
+        with self.lock:
+            return self.GetLocked(start, goal, version)
+
+    def GetLocked(self, start: str, goal: str, version: int) -> list[str]:
+        self.CheckVersion(version)
+        rv = self.Walk(start, goal)
+        if rv is None:
+            rv = self.Walk(goal, start)
+            if rv is not None:
+                rv.reverse()
+        if rv is None:
+            self.misses += 1
+        elif start in self.starts.get(goal, ()):
+            self.hits += 1
+        else:
+            self.subpathhits += 1
+        return rv
+
+    def Put(self, path: list[str], version: int):
+        """
+        Store a shortest path found on this roadmap version
+        """
+        with self.lock:
+            self.PutLocked(path, version)
+
+    def PutLocked(self, path: list[str], version: int):
+        if self.maxnodes <= 0 or len(path) == 0:
+            return
+        self.CheckVersion(version)
+        goal = path[-1]
+        tree = self.trees.get(goal)
+        if tree is None:
+            tree = self.trees[goal] = {goal: goal}
+            self.starts[goal] = set()
+            self.nnodes += 1
+        self.trees.move_to_end(goal)
+        self.starts[goal].add(path[0])
+        for k in range(len(path)-1):
+            # a node already in the tree keeps its route, which is just as short
+            if path[k] not in tree:
+                tree[path[k]] = path[k+1]
+                self.nnodes += 1
+        while self.nnodes > self.maxnodes and len(self.trees) > 1:
+            oldgoal, old = self.trees.popitem(last=False)
+            del self.starts[oldgoal]
+            self.nnodes -= len(old)
+            self.evictions += 1
+
+    def Clear(self):
+        with self.lock:
+            self.trees.clear()
+            self.starts.clear()
+            self.nnodes = 0
+
+    def Stats(self) -> str:
+        nlook = max(1, self.hits + self.subpathhits + self.misses)
+        return (f"path cache goals:{len(self.trees)} nodes:{self.nnodes}/{self.maxnodes} hits:{self.hits} "
+                f"subpathhits:{self.subpathhits} misses:{self.misses} "
+                f"hitrate:{(self.hits+self.subpathhits)/nlook:.3f} evictions:{self.evictions} "
+                f"invalidations:{self.invalidations}")
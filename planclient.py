@@ -0,0 +1,156 @@
+import stats
+import argparse
+import asyncio
+import itertools
+import json
+import random
+import sys
+import time
+
+parser = argparse.ArgumentParser(prog='PlanClient',
+                                 description='Sends path queries to planservice.py and reports their latencies',
+                                 epilog='Without -n a single query from -f to -t is sent')
+
+parser.add_argument('-us', '--unixsocket', type=str, default="",
+                    help='Unix socket of the service instead of the localhost port')
+parser.add_argument('-p', '--port', type=int, default=8765,
+                    help='Localhost TCP port of the service')
+parser.add_argument('-f', '--firstnode', type=str, default="1",
+                    help='Start node of the single query')
+parser.add_argument('-t', '--targetnode', type=str, default="12",
+                    help='Goal node of the single query')
+parser.add_argument('-n', '--queries', type=int, default=0,
+                    help='Number of random queries between roadmap nodes to send')
+parser.add_argument('-c', '--concurrency', type=int, default=8,
+                    help='Connections that send queries at the same time, each waits for its reply before the next')
+parser.add_argument('-ns', '--numsources', type=int, default=0,
+                    help='Draw the query starts from this many nodes so concurrent queries share them, 0 for any node')
+parser.add_argument('-rl', '--reload', action='store_true',
+                    help='Ask the service to reload its roadmap files before the queries')
+parser.add_argument('-st', '--stats', action='store_true',
+                    help='Print the statistics of the service at the end')
+parser.add_argument('-sd', '--shutdown', action='store_true',
+                    help='Stop the service at the end')
+parser.add_argument('-seed', '--seed', type=int, default=1234,
+                    help='Random seed value')
+parser.add_argument('-v', '--verbose', type=int, default=0,
+                    help='Verbosity level')
+
+
+args = parser.parse_args()
+
+
+class Connection:
+    """
+    One connection to the service that sends a request and waits for its reply
+    """
+
+    def __init__(self):
+        self.reader = None
+        self.writer = None
+        self.ids = itertools.count()
+
+    async def Open(self):
+        if args.unixsocket:
+            self.reader, self.writer = await asyncio.open_unix_connection(args.unixsocket)
+        else:
+            self.reader, self.writer = await asyncio.open_connection("127.0.0.1", args.port)
+
+    async def Request(self, req: dict) -> dict:
+        req["id"] = next(self.ids)
+        self.writer.write(json.dumps(req).encode() + b"\n")
+        await self.writer.drain()
+        line = await self.reader.readline()
+        if not line:
+            raise ConnectionError("the service closed the connection")
+        rv = json.loads(line)
+        if args.verbose > 1:
+            print("request:", req, "reply:", rv)
+        return rv
+
+    async def Close(self):
+        self.writer.close()
+        await self.writer.wait_closed()
+
+
+async def SendQueries(conn: Connection, queries: list[tuple[str, str]], latencies: list[float],
+                      errors: list[dict]) -> int:
+    """
+    Send the queries one after another, returns the number that found a path
+    """
+    nfound = 0
+    for start, goal in queries:
+        t0 = time.perf_counter()
+        rv = await conn.Request({"op": "path", "start": start, "goal": goal})
+        latencies.append((time.perf_counter() - t0)*1000)
+        if "error" in rv:
+            errors.append(rv)
+        elif rv["found"]:
+            nfound += 1
+    return nfound
+
+
+async def Run() -> int:
+    ctl = Connection()
+    await ctl.Open()
+    nerr = 0
+    if args.reload:
+        rv = await ctl.Request({"op": "reload"})
+        print("reload:", rv)
+        nerr += "error" in rv
+    if args.queries <= 0:
+        rv = await ctl.Request({"op": "path", "start": args.firstnode, "goal": args.targetnode})
+        if "error" in rv:
+            print("error:", rv["error"])
+            nerr += 1
+        else:
+            print("bestpath:", rv["path"])
+            print(f"bestpath cost:{rv['cost']:.5f}" if rv["found"] else "No path found")
+    else:
+        ids = (await ctl.Request({"op": "info", "ids": True}))["ids"]
+        rng = random.Random(args.seed)
+        sources = rng.sample(ids, min(len(ids), args.numsources)) if args.numsources > 0 else ids
+        queries = [(rng.choice(sources), rng.choice(ids)) for _ in range(args.queries)]
+        nconn = max(1, args.concurrency)
+        conns = [Connection() for _ in range(nconn)]
+        for conn in conns:
+            await conn.Open()
+        latencies = []
+        errors = []
+        t0 = time.perf_counter()
+        found = await asyncio.gather(*(SendQueries(conn, queries[k::nconn], latencies, errors)
+                                       for k, conn in enumerate(conns)))
+        elap = time.perf_counter() - t0
+        for conn in conns:
+            await conn.Close()
+        pct = stats.Percentiles(latencies)
+        print(f"{len(queries)} queries on {nconn} connections in {elap:.3f} secs, {len(queries)/elap:.1f} queries/sec, "
+              f"{sum(found)} found, {len(errors)} errors")
+        print("client latency ms " + " ".join(f"{k}:{v:.2f}" for k, v in pct.items() if k != "n"))
+        for rv in errors[:5]:
+            print("error:", rv["error"])
+        nerr += len(errors)
+    if args.stats:
+        print("service:", json.dumps(await ctl.Request({"op": "stats"})))
+    if args.shutdown:
+        await ctl.Request({"op": "shutdown"})
+    await ctl.Close()
+    return nerr
+
+
+def main():
+    if args.verbose > 0:
+        print("planclient.py args:")
+        for k, v in vars(args).items():
+            print(f"    {k}:", v)
+    try:
+        nerr = asyncio.run(Run())
+    except (ConnectionError, FileNotFoundError) as e:
+        print(f"Cannot reach the service: {e}")
+        sys.exit(2)
+    if nerr > 0:
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
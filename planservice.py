@@ -0,0 +1,300 @@
+import astar
+import stats
+import argparse
+import asyncio
+import collections
+import json
+import os
+import time
+
+parser = argparse.ArgumentParser(prog='PlanService',
+                                 description='Keeps a roadmap loaded and answers path queries sent as JSON lines',
+                                 epilog='See planclient.py for the requests')
+
+parser.add_argument('-n', '--nodes', type=str, default="nodes.csv",
+                    help='Name of node file')
+parser.add_argument('-e', '--edges', type=str, default="edges.csv",
+                    help='Name of edges file')
+parser.add_argument('-of', '--obstacles', type=str, default="obstacles.csv",
+                    help='Name of obstacles file')
+parser.add_argument('-d', '--directory', type=str, default="scene5",
+                    help='Directory the roadmap files are in')
+parser.add_argument('-us', '--unixsocket', type=str, default="",
+                    help='Listen on this unix socket instead of the localhost port')
+parser.add_argument('-p', '--port', type=int, default=8765,
+                    help='Localhost TCP port to listen on')
+parser.add_argument('-bw', '--batchwindow', type=float, default=2.0,
+                    help='Milliseconds to wait for more queries before a batch is searched')
+parser.add_argument('-mb', '--maxbatch', type=int, default=256,
+                    help='Most queries searched in one batch')
+parser.add_argument('-ri', '--reloadinterval', type=float, default=1.0,
+                    help='Seconds between checks of the roadmap files for changes, 0 reloads only on request')
+parser.add_argument('-bd', '--bidirectional', action='store_true',
+                    help='Answer the queries that do not share their start with bidirectional A*')
+parser.add_argument('-nl', '--numlatencies', type=int, default=10000,
+                    help='Number of most recent query latencies the percentiles are taken over')
+parser.add_argument('-v', '--verbose', type=int, default=0,
+                    help='Verbosity level')
+
+
+args = parser.parse_args()
+
+
+def FileTimes(fnames: list[str]) -> tuple:
+    return tuple(os.stat(f).st_mtime_ns if os.path.exists(f) else None for f in fnames)
+
+
+def Solve(asta: astar.AStar, queries: list[tuple[str, str]]) -> tuple[list[tuple[list[str], float]], int]:
+    """
+    Answer a batch of start, goal queries on asta. Queries that share their start and have different goals
+    are answered by one FindPathsFrom sweep, the others by FindPath. Returns the (path, cost) per query,
+    cost None when there is no path, and the number of searches made
+    """
+    bystart = collections.defaultdict(list)
+    for k, (start, goal) in enumerate(queries):
+        bystart[start].append(k)
+    rv = [None]*len(queries)
+    nsearch = 0
+    for start, ks in bystart.items():
+        goals = list(dict.fromkeys(queries[k][1] for k in ks))
+        if len(goals) > 1:
+            found = asta.FindPathsFrom(start, goals)
+        else:
+            path = asta.FindPath(start, goals[0])
+            found = {goals[0]: (path, asta.AstarCost(path) if path else float("inf"))}
+        nsearch += 1
+        for k in ks:
+            path, cost = found[queries[k][1]]
+            rv[k] = (path, cost if path else None)
+    return rv, nsearch
+
+
+class PlanService:
+    """
+    Holds the roadmap of a directory and answers the requests of the connected clients.
+
+    A request is one JSON object per line and gets one JSON line back, with the "id" of the request if it had one.
+    Path queries are queued and searched in batches in a worker thread, so the event loop keeps accepting
+    requests during a search and the queries that arrive meanwhile form the next batch. A reload loads the
+    files into a new AStar in another thread and swaps it in between batches, the batch being searched
+    finishes on the roadmap it started on.
+    """
+
+    def __init__(self, fnames: list[str], verbosity: int = 0):
+        """
+        Constructor
+        :param fnames: node, edge and obstacle file names
+        :param verbosity: verbosity level
+        """
+        self.fnames = fnames
+        self.verbosity = verbosity
+        self.asta = None
+        self.mtimes = None
+        # roadmap generation, counts the reloads that succeeded
+        self.version = 0
+        # queued (start, goal, future) path queries
+        self.pending = []
+        self.latencies = collections.deque(maxlen=max(1, args.numlatencies))
+        self.counts = collections.Counter()
+        self.maxbatchseen = 0
+        self.started = time.time()
+        self.wakeup = None
+        self.stop = None
+        self.reloadlock = None
+        # open connections, closed on shutdown
+        self.writers = set()
+
+    def Load(self) -> tuple[tuple, astar.AStar]:
+        """
+        Load the roadmap files, returns their modification times from before the load and the new AStar
+        """
+        mtimes = FileTimes(self.fnames)
+        asta = astar.AStar(self.fnames[:1], self.fnames[1:2], self.fnames[2:], verbosity=self.verbosity)
+        asta.bidirectional = args.bidirectional
+        return mtimes, asta
+
+    async def Reload(self) -> dict:
+        async with self.reloadlock:
+            t0 = time.perf_counter()
+            try:
+                mtimes, asta = await asyncio.to_thread(self.Load)
+            except Exception as e:
+                # a file caught in the middle of being written, the old roadmap stays until the next change
+                print(f"Reload failed, keeping roadmap version {self.version}: {e}")
+                self.mtimes = FileTimes(self.fnames)
+                return {"error": f"reload failed: {e}", "version": self.version}
+            self.asta = asta
+            self.mtimes = mtimes
+            self.version += 1
+            self.counts["reloads"] += 1
+            secs = time.perf_counter() - t0
+            print(f"Roadmap version {self.version}: {len(asta.nodedict)} nodes {len(asta.edgecost)//2} edges "
+                  f"{len(asta.obst)} obstacles loaded in {secs:.3f} secs")
+            return {"version": self.version, "secs": secs}
+
+    async def Watch(self):
+        """
+        Reload when a roadmap file changes
+        """
+        while True:
+            await asyncio.sleep(args.reloadinterval)
+            if FileTimes(self.fnames) != self.mtimes:
+                await self.Reload()
+
+    async def Batcher(self):
+        while True:
+            await self.wakeup.wait()
+            if args.batchwindow > 0:
+                await asyncio.sleep(args.batchwindow/1000)
+            self.wakeup.clear()
+            batch = self.pending[:args.maxbatch]
+            self.pending = self.pending[args.maxbatch:]
+            if self.pending:
+                self.wakeup.set()
+            # a reload during the search swaps in a new roadmap for the next batch
+            asta = self.asta
+            version = self.version
+            try:
+                results, nsearch = await asyncio.to_thread(Solve, asta, [(s, g) for s, g, _ in batch])
+            except Exception as e:
+                for _, _, fut in batch:
+                    fut.set_exception(e)
+                continue
+            self.counts["batches"] += 1
+            self.counts["searches"] += nsearch
+            self.counts["batchedqueries"] += len(batch) - nsearch
+            self.maxbatchseen = max(self.maxbatchseen, len(batch))
+            for (_, _, fut), (path, cost) in zip(batch, results):
+                fut.set_result((path, cost, version))
+
+    async def Query(self, req: dict) -> dict:
+        start = str(req["start"])
+        goal = str(req["goal"])
+        for n in (start, goal):
+            if n not in self.asta.nodedict:
+                return {"error": f'node "{n}" not in roadmap', "version": self.version}
+        fut = asyncio.get_running_loop().create_future()
+        self.pending.append((start, goal, fut))
+        self.wakeup.set()
+        path, cost, version = await fut
+        self.counts["queries"] += 1
+        return {"path": path, "cost": cost, "found": bool(path), "version": version}
+
+    def Stats(self) -> dict:
+        nbatch = max(1, self.counts["batches"])
+        return {"version": self.version, "nodes": len(self.asta.nodedict), "edges": len(self.asta.edgecost)//2,
+                "obstacles": len(self.asta.obst), "uptime": time.time() - self.started,
+                "queries": self.counts["queries"], "batches": self.counts["batches"],
+                "searches": self.counts["searches"], "batchedqueries": self.counts["batchedqueries"],
+                "avgbatch": self.counts["queries"]/nbatch, "maxbatch": self.maxbatchseen,
+                "reloads": self.counts["reloads"], "errors": self.counts["errors"],
+                "latencyms": stats.Percentiles(self.latencies)}
+
+    async def Dispatch(self, req: dict) -> dict:
+        op = req.get("op", "path")
+        if op == "path":
+            return await self.Query(req)
+        if op == "info":
+            rv = {"version": self.version, "nodes": len(self.asta.nodedict)}
+            if req.get("ids"):
+                rv["ids"] = list(self.asta.nodedict.keys())
+            return rv
+        if op == "stats":
+            return self.Stats()
+        if op == "reload":
+            return await self.Reload()
+        if op == "ping":
+            return {"version": self.version}
+        if op == "shutdown":
+            self.stop.set()
+            return {"stopping": True}
+        raise ValueError(f'unknown op "{op}"')
+
+    async def Respond(self, line: bytes, writer: asyncio.StreamWriter):
+        t0 = time.perf_counter()
+        req = None
+        try:
+            req = json.loads(line)
+            if not isinstance(req, dict):
+                raise ValueError("request is not a JSON object")
+            rv = await self.Dispatch(req)
+        except Exception as e:
+            rv = {"error": f"{type(e).__name__}: {e}"}
+        if "error" in rv:
+            self.counts["errors"] += 1
+        elif req.get("op", "path") == "path":
+            self.latencies.append((time.perf_counter() - t0)*1000)
+        if isinstance(req, dict) and "id" in req:
+            rv["id"] = req["id"]
+        if self.verbosity > 1:
+            print("request:", req, "reply:", rv)
+        writer.write(json.dumps(rv).encode() + b"\n")
+        await writer.drain()
+
+    async def Handle(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter):
+        """
+        Serve one connection, its requests are answered concurrently and the replies can come out of order
+        """
+        tasks = set()
+        self.writers.add(writer)
+        try:
+            while line := await reader.readline():
+                if not line.strip():
+                    continue
+                task = asyncio.create_task(self.Respond(line, writer))
+                tasks.add(task)
+                task.add_done_callback(tasks.discard)
+            await asyncio.gather(*tasks, return_exceptions=True)
+        except ConnectionError:
+            pass
+        finally:
+            self.writers.discard(writer)
+            writer.close()
+
+    async def Serve(self):
+        self.wakeup = asyncio.Event()
+        self.stop = asyncio.Event()
+        self.reloadlock = asyncio.Lock()
+        if "error" in await self.Reload():
+            return
+        if args.unixsocket:
+            if os.path.exists(args.unixsocket):
+                os.unlink(args.unixsocket)
+            server = await asyncio.start_unix_server(self.Handle, path=args.unixsocket)
+            where = args.unixsocket
+        else:
+            server = await asyncio.start_server(self.Handle, host="127.0.0.1", port=args.port)
+            where = f"127.0.0.1:{args.port}"
+        print(f"Serving {', '.join(self.fnames)} on {where}", flush=True)
+        background = [asyncio.create_task(self.Batcher())]
+        if args.reloadinterval > 0:
+            background.append(asyncio.create_task(self.Watch()))
+        async with server:
+            await self.stop.wait()
+            # let the reply to the shutdown go out, then end the connections so their handlers return
+            await asyncio.sleep(0.1)
+            for writer in list(self.writers):
+                writer.close()
+            await asyncio.sleep(0.1)
+        for task in background:
+            task.cancel()
+        if args.unixsocket and os.path.exists(args.unixsocket):
+            os.unlink(args.unixsocket)
+        print(f"Stopped: {json.dumps(self.Stats())}")
+
+
+def main():
+    if args.verbose > 0:
+        print("planservice.py args:")
+        for k, v in vars(args).items():
+            print(f"    {k}:", v)
+    fnames = [f"{args.directory}/{args.nodes}", f"{args.directory}/{args.edges}",
+              f"{args.directory}/{args.obstacles}"]
+    try:
+        asyncio.run(PlanService(fnames, args.verbose).Serve())
+    except KeyboardInterrupt:
+        pass
+
+
+if __name__ == "__main__":
+    main()
@@ -1,7 +1,13 @@
 import astar
+import collision
+import spatial
+import collections
+import itertools
 import random
 import math
+import numpy
 import os
+import time
 
 
 class PrmGen(astar.AStar):
@@ -12,7 +18,8 @@ class PrmGen(astar.AStar):
     seed = 1234
 
     def __init__(self, nodetxt: list[str], edgetxt: list[str], obsttxt: list[str] = None,
-                 verbosity: int = 1, ranseed: bool = False, seed: int = 1234):
+                 verbosity: int = 1, ranseed: bool = False, seed: int = 1234, spatialindex: str = "kdtree",
+                 vectorized: bool = True, lazy: bool = False, cachesize: int = 1 << 16):
         """
         Constructor
         :param nodetxt: list of node lines
@@ -20,6 +27,10 @@ class PrmGen(astar.AStar):
         :param obsttxt: list of obstacle lines
         :param verbosity: verbosity level
         :param seed: seed value
+        :param spatialindex: nearest neighbour index used to connect nodes, "kdtree", "grid" or "none"
+        :param vectorized: check samples and candidate edges in NumPy batches instead of one at a time
+        :param lazy: link nodes without collision checks and check only the edges of the paths FindPath finds
+        :param cachesize: number of node pairs whose line of sight result is remembered, 0 disables the cache
         """
         super().__init__(nodetxt, edgetxt, obsttxt, verbosity)
 
@@ -31,9 +42,37 @@ class PrmGen(astar.AStar):
             self.seed = seed
 
         random.seed(self.seed)
+        self.rng = numpy.random.default_rng(self.seed)
         print(f"Random seed set to {self.seed}")
 
         self.maxlinks = 3
+        self.maxcand = 30
+        self.spatialindex = spatialindex
+        self.vectorized = vectorized
+        self.batchsize = 8
+        self.lazy = lazy
+        # lazily added edges that were not collision checked yet, both directions map to the node pair
+        self.uncheckededges: dict[str, tuple[str, str]] = {}
+        self.lazychecks = 0
+        # no blocked lazy edge was removed since RepairLazy bridged the components
+        self.lazyrepaired = False
+        self.comp = {}
+        self.queryindex = None
+        # roadmap version the query index was built for
+        self.queryindexversion = -1
+        self.collision = collision.CollisionChecker(self.obst, self.obstgrid)
+        # cells of about an obstacle radius, so an obstacle change only visits the cached pairs around it
+        self.loscache = collision.PairCache(cachesize, self.obstgrid.cellsize/4)
+        # state for growing the roadmap and changing obstacles in place, see AddSamples and AddObstacle
+        self.nextid = 0
+        self.nextobstid = len(self.obst)
+        self.nodeindex = None
+        self.edgegrid = None
+        self.maxedgelen = 0.0
+        # the union-find forest misses the edges removed since InitComponents
+        self.compstale = True
+        # seconds spent in the sampling and connection phases of the last GenNodesAndEdges
+        self.phasetimes: dict[str, float] = {}
 
         if self.verbosity > 1:
             print("obst", self.obst)
@@ -49,25 +88,116 @@ class PrmGen(astar.AStar):
         else:
             return []
 
-    def GenNodesAndEdges(self, n: int, x0: float, y0: float, x1: float, y1: float, maxlinks: int = 3):
+    def GenNodesAndEdges(self, n: int, x0: float, y0: float, x1: float, y1: float, maxlinks: int = 3,
+                         maxcand: int = 0, bulk: bool = False, nworkers: int = 0):
         """
         Generate n additional nodes in the rectangle defined by x0,y0,x1,y1
+        maxcand limits how many nearest candidates a node looks at when linking and bridging, 0 means 10*maxlinks
+        bulk draws the samples in NumPy blocks from self.rng instead of one pair at a time from random
+        nworkers > 1 runs the k nearest linking pass on a process pool, the roadmap is the same as a serial build
+        In lazy mode each node is linked to its 2*maxlinks nearest nodes without collision checks,
+        FindPath checks the edges it wants to use
         """
         self.maxlinks = maxlinks
+        if maxcand <= 0:
+            maxcand = 10*maxlinks
+        self.maxcand = maxcand
+        self.compstale = True
+        t0 = time.perf_counter()
         org_node_ids = list(self.nodedict.keys())
+        gen_node_ids = self.SampleNodes(n, x0, y0, x1, y1, bulk)
+        t1 = time.perf_counter()
+        self.phasetimes["sample"] = t1 - t0
+        if self.stats is not None:
+            self.stats.AddTime("sample", t1 - t0)
+        # the node set changed behind the back of the incremental index
+        self.nodeindex = None
+
+        if self.spatialindex == "none":
+            for i, id_i in enumerate(org_node_ids):
+                todo = gen_node_ids.copy()
+                self.TryConnectListClosestK(id_i, todo, maxlinks=self.maxlinks)
+
+            for i, id_i in enumerate(gen_node_ids):
+                todo = org_node_ids.copy()
+                todo.extend(gen_node_ids[i+1:])
+                self.TryConnectListClosestK(id_i, todo, maxlinks=self.maxlinks)
+        else:
+            # original nodes are only linked to generated ones, generated nodes may link to any other node
+            allids = org_node_ids + gen_node_ids
+            xs = [self.nodedict[id]["x"] for id in allids]
+            ys = [self.nodedict[id]["y"] for id in allids]
+            index = spatial.MakeIndex(self.spatialindex, allids, xs, ys)
+            orgset = set(org_node_ids)
+            if self.lazy:
+                # unchecked edges are cheap but some are dropped at query time, so link more neighbours;
+                # components are meaningless before the edges are checked so there is no bridging pass
+                for id_i in org_node_ids:
+                    self.TryConnectIndexClosestK(id_i, index, lambda id_j: id_j not in orgset, 2*self.maxlinks)
+                for id_i in gen_node_ids:
+                    self.TryConnectIndexClosestK(id_i, index, lambda id_j: True, 2*self.maxlinks)
+            else:
+                self.InitComponents()
+                if nworkers > 1:
+                    self.ConnectParallel(allids, xs, ys, len(org_node_ids), maxcand, nworkers)
+                else:
+                    for id_i in org_node_ids:
+                        self.TryConnectIndexClosestK(id_i, index, lambda id_j: id_j not in orgset,
+                                                     self.maxlinks, maxcand)
+                    for id_i in gen_node_ids:
+                        self.TryConnectIndexClosestK(id_i, index, lambda id_j: True, self.maxlinks, maxcand)
+                # k nearest links leave separate clusters where obstacles thin out the samples,
+                # a second pass links each node to nearby nodes that are still in another component
+                for id_i in allids:
+                    accept = (lambda id_j: id_j not in orgset) if id_i in orgset else (lambda id_j: True)
+                    self.TryBridgeComponents(id_i, index, accept, maxcand)
+                self.BridgeRemainingComponents(allids, index, maxcand, orgset)
+        self.phasetimes["connect"] = time.perf_counter() - t1
+        if self.stats is not None:
+            self.stats.AddTime("connect", self.phasetimes["connect"])
+
+        if self.verbosity > 1:
+            print("org_node_ids:", org_node_ids)
+            print("gen_node_ids:", gen_node_ids)
+
+    def SampleNodes(self, n: int, x0: float, y0: float, x1: float, y1: float, bulk: bool = False) -> list[str]:
+        """
+        Add n obstacle free nodes in the rectangle x0,y0,x1,y1 without linking them, returns their ids
+        """
         gen_node_ids = []
-        startid = len(self.nodedict)+1
+        # ids keep counting up after nodes were removed so they are never reused
+        startid = max(len(self.nodedict)+1, self.nextid)
         # startid = len(self.nodedict)+1
+        if self.vectorized or bulk:
+            self.collision.Update(self.obst)
+        if bulk:
+            xs, ys = self.SampleFreeBulk(n, x0, y0, x1, y1)
+            gen_node_ids = self.AddGenNodesBulk(startid, xs, ys)
+        # pairs drawn by the loop below, SampleFreeBulk counts its own
+        ndrawn = 0
+        nbulk = len(gen_node_ids)
         while len(gen_node_ids) < n:
+            if self.vectorized:
+                # draw the remaining pairs in the same order as the scalar loop so the seed gives the same nodes
+                nneed = n - len(gen_node_ids)
+                ndrawn += nneed
+                cand = [(random.uniform(x0, x1), random.uniform(y0, y1)) for _ in range(nneed)]
+                clear = self.collision.PointsClear([c[0] for c in cand], [c[1] for c in cand])
+                for (x, y), isclear in zip(cand, clear.tolist()):
+                    if isclear:
+                        self.AddGenNode(f"{startid+len(gen_node_ids)}", x, y, gen_node_ids)
+                continue
+
             i = len(gen_node_ids)
             # id = f"{startid+i}"
             id = f"{startid+i}"
             x = random.uniform(x0, x1)
             y = random.uniform(y0, y1)
+            ndrawn += 1
 
             # Don't generate nodes inside obstacles
             isclear = True
-            for o in self.obst:
+            for o in self.obstgrid.PointCandidates(x, y):
                 d2o = self.DistToObst(x, y, o)
                 if d2o < o["diam"]:
                     if self.verbosity > 3:
@@ -77,25 +207,61 @@ class PrmGen(astar.AStar):
             if not isclear:
                 continue
 
-            self.nodedict[id] = {"x": x, "y": y, "id": id, "cost": 0, "tent_tot_cost": 0}
-            self.nbr[id] = []
-            self.nodestat[id] = "unvisited"
-            if self.verbosity > 3:
-                print(f"Generated node {id} x:{x:.3f} y:{y:.3f}")
-            gen_node_ids.append(id)
+            self.AddGenNode(id, x, y, gen_node_ids)
+        self.nextid = startid + len(gen_node_ids)
+        if self.stats is not None:
+            self.stats.samplesdrawn += ndrawn
+            self.stats.samplesrejected += ndrawn - (len(gen_node_ids) - nbulk)
+        return gen_node_ids
 
-        for i, id_i in enumerate(org_node_ids):
-            todo = gen_node_ids.copy()
-            self.TryConnectListClosestK(id_i, todo, maxlinks=self.maxlinks)
+    def SampleFreeBulk(self, n: int, x0: float, y0: float, x1: float, y1: float, blocksize: int = 1 << 16):
+        """
+        Draw n obstacle free samples in the rectangle x0,y0,x1,y1 in blocks, returns x and y arrays
+        The block size adapts to the acceptance rate seen so far so large requests need only a few rounds
+        """
+        xs = []
+        ys = []
+        nfree = 0
+        ndrawn = 0
+        nrejected = 0
+        while nfree < n:
+            nneed = n - nfree
+            rate = nfree / ndrawn if ndrawn > 0 else 1.0
+            nblock = min(max(blocksize, int(1.1*nneed / max(rate, 0.01))), 1 << 22)
+            bx = self.rng.uniform(x0, x1, nblock)
+            by = self.rng.uniform(y0, y1, nblock)
+            clear = self.collision.PointsClear(bx, by)
+            ndrawn += nblock
+            nrejected += nblock - int(numpy.count_nonzero(clear))
+            bx = bx[clear][:nneed]
+            by = by[clear][:nneed]
+            xs.append(bx)
+            ys.append(by)
+            nfree += len(bx)
+            if self.verbosity > 2:
+                print(f"SampleFreeBulk drew {nblock} kept {len(bx)} total {nfree}/{n}")
+        if self.stats is not None:
+            # the clear samples beyond n are drawn but not rejected
+            self.stats.samplesdrawn += ndrawn
+            self.stats.samplesrejected += nrejected
+        return numpy.concatenate(xs), numpy.concatenate(ys)
 
-        for i, id_i in enumerate(gen_node_ids):
-            todo = org_node_ids.copy()
-            todo.extend(gen_node_ids[i+1:])
-            self.TryConnectListClosestK(id_i, todo, maxlinks=self.maxlinks)
+    def AddGenNodesBulk(self, startid: int, xs, ys) -> list[str]:
+        """
+        Register the generated nodes at xs, ys with consecutive ids from startid, returns the new ids
+        """
+        ids = [f"{startid+i}" for i in range(len(xs))]
+        self.nodedict.update({id: {"x": x, "y": y, "id": id}
+                              for id, x, y in zip(ids, xs.tolist(), ys.tolist())})
+        self.nbr.update({id: [] for id in ids})
+        return ids
 
-        if self.verbosity > 1:
-            print("org_node_ids:", org_node_ids)
-            print("gen_node_ids:", gen_node_ids)
+    def AddGenNode(self, id: str, x: float, y: float, gen_node_ids: list[str]):
+        self.nodedict[id] = {"x": x, "y": y, "id": id}
+        self.nbr[id] = []
+        if self.verbosity > 3:
+            print(f"Generated node {id} x:{x:.3f} y:{y:.3f}")
+        gen_node_ids.append(id)
 
     def TryConnectListClosestK(self, id_i: str, id_list: list[str], maxlinks: int = 3) -> bool:
         """
@@ -104,10 +270,13 @@ class PrmGen(astar.AStar):
         nlinks = 0
         linklst = []
         ncand = len(id_list)
-        while len(id_list) > 0:
-            id_j = self.FindClosestNodeInList(id_i, id_list)
-            id_list.remove(id_j)
-            if self.TryConnect(id_i, id_j):
+        # visiting the candidates in one stable sort by distance gives the same order
+        # as repeatedly taking FindClosestNodeInList and removing it from the list
+        dists = [self.Dist(id_i, id_j) for id_j in id_list]
+        order = sorted(range(ncand), key=dists.__getitem__)
+        cand = [id_list[k] for k in order]
+        for id_j, clear in zip(cand, self.LineOfSightList(id_i, cand)):
+            if self.ConnectIfClear(id_i, id_j, clear):
                 nlinks += 1
                 linklst.append(id_j)
                 if nlinks >= maxlinks:
@@ -119,6 +288,157 @@ class PrmGen(astar.AStar):
             print(f"Connected node {id_i} to {nlinks}/{ncand} nodes out of {len(id_list)}:{linklst}")
         return False
 
+    def TryConnectIndexClosestK(self, id_i: str, index, accept, maxlinks: int = 3, maxcand: int = 0) -> bool:
+        """
+        Try to connect node id_i to its closest nodes in the spatial index for which accept(id_j) is true
+        Gives up after maxcand candidates if maxcand > 0, so nodes boxed in by obstacles do not scan the whole roadmap
+        """
+        nlinks = 0
+        linklst = []
+        nd = self.nodedict[id_i]
+        batchsize = self.batchsize if self.vectorized else 1
+        if self.stats is not None:
+            self.stats.nnqueries += 1
+        cand = (id_j for _, id_j in index.Nearest(nd["x"], nd["y"]) if id_j != id_i and accept(id_j))
+        if maxcand > 0:
+            cand = itertools.islice(cand, maxcand)
+        while True:
+            batch = list(itertools.islice(cand, batchsize))
+            if len(batch) == 0:
+                break
+            for id_j, clear in zip(batch, self.LineOfSightList(id_i, batch)):
+                if self.ConnectIfClear(id_i, id_j, clear):
+                    self.JoinComponents(id_i, id_j)
+                    nlinks += 1
+                    linklst.append(id_j)
+                    if nlinks >= maxlinks:
+                        if self.verbosity > 1:
+                            print(f"Connected node {id_i} to {nlinks} nodes:{linklst}")
+                        return True
+
+        if self.verbosity > 1:
+            print(f"Connected node {id_i} to {nlinks} nodes:{linklst}")
+        return False
+
+    def ConnectParallel(self, allids: list[str], xs: list[float], ys: list[float], norg: int, maxcand: int,
+                        nworkers: int):
+        """
+        Parallel version of the TryConnectIndexClosestK pass over allids, of which the first norg are original nodes
+        Which links a node gets only depends on the geometry, so the workers propose them independently
+        and merging the proposals in node order adds the edges in the same order as the serial loop
+        """
+        # the process pool and shared memory modules are only loaded for parallel builds
+        import parbuild
+        proposals = parbuild.ProposeLinksParallel(allids, numpy.column_stack([xs, ys]), self.obst, norg,
+                                                  self.spatialindex, self.maxlinks, maxcand, nworkers, self.batchsize)
+        if self.stats is not None:
+            # the workers make one query per node and do not report their collision tests
+            self.stats.nnqueries += len(allids)
+        for id_i, links in zip(allids, proposals):
+            for id_j in links:
+                self.ConnectIfClear(id_i, id_j, True)
+                self.JoinComponents(id_i, id_j)
+            if self.verbosity > 1:
+                print(f"Connected node {id_i} to {len(links)} nodes:{links}")
+
+    def TryBridgeComponents(self, id_i: str, index, accept, maxcand: int):
+        """
+        Try to connect node id_i to those of its maxcand closest candidates that are in another component
+        """
+        ncand = 0
+        batch = []
+        if self.stats is not None:
+            self.stats.nnqueries += 1
+        for _, id_j in index.Nearest(self.nodedict[id_i]["x"], self.nodedict[id_i]["y"]):
+            if id_j == id_i or not accept(id_j):
+                continue
+            ncand += 1
+            if ncand > maxcand:
+                break
+            if self.FindComponent(id_i) != self.FindComponent(id_j):
+                batch.append(id_j)
+        for id_j, clear in zip(batch, self.LineOfSightList(id_i, batch)):
+            # an earlier bridge in this loop may already have joined the component
+            if self.FindComponent(id_i) == self.FindComponent(id_j):
+                continue
+            if self.ConnectIfClear(id_i, id_j, clear):
+                self.JoinComponents(id_i, id_j)
+                if self.verbosity > 1:
+                    print(f"Bridged node {id_i} to {id_j}")
+
+    def BridgeRemainingComponents(self, ids: list[str], index, maxcand: int, orgset: set = frozenset()):
+        """
+        Link the components that the maxcand limited passes left apart. The nodes outside the largest component
+        scan their nearest nodes without a limit, skipping their own component, until one is linked to a visible
+        node in another component. The sampler keeps a clearance around the obstacles that edges do not need,
+        so two regions can be joined only by an edge across a band without samples, which is longer than the
+        maxcand nearest. Pairs of nodes that are both in orgset are not linked
+        """
+        sizes = collections.Counter(self.FindComponent(id_i) for id_i in ids)
+        if len(sizes) < 2:
+            return
+        big = sizes.most_common(1)[0][0]
+        nbridged = 0
+        for id_i in ids:
+            ci = self.FindComponent(id_i)
+            if ci == self.FindComponent(big):
+                continue
+            skiporg = id_i in orgset
+            if self.LinkOutside(id_i, index, lambda id_j: not (skiporg and id_j in orgset)
+                                and self.FindComponent(id_j) != ci):
+                nbridged += 1
+        if self.verbosity > 0 and nbridged > 0:
+            print(f"Bridged {nbridged} components left apart by the nearest candidates")
+
+    def LinkOutside(self, id_i: str, index, outside, maxcand: int = 0) -> bool:
+        """
+        Link node id_i to its nearest visible node for which outside(id_j) is true. The other nodes are skipped
+        without a test, so the scan goes past any number of them. Gives up after maxcand tested candidates if
+        maxcand > 0. Returns True if a link was made
+        """
+        nd = self.nodedict[id_i]
+        batchsize = self.batchsize if self.vectorized else 1
+        if self.stats is not None:
+            self.stats.nnqueries += 1
+        cand = (id_j for _, id_j in index.Nearest(nd["x"], nd["y"]) if id_j != id_i and outside(id_j))
+        if maxcand > 0:
+            cand = itertools.islice(cand, maxcand)
+        while True:
+            batch = list(itertools.islice(cand, batchsize))
+            if len(batch) == 0:
+                return False
+            for id_j, clear in zip(batch, self.LineOfSightList(id_i, batch)):
+                if self.ConnectIfClear(id_i, id_j, clear):
+                    self.JoinComponents(id_i, id_j)
+                    return True
+
+    def InitComponents(self):
+        """
+        Set up the union-find forest of connected components from the current edges
+        """
+        self.comp = {}
+        for n1 in self.nbr:
+            for n2 in self.nbr[n1]:
+                self.JoinComponents(n1, n2)
+        self.compstale = False
+
+    def FindComponent(self, n: str) -> str:
+        root = n
+        while self.comp.get(root, root) != root:
+            root = self.comp[root]
+        # path compression
+        while n != root:
+            nxt = self.comp[n]
+            self.comp[n] = root
+            n = nxt
+        return root
+
+    def JoinComponents(self, n1: str, n2: str):
+        r1 = self.FindComponent(n1)
+        r2 = self.FindComponent(n2)
+        if r1 != r2:
+            self.comp[r1] = r2
+
     def FindClosestNodeInList(self, id: str, id_list: list[str]) -> str:
         """
         Find the node in id_list that is closest to node id
@@ -136,6 +456,93 @@ class PrmGen(astar.AStar):
                 minid = id_j
         return minid
 
+    def GetQueryIndex(self):
+        """
+        Spatial index over the roadmap nodes used to connect query points, rebuilt when the roadmap changed
+        """
+        if self.queryindex is None or self.queryindexversion != self.version:
+            ids = list(self.nodedict.keys())
+            xs = [self.nodedict[id]["x"] for id in ids]
+            ys = [self.nodedict[id]["y"] for id in ids]
+            kind = self.spatialindex if self.spatialindex != "none" else "kdtree"
+            self.queryindex = spatial.MakeIndex(kind, ids, xs, ys)
+            self.queryindexversion = self.version
+        return self.queryindex
+
+    def AddQueryNode(self, id: str, x: float, y: float, index, maxlinks: int = 0) -> int:
+        """
+        Add a temporary node at x,y and connect it to its closest visible roadmap nodes, returns the number of links
+        """
+        if self.issearcher:
+            raise RuntimeError("AddQueryNode would add a node to the roadmap a Searcher shares")
+        if maxlinks <= 0:
+            maxlinks = self.maxlinks
+        self.nodedict[id] = {"x": x, "y": y, "id": id}
+        self.nbr[id] = []
+        if self.stats is not None:
+            self.stats.nnqueries += 1
+        cand = (id_j for _, id_j in index.Nearest(x, y) if id_j in self.nodedict)
+        cand = itertools.islice(cand, 10*maxlinks)
+        nlinks = 0
+        while nlinks < maxlinks:
+            batch = list(itertools.islice(cand, self.batchsize))
+            if len(batch) == 0:
+                break
+            for id_j, clear in zip(batch, self.LineOfSightList(id, batch)):
+                if self.ConnectIfClear(id, id_j, clear):
+                    nlinks += 1
+                    if nlinks >= maxlinks:
+                        break
+        return nlinks
+
+    def FindPathXY(self, xs: float, ys: float, xg: float, yg: float) -> tuple[list[str], float]:
+        """
+        Find a path between two arbitrary points by temporarily connecting them into the roadmap
+        Returns the node path, which starts with "qstart" and ends with "qgoal", and its cost
+        """
+        if self.issearcher:
+            raise RuntimeError("FindPathXY adds query nodes to the roadmap, it cannot run on a Searcher")
+        index = self.GetQueryIndex()
+        if not all(self.collision.PointsClear([xs, xg], [ys, yg]).tolist()):
+            print(f"Query point ({xs},{ys}) or ({xg},{yg}) is inside an obstacle")
+            return [], 0.0
+        # the query nodes leave the graph as it was, so the cached paths stay valid once they are gone
+        # and the search itself bypasses the cache. In lazy mode the search may also drop blocked
+        # roadmap edges, then the version has to stay new
+        version = self.version
+        cache = self.pathcache
+        self.pathcache = None
+        try:
+            self.AddQueryNode("qstart", xs, ys, index)
+            self.AddQueryNode("qgoal", xg, yg, index)
+            rv = self.FindPath("qstart", "qgoal")
+            cost = self.AstarCost(rv)
+            self.RemoveNode("qstart")
+            self.RemoveNode("qgoal")
+        finally:
+            self.pathcache = cache
+        if not self.lazy:
+            self.version = version
+        # the nodes are the ones the index was built on again, dropped lazy edges do not matter to it
+        self.queryindexversion = self.version
+        return rv, cost
+
+    def QueryMany(self, queries: list[list[str]]):
+        """
+        Generator that answers a sequence of queries against the current roadmap and yields (query, path, cost)
+        as each one completes. A query is either a start and goal node id or xstart, ystart, xgoal, ygoal.
+        """
+        for q in queries:
+            if len(q) == 2:
+                rv = self.FindPath(q[0], q[1])
+                cost = self.AstarCost(rv)
+            elif len(q) == 4:
+                rv, cost = self.FindPathXY(float(q[0]), float(q[1]), float(q[2]), float(q[3]))
+            else:
+                print(f"Query {q} should be start,goal or xstart,ystart,xgoal,ygoal")
+                rv, cost = [], 0.0
+            yield q, rv, cost
+
     def TryConnect(self, id_i: str, id_j: str) -> bool:
         """
         Try to connect nodes id_i and id_j
@@ -143,17 +550,355 @@ class PrmGen(astar.AStar):
         if id_i == id_j:
             print(f"TryConnect Warning: tried to connect node to itself: {id_i}")
             return False
-        if self.LineOfSight(id_i, id_j):
-            edgeid1 = f"{id_i}:{id_j}"
-            if edgeid1 in self.edgecost:
-                return True
-            self.nbr[id_i].append(id_j)
-            self.nbr[id_j].append(id_i)
-            self.edgecost[f"{id_i}:{id_j}"] = self.Dist(id_i, id_j)
-            self.edgecost[f"{id_j}:{id_i}"] = self.Dist(id_j, id_i)
+        if f"{id_i}:{id_j}" in self.edgecost:
             return True
-        else:
+        return self.ConnectIfClear(id_i, id_j, self.lazy or self.LineOfSight(id_i, id_j))
+
+    def ConnectIfClear(self, id_i: str, id_j: str, clear: bool) -> bool:
+        """
+        Add the edge between id_i and id_j if the line of sight test came back clear
+        """
+        if not clear:
             return False
+        edgeid1 = f"{id_i}:{id_j}"
+        if edgeid1 in self.edgecost:
+            return True
+        self.BumpVersion(added=True)
+        self.nbr[id_i].append(id_j)
+        self.nbr[id_j].append(id_i)
+        self.edgecost[f"{id_i}:{id_j}"] = self.Dist(id_i, id_j)
+        self.edgecost[f"{id_j}:{id_i}"] = self.Dist(id_j, id_i)
+        if self.lazy:
+            self.uncheckededges[edgeid1] = (id_i, id_j)
+            self.uncheckededges[f"{id_j}:{id_i}"] = (id_i, id_j)
+        if self.edgegrid is not None:
+            self.GridEdge(self.edgegrid.Insert, id_i, id_j)
+            self.maxedgelen = max(self.maxedgelen, self.edgecost[edgeid1])
+        return True
+
+    def RemoveEdge(self, n1: str, n2: str):
+        if self.edgegrid is not None and f"{n1}:{n2}" in self.edgecost:
+            self.GridEdge(self.edgegrid.Remove, n1, n2)
+        super().RemoveEdge(n1, n2)
+        self.uncheckededges.pop(f"{n1}:{n2}", None)
+        self.uncheckededges.pop(f"{n2}:{n1}", None)
+        self.compstale = True
+
+    def RemoveNode(self, n: str):
+        if self.nodeindex is not None:
+            self.nodeindex.Remove(n, self.nodedict[n]["x"], self.nodedict[n]["y"])
+        super().RemoveNode(n)
+        # ids such as qstart are reused for nodes at other positions
+        self.loscache.Forget(n)
+
+    def Searcher(self) -> "PrmGen":
+        """
+        A searcher with its own line of sight cache, lookups reorder the LRU entries of a cache and would race
+        between threads
+        """
+        rv = super().Searcher()
+        rv.loscache = collision.PairCache(self.loscache.maxsize, self.loscache.cellsize)
+        return rv
+
+    def GetNodeIndex(self) -> spatial.GridIndex:
+        """
+        Grid index over the roadmap nodes that is kept up to date as nodes are added and removed
+        """
+        if self.nodeindex is None:
+            ids = list(self.nodedict.keys())
+            xs = [self.nodedict[id]["x"] for id in ids]
+            ys = [self.nodedict[id]["y"] for id in ids]
+            self.nodeindex = spatial.GridIndex(ids, xs, ys)
+        return self.nodeindex
+
+    def GetEdgeGrid(self) -> collision.EdgeGrid:
+        """
+        Grid over the roadmap edges, built on first use and then kept up to date by ConnectIfClear and RemoveEdge
+        """
+        if self.edgegrid is None:
+            pairs = [(n1, n2) for n1 in self.nbr for n2 in dict.fromkeys(self.nbr[n1]) if n1 < n2]
+            lens = [self.edgecost[f"{n1}:{n2}"] for n1, n2 in pairs]
+            self.maxedgelen = max(lens, default=0.0)
+            # cells about as large as an average edge keep both the lists and the cells per edge short
+            cellsize = sum(lens)/len(lens) if lens else 0.1
+            self.edgegrid = collision.EdgeGrid(max(cellsize, 1e-6))
+            for n1, n2 in pairs:
+                self.GridEdge(self.edgegrid.Insert, n1, n2)
+        return self.edgegrid
+
+    def GridEdge(self, func, n1: str, n2: str):
+        nn1 = self.nodedict[n1]
+        nn2 = self.nodedict[n2]
+        func(n1, n2, nn1["x"], nn1["y"], nn2["x"], nn2["y"])
+
+    def AddSamples(self, n: int, x0: float, y0: float, x1: float, y1: float, bulk: bool = False) -> list[str]:
+        """
+        Grow the roadmap by n nodes in the rectangle x0,y0,x1,y1, only the new nodes look for links
+        so the cost depends on n and not on the size of the roadmap. Returns the new ids
+        """
+        index = self.GetNodeIndex()
+        gen_node_ids = self.SampleNodes(n, x0, y0, x1, y1, bulk)
+        for id in gen_node_ids:
+            index.Insert(id, self.nodedict[id]["x"], self.nodedict[id]["y"])
+        self.LinkNodes(gen_node_ids)
+        if self.verbosity > 0:
+            print(f"AddSamples added {len(gen_node_ids)} nodes, roadmap has {len(self.nodedict)} nodes")
+        return gen_node_ids
+
+    def LinkNodes(self, ids: list[str]):
+        """
+        Link the nodes in ids to their closest visible nodes and bridge the components they touch,
+        the same two passes GenNodesAndEdges makes for generated nodes
+        """
+        index = self.GetNodeIndex()
+        if self.lazy:
+            for id_i in ids:
+                self.TryConnectIndexClosestK(id_i, index, lambda id_j: True, 2*self.maxlinks)
+            return
+        if self.compstale:
+            self.InitComponents()
+        for id_i in ids:
+            self.TryConnectIndexClosestK(id_i, index, lambda id_j: True, self.maxlinks, self.maxcand)
+        for id_i in ids:
+            self.TryBridgeComponents(id_i, index, lambda id_j: True, self.maxcand)
+        self.BridgeRemainingComponents(ids, index, self.maxcand)
+
+    def AddObstacle(self, x: float, y: float, diam: float) -> dict[str, float]:
+        """
+        Add a circular obstacle and update the roadmap around it: the edges it blocks and the nodes inside it
+        are removed and the nodes that lost an edge or are within an edge length of the removed ones are linked
+        again, a component split off by the removal is joined back. Only the edges and nodes near the obstacle are
+        tested. Returns the obstacle, which can be passed to RemoveObstacle
+        """
+        o = {"id": str(self.nextobstid), "x": x, "y": y, "diam": diam}
+        self.nextobstid += 1
+        self.BumpVersion()
+        self.obst.append(o)
+        self.obstgrid.Insert(o)
+        self.collision.Update(self.obst)
+        # pairs that were blocked stay blocked
+        self.loscache.Drop(True, (x-diam/2, y-diam/2, x+diam/2, y+diam/2))
+
+        rad = diam/2
+        cand = self.GetEdgeGrid().QueryBox(x-rad, y-rad, x+rad, y+rad)
+        blocked = []
+        if cand:
+            x1 = [self.nodedict[a]["x"] for a, _ in cand]
+            y1 = [self.nodedict[a]["y"] for a, _ in cand]
+            x2 = [self.nodedict[b]["x"] for _, b in cand]
+            y2 = [self.nodedict[b]["y"] for _, b in cand]
+            clear = self.collision.SegmentsClear(x1, y1, x2, y2, ox=[x], oy=[y], rad=[rad]).tolist()
+            if self.stats is not None:
+                self.stats.collisiontests += len(cand)
+            blocked = [pair for pair, isclear in zip(cand, clear) if not isclear]
+        for a, b in blocked:
+            self.RemoveEdge(a, b)
+
+        # nodes closer than one diameter would have been rejected by the sampler
+        inside = list(itertools.takewhile(lambda c: c[0] < diam, self.GetNodeIndex().Nearest(x, y)))
+        # the neighbours of a removed node lose their edges to it as well
+        lost = [m for _, n in inside for m in self.nbr[n]]
+        for _, n in inside:
+            self.RemoveNode(n)
+        gone = {n for _, n in inside}
+        # the removed nodes may have been the only links between the nodes around them. The grid cells are
+        # about an average edge long, maxedgelen would reach across the roadmap once a long bridge exists
+        near = []
+        if inside:
+            reach = diam + self.edgegrid.cellsize
+            near = [n for _, n in itertools.takewhile(lambda c: c[0] <= reach, self.GetNodeIndex().Nearest(x, y))]
+        relink = [n for n in dict.fromkeys(itertools.chain(itertools.chain.from_iterable(blocked), lost, near))
+                  if n not in gone]
+        if blocked or inside:
+            self.lazyrepaired = False
+        self.LinkNodes(relink)
+        if not self.lazy:
+            self.RejoinComponents(relink)
+        if self.verbosity > 0:
+            print(f"AddObstacle {o['id']} checked {len(cand)} edges, removed {len(blocked)} edges "
+                  f"and {len(inside)} nodes, relinked {len(relink)} nodes")
+        return o
+
+    def RejoinComponents(self, ids: list[str]):
+        """
+        Join the components that the nodes in ids fell apart into. Every node of the smaller side scans for a
+        visible node outside it, the only edge left across a split may start far from the removed ones
+        """
+        index = self.GetNodeIndex()
+        reps = list({self.FindComponent(id_i): id_i for id_i in ids}.values())
+        for id_i in reps[1:]:
+            if self.FindComponent(id_i) == self.FindComponent(reps[0]):
+                continue
+            small = self.SmallerComponent(reps[0], id_i)
+            inside = set(small)
+            if any(self.LinkOutside(id_j, index, lambda id_k: id_k not in inside) for id_j in small):
+                if self.verbosity > 1:
+                    print(f"Rejoined the {len(small)} node component of {id_i}")
+
+    def RemoveObstacle(self, o: dict[str, float]):
+        """
+        Remove obstacle o and link the nodes that are close enough to have an edge across the freed area
+        """
+        self.BumpVersion()
+        self.obstgrid.Remove(o)
+        for k, oo in enumerate(self.obst):
+            if oo is o:
+                del self.obst[k]
+                break
+        self.collision.Update(self.obst)
+        # pairs that were clear stay clear
+        self.loscache.Drop(False, (o["x"]-o["diam"]/2, o["y"]-o["diam"]/2, o["x"]+o["diam"]/2, o["y"]+o["diam"]/2))
+
+        # no node is closer than a diameter, as in AddObstacle. The grid cells are about an average edge long,
+        # nodes further away would mostly make redundant links and maxedgelen would reach across the roadmap
+        # once a long bridge exists
+        reach = o["diam"] + self.GetEdgeGrid().cellsize
+        near = [n for _, n in itertools.takewhile(lambda c: c[0] <= reach, self.GetNodeIndex().Nearest(o["x"], o["y"]))]
+        self.LinkNodes(near)
+        if self.verbosity > 0:
+            print(f"RemoveObstacle {o['id']} relinked {len(near)} nodes")
+
+    def ValidateEdges(self, pairs) -> int:
+        """
+        Collision check those of the node pairs that are lazily added edges, the edges that are clear are
+        remembered as checked and the blocked ones are removed. Returns the number of removed edges
+        """
+        todo = list(dict.fromkeys(self.uncheckededges[f"{a}:{b}"] for a, b in pairs
+                                  if f"{a}:{b}" in self.uncheckededges))
+        if len(todo) == 0:
+            return 0
+        if self.vectorized:
+            x1 = [self.nodedict[a]["x"] for a, _ in todo]
+            y1 = [self.nodedict[a]["y"] for a, _ in todo]
+            x2 = [self.nodedict[b]["x"] for _, b in todo]
+            y2 = [self.nodedict[b]["y"] for _, b in todo]
+            clear = self.collision.SegmentsClear(x1, y1, x2, y2).tolist()
+            if self.stats is not None:
+                self.stats.collisiontests += len(todo)
+        else:
+            clear = [self.LineOfSight(a, b) for a, b in todo]
+        self.lazychecks += len(todo)
+        nremoved = 0
+        for (a, b), isclear in zip(todo, clear):
+            if isclear:
+                del self.uncheckededges[f"{a}:{b}"]
+                del self.uncheckededges[f"{b}:{a}"]
+            else:
+                self.RemoveEdge(a, b)
+                nremoved += 1
+        if nremoved > 0:
+            self.lazyrepaired = False
+        if self.verbosity > 1:
+            print(f"ValidateEdges checked {len(todo)} lazy edges and removed {nremoved}")
+        return nremoved
+
+    def ValidateAllEdges(self) -> int:
+        """
+        Collision check every lazily added edge that is still unchecked, returns the number of removed edges
+        """
+        return self.ValidateEdges(list(set(self.uncheckededges.values())))
+
+    def ValidateAndRepair(self):
+        """
+        Make a lazy roadmap collision free and connected like an eager build, for the users of the roadmap that do
+        not check edges as they search: landmarks, the compact roadmap, the anytime search and query threads
+        """
+        if self.lazy and (self.uncheckededges or not self.lazyrepaired):
+            self.RepairLazy()
+
+    def FindPath(self, start: str, goal: str, scenename="Scene", stepplot=False, finplot=False) -> list[str]:
+        """
+        A* that, in lazy mode, checks the edges of the path it found, drops the blocked ones and searches again
+        until the path is collision free. When the dropped edges leave no path, RepairQuery bridges the start
+        or goal component and the search goes on
+        """
+        if self.issearcher and self.lazy and (self.uncheckededges or not self.lazyrepaired):
+            raise RuntimeError("a lazy roadmap has to be checked by ValidateAndRepair before Searchers use it")
+        while self.lazy:
+            rv = super().FindPath(start, goal)
+            if len(rv) == 0:
+                # removed edges may have split the roadmap where an eager build would have bridged it
+                if self.lazyrepaired or not self.RepairQuery(start, goal):
+                    break
+                continue
+            if self.ValidateEdges(zip(rv, rv[1:])) == 0:
+                if not (stepplot or finplot):
+                    return rv
+                break
+        return super().FindPath(start, goal, scenename, stepplot, finplot)
+
+    def SmallerComponent(self, start: str, goal: str) -> list[str]:
+        """
+        Nodes of the smaller of the components of start and goal. Both are grown in turns, so the work is
+        proportional to the smaller one. Empty if start and goal are connected
+        """
+        seen = [{start: None}, {goal: None}]
+        todo = [[start], [goal]]
+        while True:
+            for k in (0, 1):
+                if not todo[k]:
+                    return list(seen[k])
+                for m in self.nbr[todo[k].pop()]:
+                    if m in seen[1-k]:
+                        return []
+                    if m not in seen[k]:
+                        seen[k][m] = None
+                        todo[k].append(m)
+
+    def RepairQuery(self, start: str, goal: str) -> bool:
+        """
+        Bridge the smaller of the components of start and goal, after the blocked edges of the candidate paths
+        split them, to a visible node outside it. Only the nodes of that component are scanned and at most
+        maxcand of their candidates are tested, the rest of the roadmap stays unchecked. Returns True if an
+        edge was added
+        """
+        small = self.SmallerComponent(start, goal)
+        inside = set(small)
+        index = self.GetNodeIndex()
+        self.lazy = False
+        try:
+            for id_i in small:
+                if self.LinkOutside(id_i, index, lambda id_j: id_j not in inside, self.maxcand):
+                    if self.verbosity > 1:
+                        print(f"Bridged the {len(small)} node component of {id_i} for {start}->{goal}")
+                    return True
+        finally:
+            self.lazy = True
+        return False
+
+    def RepairLazy(self):
+        """
+        Check all remaining lazy edges and bridge the components that the blocked ones leave, like an eager build
+        """
+        self.ValidateAllEdges()
+        index = self.GetQueryIndex()
+        self.lazy = False
+        try:
+            self.InitComponents()
+            ids = list(self.nodedict.keys())
+            for id_i in ids:
+                self.TryBridgeComponents(id_i, index, lambda id_j: True, self.maxcand)
+            self.BridgeRemainingComponents(ids, index, self.maxcand)
+        finally:
+            self.lazy = True
+        self.lazyrepaired = True
+        if self.verbosity > 0:
+            print(f"Repaired the lazy roadmap after {self.lazychecks} edge checks")
+
+    def LineOfSightList(self, id_i: str, id_list: list[str]):
+        """
+        Line of sight from node id_i to every node in id_list, in one batch when vectorized
+        and lazily one at a time otherwise
+        """
+        if self.lazy:
+            # FindPath checks the edges it uses
+            return [True] * len(id_list)
+        if not self.vectorized:
+            return (self.LineOfSight(id_i, id_j) for id_j in id_list)
+        # existing edges passed the test when they were added
+        todo = [id_j for id_j in id_list if f"{id_i}:{id_j}" not in self.edgecost]
+        clear = dict(zip(todo, self.LineOfSightBatch(id_i, todo)))
+        return [clear.get(id_j, True) for id_j in id_list]
 
     def DistToObst(self, x: float, y: float, o: dict) -> float:
         """
@@ -167,14 +912,28 @@ class PrmGen(astar.AStar):
         """
         Check if the line between nodes n1 and n2 is clear of obstacles
         """
-        # print(f"LineOfSight: {n1} -> {n2}")
+        cached = self.loscache.Get(n1, n2)
+        if self.stats is not None:
+            if cached is None:
+                self.stats.collisiontests += 1
+            else:
+                self.stats.collisioncached += 1
+        if cached is not None:
+            return cached
+        clear = self.LineOfSightUncached(n1, n2)
+        nn1 = self.nodedict[n1]
+        nn2 = self.nodedict[n2]
+        self.loscache.Put(n1, n2, clear, (nn1["x"], nn1["y"], nn2["x"], nn2["y"]))
+        return clear
+
+    def LineOfSightUncached(self, n1: str, n2: str) -> bool:
         nn1 = self.nodedict[n1]
         nn2 = self.nodedict[n2]
         x1 = nn1["x"]
         y1 = nn1["y"]
         x2 = nn2["x"]
         y2 = nn2["y"]
-        for o in self.obst:
+        for o in self.obstgrid.SegmentCandidates(x1, y1, x2, y2):
             xo = o["x"]
             yo = o["y"]
             diam = o["diam"]
@@ -184,6 +943,29 @@ class PrmGen(astar.AStar):
                 return False
         return True
 
+    def LineOfSightBatch(self, n1: str, n2_list: list[str]) -> list[bool]:
+        """
+        Check the lines from node n1 to every node in n2_list against all obstacles at once
+        """
+        if len(n2_list) == 0:
+            return []
+        rv = [self.loscache.Get(n1, n2) for n2 in n2_list]
+        todo = [n2 for n2, clear in zip(n2_list, rv) if clear is None]
+        if self.stats is not None:
+            self.stats.collisiontests += len(todo)
+            self.stats.collisioncached += len(n2_list) - len(todo)
+        if len(todo) == 0:
+            return rv
+        nn1 = self.nodedict[n1]
+        x2 = [self.nodedict[n2]["x"] for n2 in todo]
+        y2 = [self.nodedict[n2]["y"] for n2 in todo]
+        x1 = [nn1["x"]] * len(todo)
+        y1 = [nn1["y"]] * len(todo)
+        clear = dict(zip(todo, self.collision.SegmentsClear(x1, y1, x2, y2).tolist()))
+        for n2, xx2, yy2 in zip(todo, x2, y2):
+            self.loscache.Put(n1, n2, clear[n2], (nn1["x"], nn1["y"], xx2, yy2))
+        return [clear[n2] if c is None else c for n2, c in zip(n2_list, rv)]
+
     def LineCircleIntersect(self, x1, y1, x2, y2, cx, cy, diam) -> bool: 
         """
         Check if the line between (x1,y1) and (x2,y2) intersects the circle at (xo,yo) with diameter diam
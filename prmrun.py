@@ -1,5 +1,13 @@
+import csvload
+import landmarks
+import pathcache
 import prm
+import queryexec
+import roadmap
+import stats
 import argparse
+import contextlib
+import time
 
 
 parser = argparse.ArgumentParser(prog='PrmMain.py',
@@ -28,6 +36,52 @@ parser.add_argument('-fp', '--finplot', action='store_true',
                     help='Do a plot of final path')
 parser.add_argument('-sp', '--stepplot', action='store_true',
                     help='Create a plot that shows the steps to finding the final path')
+parser.add_argument('-lt', '--labelmax', type=int, default=200,
+                    help='Plot graphs with more nodes than this without labels')
+parser.add_argument('-ps', '--plotstep', type=int, default=1,
+                    help='Make every Nth search step of -sp a frame of the animation')
+parser.add_argument('-pf', '--plotfile', type=str, default="",
+                    help='Write the plot of -fp or -sp to this image file instead of showing it, '
+                         'works without a display')
+parser.add_argument('-si', '--spatialindex', type=str, default="kdtree", choices=["kdtree", "grid", "none"],
+                    help='Nearest neighbour index used to connect the generated nodes')
+parser.add_argument('-sc', '--scalar', action='store_true',
+                    help='Check samples and edges one at a time instead of in NumPy batches')
+parser.add_argument('-bs', '--bulksample', action='store_true',
+                    help='Draw the samples in NumPy blocks from a seeded numpy Generator')
+parser.add_argument('-nw', '--nworkers', type=int, default=0,
+                    help='Number of worker processes used to link the generated nodes, 0 or 1 links them serially')
+parser.add_argument('-lz', '--lazy', action='store_true',
+                    help='Link the generated nodes without collision checks and check edges only when a path uses them')
+parser.add_argument('-cs', '--cachesize', type=int, default=1 << 16,
+                    help='Number of node pairs whose collision result is cached, 0 disables the cache')
+parser.add_argument('-as', '--addsamples', type=int, default=0,
+                    help='Nodes to add to the built roadmap, only the new nodes are linked')
+parser.add_argument('-ao', '--addobstacles', type=str, default="",
+                    help='File of x,y,diam obstacles to add to the built roadmap, only nearby edges are checked')
+parser.add_argument('-bd', '--bidirectional', action='store_true',
+                    help='Search from both ends at once, plots fall back to the one sided search')
+parser.add_argument('-nl', '--numlandmarks', type=int, default=0,
+                    help='Landmarks to build for the ALT heuristic, they are written to landmarks.npz with the roadmap')
+parser.add_argument('-pc', '--pathcache', type=int, default=0,
+                    help='Nodes of found paths kept to answer repeated queries, 0 disables the path cache')
+parser.add_argument('-dl', '--deadline', type=float, default=0.0,
+                    help='Seconds each anytime (ARA*) call may take, 0 runs the plain search to completion')
+parser.add_argument('-nc', '--ncalls', type=int, default=1,
+                    help='Anytime calls to make, each one continues improving the path of the previous one')
+parser.add_argument('-e0', '--epsilon', type=float, default=3.0,
+                    help='Heuristic inflation of the first anytime search')
+parser.add_argument('-qf', '--queryfile', type=str, default="",
+                    help='File of start,goal or xstart,ystart,xgoal,ygoal lines to answer against the roadmap')
+parser.add_argument('-qo', '--queryout', type=str, default="querypaths.csv",
+                    help='File the query results are streamed to')
+parser.add_argument('-qt', '--querythreads', type=int, default=0,
+                    help='Answer the start,goal queries of the query file on this many threads, '
+                         '0 answers them in order')
+parser.add_argument('-cg', '--compact', action='store_true',
+                    help='Search and write the files from the compact array-backed roadmap')
+parser.add_argument('-so', '--statsout', type=str, default="",
+                    help='Collect counters and phase times and write them to this JSON file')
 parser.add_argument('-v', '--verbose', type=int, default=0,
                     help='Verbosity level')
 parser.add_argument('-rs', '--ranseed', action='store_true',
@@ -48,10 +102,32 @@ astarscene = args.scene
 dname = args.directory
 finplot = args.finplot
 stepplot = args.stepplot
+plotfile = args.plotfile
+labelmax = args.labelmax
+plotstep = args.plotstep
 verbosity = args.verbose
 ran_seed = args.ranseed
 seed = args.seed
 nodes_to_gen = args.nodes_to_gen
+compact = args.compact
+spatialindex = args.spatialindex
+vectorized = not args.scalar
+bulksample = args.bulksample
+nworkers = args.nworkers
+lazy = args.lazy
+cachesize = args.cachesize
+addsamples = args.addsamples
+addobstacles = args.addobstacles
+bidirectional = args.bidirectional
+numlandmarks = args.numlandmarks
+pathcachesize = args.pathcache
+queryfile = args.queryfile
+deadline = args.deadline
+ncalls = args.ncalls
+epsilon = args.epsilon
+statsout = args.statsout
+queryout = args.queryout
+querythreads = args.querythreads
 
 if verbosity > 0:
     print("prm.py args:")
@@ -68,9 +144,105 @@ if verbosity > 0:
     print("    dname:", dname)
     print("    finplot:", finplot)
     print("    stepplot:", stepplot)
+    print("    plotfile:", plotfile)
+    print("    labelmax:", labelmax)
+    print("    plotstep:", plotstep)
     print("    verbosity:", verbosity)
     print("    ran_seed:", ran_seed)
     print("    seed:", seed)
+    print("    compact:", compact)
+    print("    spatialindex:", spatialindex)
+    print("    vectorized:", vectorized)
+    print("    bulksample:", bulksample)
+    print("    nworkers:", nworkers)
+    print("    lazy:", lazy)
+    print("    cachesize:", cachesize)
+    print("    addsamples:", addsamples)
+    print("    addobstacles:", addobstacles)
+    print("    bidirectional:", bidirectional)
+    print("    numlandmarks:", numlandmarks)
+    print("    pathcachesize:", pathcachesize)
+    print("    queryfile:", queryfile)
+    print("    deadline:", deadline)
+    print("    ncalls:", ncalls)
+    print("    epsilon:", epsilon)
+    print("    statsout:", statsout)
+    print("    queryout:", queryout)
+    print("    querythreads:", querythreads)
+
+
+def Phase(st: stats.PlannerStats, name: str):
+    # phases are only timed when stats are collected
+    return contextlib.nullcontext() if st is None else st.Phase(name)
+
+
+def WriteStats(st: stats.PlannerStats):
+    if st is None:
+        return
+    print(st.Summary())
+    st.Dump(statsout)
+    print(f"Stats written to {statsout}")
+
+
+def ReadQueryFile(fname: str) -> list[list[str]]:
+    queries = []
+    with open(fname) as f:
+        for line in f:
+            if len(line) <= 1 or line[0] == "#":
+                continue
+            queries.append([fld.strip() for fld in line.split(",")])
+    return queries
+
+
+def QueryThreaded(prma: prm.PrmGen, queries: list[list[str]]):
+    """
+    Like QueryMany but the start,goal queries are answered on querythreads threads first. The xy queries add
+    temporary nodes to the roadmap, they are answered one at a time once the threads are done
+    """
+    with queryexec.QueryExecutor(prma, querythreads, verbosity) as qe:
+        futures = {k: qe.Submit(q[0], q[1]) for k, q in enumerate(queries) if len(q) == 2}
+        answers = {k: f.result() for k, f in futures.items()}
+    for k, q in enumerate(queries):
+        if k in answers:
+            yield q, *answers[k]
+        else:
+            yield from prma.QueryMany([q])
+
+
+def RunQueries(prma: prm.PrmGen):
+    """
+    Answer every query in the query file against the roadmap, each result is written as soon as it is found
+    """
+    queries = ReadQueryFile(queryfile)
+    nfound = 0
+    t0 = time.perf_counter()
+    answers = QueryThreaded(prma, queries) if querythreads > 0 else prma.QueryMany(queries)
+    with open(queryout, 'w') as file:
+        for k, (q, rv, cost) in enumerate(answers):
+            if rv:
+                nfound += 1
+            line = f"{k},{cost:.5f}," + ",".join(rv)
+            print(line, flush=True)
+            file.write(line + "\n")
+            file.flush()
+    elap = time.perf_counter() - t0
+    print(f"Answered {len(queries)} queries ({nfound} with a path) in {elap:.3f} secs")
+    if prma.pathcache is not None:
+        print(prma.pathcache.Stats())
+
+
+def RunAnytime(prma: prm.PrmGen) -> list[str]:
+    """
+    Make up to ncalls anytime calls of deadline seconds each, stop early once the path is optimal
+    """
+    rv = None
+    for k in range(ncalls):
+        rv = prma.FindPathAnytime(firstnode, targetnode, deadline, eps0=epsilon)
+        print(f"anytime call {k}: reason:{rv.reason} cost:{rv.cost:.5f} bound:{rv.bound:.3f} "
+              f"phases:{rv.phases} secs:{rv.elapsed:.4f}")
+        if rv.reason != "deadline":
+            break
+    return rv.path
 
 
 def main():
@@ -78,34 +250,108 @@ def main():
     fp_edgename = f"{dname}/{fnameedges}"
     fp_obstacles = f"{dname}/{fnameobstacles}"
 
-    prma = prm.PrmGen([fp_nodename], [fp_edgename], [fp_obstacles], 
-                      verbosity=verbosity, ranseed=ran_seed, seed=seed)
-    prma.GenNodesAndEdges(nodes_to_gen, -0.5, -0.5, 0.5, 0.5, maxlinks)
+    st = stats.PlannerStats() if statsout else None
+    with Phase(st, "load"):
+        prma = prm.PrmGen([fp_nodename], [fp_edgename], [fp_obstacles],
+                          verbosity=verbosity, ranseed=ran_seed, seed=seed, spatialindex=spatialindex,
+                          vectorized=vectorized, lazy=lazy, cachesize=cachesize)
+    prma.stats = st
+    prma.bidirectional = bidirectional
+    prma.labelmax = labelmax
+    prma.plotstep = plotstep
+    if pathcachesize > 0:
+        prma.pathcache = pathcache.PathCache(pathcachesize)
+    t0 = time.perf_counter()
+    prma.GenNodesAndEdges(nodes_to_gen, -0.5, -0.5, 0.5, 0.5, maxlinks, bulk=bulksample,
+                          nworkers=nworkers)
+    if verbosity > 0:
+        print(f"GenNodesAndEdges took {time.perf_counter()-t0:.3f} secs")
+        print(prma.loscache.Stats())
+
+    if addsamples > 0 or addobstacles:
+        t0 = time.perf_counter()
+        with Phase(st, "update"):
+            if addsamples > 0:
+                prma.AddSamples(addsamples, -0.5, -0.5, 0.5, 0.5, bulk=bulksample)
+            if addobstacles:
+                report = csvload.LoadReport()
+                for x, y, diam in csvload.ReadObstacles(addobstacles, report).tolist():
+                    prma.AddObstacle(x, y, diam)
+                report.Print()
+        if verbosity > 0:
+            print(f"Roadmap update took {time.perf_counter()-t0:.3f} secs")
+
+    if numlandmarks > 0:
+        # landmark distances must come from the final edges
+        prma.ValidateAndRepair()
+        t0 = time.perf_counter()
+        with Phase(st, "landmarks"):
+            prma.landmarks = landmarks.Build(roadmap.FromAStar(prma), numlandmarks, verbosity)
+        if verbosity > 0:
+            print(f"Landmarks took {time.perf_counter()-t0:.3f} secs")
+
+    if queryfile:
+        RunQueries(prma)
+        if lazy:
+            print(f"Lazy edge checks:{prma.lazychecks} unchecked edges left:{len(prma.uncheckededges)//2}")
+        WriteStats(st)
+        return
+
+    if compact:
+        # the compact roadmap cannot check edges while it searches
+        prma.ValidateAndRepair()
+        rmap = roadmap.FromAStar(prma, verbosity=verbosity)
+        rmap.SetLandmarks(prma.landmarks)
+        nodelist = rmap.ExtractNodesIntoList()
+        edgelist = rmap.ExtractEdgesIntoList()
+        obstlist = rmap.ExtractObstIntoList()
+
+        rv = rmap.FindPath(firstnode, targetnode)
+        print("bestpath:", rv)
+        print(f"bestpath cost:{rmap.AstarCost(rv):.5f}")
+        print(f"expansions:{rmap.expansions}")
+    else:
+        if deadline > 0:
+            # the anytime search does not check edges as it goes
+            prma.ValidateAndRepair()
+            rv = RunAnytime(prma)
+        else:
+            rv = prma.FindPath(firstnode, targetnode, scenename=astarscene,
+                               stepplot=stepplot, finplot=finplot)
+        print("bestpath:", rv)
+        print(f"bestpath cost:{prma.AstarCost(rv):.5f}")
+        print(f"expansions:{prma.expansions}")
+        if lazy:
+            print(f"Lazy edge checks for the query:{prma.lazychecks}")
+            # only collision free edges are written out
+            prma.ValidateAndRepair()
 
-    nodelist = prma.ExtractNodesIntoList()
-    edgelist = prma.ExtractEdgesIntoList()
-    obstlist = prma.ExtractObstIntoList()
+        nodelist = prma.ExtractNodesIntoList()
+        edgelist = prma.ExtractEdgesIntoList()
+        obstlist = prma.ExtractObstIntoList()
+        prma.ShowPlot(plotfile)
 
-    rv = prma.FindPath(firstnode, targetnode, scenename=astarscene,
-                       stepplot=stepplot, finplot=finplot)
-    print("bestpath:", rv)
-    print(f"bestpath cost:{prma.AstarCost(rv):.5f}")
-    prma.ShowPlot()
+    with Phase(st, "write"):
+        # Write out the solution node path to "path.csv"
+        pathline = ",".join(rv)
+        with open('path.csv', 'w') as file:
+            file.write(pathline)
 
-    # Write out the solution node path to "path.csv"
-    pathline = ",".join(rv)
-    with open('path.csv', 'w') as file:
-        file.write(pathline)
+        # Write out generated edges and nodes
+        with open('nodes.csv', 'w') as file:
+            file.writelines(nodelist)
 
-    # Write out generated edges and nodes
-    with open('nodes.csv', 'w') as file:
-        file.writelines(nodelist)
+        with open('edges.csv', 'w') as file:
+            file.writelines(edgelist)
 
-    with open('edges.csv', 'w') as file:
-        file.writelines(edgelist)
+        with open('obstacles.csv', 'w') as file:
+            file.writelines(obstlist)
 
-    with open('obstacles.csv', 'w') as file:
-        file.writelines(obstlist)
+        if numlandmarks > 0:
+            # the csv files round the costs, so the saved distances are taken on the roadmap as it will be read back
+            rmap = roadmap.FromCsv('nodes.csv', 'edges.csv', verbosity=verbosity)
+            landmarks.Build(rmap, numlandmarks, verbosity).Save('landmarks.npz')
+    WriteStats(st)
 
 
 if __name__ == "__main__":
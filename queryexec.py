@@ -0,0 +1,88 @@
+import concurrent.futures
+import stats
+import threading
+
+
+class QueryExecutor:
+    """
+    Answers start/goal node queries on a thread pool against the roadmap of one planner.
+
+    Every worker thread searches with its own AStar.Searcher, which shares the roadmap, landmarks and
+    path cache of the planner and has its own search state, so the answers are the ones FindPath gives
+    when the queries run one after another. The roadmap must only change while no queries are running,
+    workers notice the new version and make new searchers. With the GIL the threads take turns in the
+    pure python searches, the pool lets a service answer queries as they come rather than speed them up.
+    """
+
+    def __init__(self, asta, workers: int = 4, verbosity: int = 0):
+        """
+        Constructor
+        :param asta: AStar or subclass whose roadmap the queries are answered on
+        :param workers: number of worker threads
+        :param verbosity: verbosity level
+        """
+        if getattr(asta, "lazy", False):
+            # lazy PRM searches drop blocked edges as they find them, a shared roadmap is checked up front
+            asta.ValidateAndRepair()
+        self.asta = asta
+        self.workers = max(1, workers)
+        self.verbosity = verbosity
+        self.local = threading.local()
+        # searchers made so far, their stats are added to those of asta on Close
+        self.searchers = []
+        self.lock = threading.Lock()
+        self.pool = concurrent.futures.ThreadPoolExecutor(max_workers=self.workers, thread_name_prefix="query")
+        if self.verbosity > 0:
+            print(f"QueryExecutor with {self.workers} threads on {len(asta.nodedict)} nodes")
+
+    def GetSearcher(self):
+        """
+        The searcher of the calling thread, a new one if there is none yet or the roadmap changed
+        """
+        s = getattr(self.local, "searcher", None)
+        if s is None or s.version != self.asta.version:
+            s = self.asta.Searcher()
+            if self.asta.stats is not None:
+                s.stats = stats.PlannerStats()
+            with self.lock:
+                self.searchers.append(s)
+            self.local.searcher = s
+        return s
+
+    def Query(self, start: str, goal: str) -> tuple[list[str], float]:
+        """
+        Path from start to goal and its cost, found in the calling thread
+        """
+        s = self.GetSearcher()
+        rv = s.FindPath(start, goal)
+        return rv, s.AstarCost(rv)
+
+    def Submit(self, start: str, goal: str) -> concurrent.futures.Future:
+        """
+        Queue a query, the future's result is the (path, cost) of Query
+        """
+        return self.pool.submit(self.Query, start, goal)
+
+    def Map(self, queries: list[tuple[str, str]]) -> list[tuple[list[str], float]]:
+        """
+        Answer all start, goal queries, the results are in the order of the queries
+        """
+        futures = [self.Submit(start, goal) for start, goal in queries]
+        return [f.result() for f in futures]
+
+    def Close(self):
+        """
+        Wait for the queued queries and stop the threads
+        """
+        self.pool.shutdown(wait=True)
+        if self.asta.stats is not None:
+            for s in self.searchers:
+                self.asta.stats.Merge(s.stats)
+        self.searchers = []
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.Close()
+        return False
@@ -0,0 +1,341 @@
+import csvload
+import heapq
+import struct
+import numpy
+
+# binary roadmap files start with this magic and a format version, see SaveBinary
+binmagic = b"PRMRMAP\0"
+binversion = 1
+binheader = struct.Struct("<8sIIqqq")
+binalign = 64
+
+
+class CsrRoadmap:
+    """
+    Compact array-backed roadmap with integer node indices.
+
+    Node coordinates are kept in a (N,2) float array and the undirected edges in
+    CSR form: the neighbours of node i are nbrs[indptr[i]:indptr[i+1]] with the
+    matching costs in costs[indptr[i]:indptr[i+1]]. External string ids are kept
+    in ids and mapped back to indices through index. The arrays may be read only
+    memmaps of a binary roadmap file, in which case ids is a fixed width bytes
+    array and ids are looked up by binary search over idorder instead of a dict.
+
+    This is an optional compact search path beside the dict graph of AStar and
+    PrmGen, which still build and search with string keys. A built roadmap is
+    converted with FromAStar, and -cg of astarmain.py and prmrun.py searches on it.
+    """
+
+    def __init__(self, ids: list[str], xy, indptr, nbrs, costs, obst=None, verbosity: int = 0, idorder=None):
+        """
+        Constructor
+        :param ids: external node ids, ids[i] is the name of node i
+        :param xy: (N,2) array of node coordinates
+        :param indptr: (N+1) array of CSR row offsets
+        :param nbrs: neighbour node indices
+        :param costs: neighbour edge costs
+        :param obst: (M,3) array of obstacles as x,y,diam
+        :param verbosity: verbosity level
+        :param idorder: permutation that sorts a bytes array of ids, enables lookups without building a dict
+        """
+        self.verbosity = verbosity
+        self.ids = ids
+        self.idorder = idorder
+        self.index = None
+        if idorder is None:
+            self.index = {id: i for i, id in enumerate(ids)}
+        self.xy = numpy.asarray(xy, dtype=numpy.float64).reshape(-1, 2)
+        self.indptr = numpy.asarray(indptr, dtype=numpy.int64)
+        self.nbrs = numpy.asarray(nbrs, dtype=numpy.int32)
+        self.costs = numpy.asarray(costs, dtype=numpy.float64)
+        if obst is None:
+            obst = numpy.zeros((0, 3))
+        self.obst = numpy.asarray(obst, dtype=numpy.float64).reshape(-1, 3)
+        self.expansions = 0
+        # (N,L) landmark distances in node order when an ALT table is attached, see SetLandmarks
+        self.lmdist = None
+        if self.verbosity > 0:
+            print(f"CsrRoadmap has {self.NumNodes()} nodes and {self.NumEdges()} edges and {len(self.obst)} obstacles")
+
+    def NumNodes(self) -> int:
+        return len(self.ids)
+
+    def NodeIdx(self, id: str) -> int:
+        """
+        Index of the node with external id, -1 if there is no such node
+        """
+        if self.index is not None:
+            return self.index.get(id, -1)
+        key = id.encode()
+        lo = 0
+        hi = len(self.idorder)
+        while lo < hi:
+            mid = (lo+hi) // 2
+            if self.ids[self.idorder[mid]] < key:
+                lo = mid+1
+            else:
+                hi = mid
+        if lo < len(self.idorder) and self.ids[self.idorder[lo]] == key:
+            return int(self.idorder[lo])
+        return -1
+
+    def NodeId(self, i: int) -> str:
+        if self.index is not None:
+            return self.ids[i]
+        return self.ids[i].decode()
+
+    def IdList(self) -> list[str]:
+        """
+        All external ids as a list of str
+        """
+        if self.index is not None:
+            return self.ids
+        return [id.decode() for id in self.ids.tolist()]
+
+    def SetLandmarks(self, table):
+        """
+        Use the landmarks.LandmarkTable table for the ALT lower bound in FindPathIdx, None removes it
+        """
+        self.lmdist = None if table is None or table.NumLandmarks() == 0 else table.Aligned(self.IdList())
+
+    def NumEdges(self) -> int:
+        """
+        Number of undirected edges
+        """
+        return len(self.nbrs) // 2
+
+    def NumBytes(self) -> int:
+        """
+        Bytes held by the coordinate and adjacency arrays
+        """
+        return self.xy.nbytes + self.indptr.nbytes + self.nbrs.nbytes + self.costs.nbytes + self.obst.nbytes
+
+    def Neighbours(self, i: int):
+        a = self.indptr[i]
+        b = self.indptr[i+1]
+        return self.nbrs[a:b], self.costs[a:b]
+
+    def UndirectedEdges(self):
+        """
+        Return the edges as (u,v,cost) arrays with u < v, each edge once
+        """
+        src = numpy.repeat(numpy.arange(self.NumNodes(), dtype=numpy.int32), numpy.diff(self.indptr))
+        keep = src < self.nbrs
+        return src[keep], self.nbrs[keep], self.costs[keep]
+
+    def FindPath(self, start: str, goal: str) -> list[str]:
+        """
+        A* from start to goal using the euclidean distance heuristic, or the ALT bound when it is larger,
+        returns the list of node ids
+        """
+        s = self.NodeIdx(start)
+        if s < 0:
+            print(f'Error Start node "{start}" not in roadmap')
+            return []
+        g = self.NodeIdx(goal)
+        if g < 0:
+            print(f'Error Goal node "{goal}" not in roadmap')
+            return []
+        rv = self.FindPathIdx(s, g)
+        return [self.NodeId(i) for i in rv]
+
+    def FindPathIdx(self, s: int, g: int) -> list[int]:
+        """
+        A* on node indices, returns the list of node indices from s to g
+        """
+        nn = self.NumNodes()
+        cost = numpy.full(nn, numpy.inf)
+        parent = numpy.full(nn, -1, dtype=numpy.int32)
+        closed = numpy.zeros(nn, dtype=bool)
+        gx, gy = self.xy[g]
+        lmgoal = None if self.lmdist is None else self.lmdist[g]
+        cost[s] = 0.0
+        openheap = [(0.0, s)]
+        self.expansions = 0
+        while openheap:
+            _, n = heapq.heappop(openheap)
+            if closed[n]:
+                continue
+            closed[n] = True
+            self.expansions += 1
+            if n == g:
+                rv = [n]
+                while parent[n] >= 0:
+                    n = int(parent[n])
+                    rv.append(n)
+                rv.reverse()
+                return rv
+            nb, c = self.Neighbours(n)
+            newcost = cost[n] + c
+            better = (newcost < cost[nb]) & ~closed[nb]
+            if not better.any():
+                continue
+            nb = nb[better]
+            newcost = newcost[better]
+            cost[nb] = newcost
+            parent[nb] = n
+            pxy = self.xy[nb]
+            h = numpy.sqrt((pxy[:, 0]-gx)**2 + (pxy[:, 1]-gy)**2)
+            if lmgoal is not None:
+                # fmax ignores the nan of landmarks that reach neither node
+                h = numpy.fmax(h, numpy.fmax.reduce(numpy.abs(self.lmdist[nb] - lmgoal), axis=1))
+            ttcost = newcost + h
+            for tc, n2 in zip(ttcost.tolist(), nb.tolist()):
+                heapq.heappush(openheap, (tc, n2))
+        print("No path found")
+        return []
+
+    def AstarCost(self, path: list[str]) -> float:
+        cost = 0
+        for i in range(len(path)-1):
+            n1 = self.NodeIdx(path[i])
+            n2 = self.NodeIdx(path[i+1])
+            nb, c = self.Neighbours(n1)
+            cost += float(c[numpy.flatnonzero(nb == n2)[0]])
+        return cost
+
+    def ExtractNodesIntoList(self) -> list[str]:
+        """
+        Extract the nodes into a list of csv strings
+        """
+        return [f"{n},{x:.3f},{y:.3f},100\n" for n, (x, y) in zip(self.IdList(), self.xy.tolist())]
+
+    def ExtractEdgesIntoList(self) -> list[str]:
+        """
+        Extract the edges into a list of csv strings, each edge is written in both directions like PrmGen does
+        """
+        rv = []
+        ids = self.IdList()
+        for i in range(self.NumNodes()):
+            nb, c = self.Neighbours(i)
+            for j, cost in zip(nb.tolist(), c.tolist()):
+                rv.append(f"{ids[i]},{ids[j]},{cost:.3f}\n")
+        return rv
+
+    def ExtractObstIntoList(self) -> list[str]:
+        """
+        Extract the obstacles into a list of csv strings
+        """
+        return [f"{x:.3f},{y:.3f},{diam:.3f}\n" for x, y, diam in self.obst.tolist()]
+
+
+def FromEdgeArrays(ids: list[str], xy, eu, ev, ecost, obst=None, verbosity: int = 0) -> CsrRoadmap:
+    """
+    Build a CsrRoadmap from undirected edge arrays, each edge (eu[k],ev[k]) is listed once
+    """
+    nn = len(ids)
+    eu = numpy.asarray(eu, dtype=numpy.int32)
+    ev = numpy.asarray(ev, dtype=numpy.int32)
+    ecost = numpy.asarray(ecost, dtype=numpy.float64)
+    src = numpy.concatenate([eu, ev])
+    dst = numpy.concatenate([ev, eu])
+    cst = numpy.concatenate([ecost, ecost])
+    # stable sort keeps the neighbour order of the edge list, like the nbr lists in AStar
+    order = numpy.argsort(src, kind="stable")
+    indptr = numpy.zeros(nn+1, dtype=numpy.int64)
+    numpy.cumsum(numpy.bincount(src, minlength=nn), out=indptr[1:])
+    return CsrRoadmap(ids, xy, indptr, dst[order], cst[order], obst, verbosity)
+
+
+def FromAStar(asta, verbosity: int = 0) -> CsrRoadmap:
+    """
+    Build a CsrRoadmap from the dict based graph of an AStar or PrmGen
+    """
+    ids = list(asta.nodedict.keys())
+    index = {id: i for i, id in enumerate(ids)}
+    xy = numpy.array([[asta.nodedict[n]["x"], asta.nodedict[n]["y"]] for n in ids], dtype=numpy.float64)
+    eu = []
+    ev = []
+    ecost = []
+    for n1 in ids:
+        i = index[n1]
+        # nbr can hold a neighbour twice when the edge file lists both directions
+        for n2 in dict.fromkeys(asta.nbr[n1]):
+            j = index[n2]
+            if i < j:
+                eu.append(i)
+                ev.append(j)
+                ecost.append(asta.edgecost[f"{n1}:{n2}"])
+    obst = numpy.array([[o["x"], o["y"], o["diam"]] for o in asta.obst], dtype=numpy.float64)
+    return FromEdgeArrays(ids, xy, eu, ev, ecost, obst, verbosity)
+
+
+def FromCsv(fnamenodes: str, fnameedges: str, fnameobst: str = None, verbosity: int = 0) -> CsrRoadmap:
+    """
+    Build a CsrRoadmap straight from node, edge and obstacle csv files without going through the dicts
+    """
+    report = csvload.LoadReport()
+    ids, xy, _ = csvload.ReadNodes(fnamenodes, report)
+    eu, ev, ecost = csvload.ReadEdges(fnameedges, ids, report)
+    # PrmGen writes every edge in both directions, keep the first copy of each pair
+    key = numpy.minimum(eu, ev)*len(ids) + numpy.maximum(eu, ev)
+    _, first = numpy.unique(key, return_index=True)
+    first.sort()
+    obst = None
+    if fnameobst:
+        obst = csvload.ReadObstacles(fnameobst, report)
+    report.Print()
+    return FromEdgeArrays(ids, xy, eu[first], ev[first], ecost[first], obst, verbosity)
+
+
+def BinSections(nnodes: int, idwidth: int, nnbrs: int, nobst: int):
+    """
+    Name, dtype and shape of the arrays of a binary roadmap file in the order they are stored
+    """
+    return [("ids", numpy.dtype(f"S{idwidth}"), (nnodes,)),
+            ("idorder", numpy.dtype("<i8"), (nnodes,)),
+            ("xy", numpy.dtype("<f8"), (nnodes, 2)),
+            ("indptr", numpy.dtype("<i8"), (nnodes+1,)),
+            ("nbrs", numpy.dtype("<i4"), (nnbrs,)),
+            ("costs", numpy.dtype("<f8"), (nnbrs,)),
+            ("obst", numpy.dtype("<f8"), (nobst, 3))]
+
+
+def SaveBinary(rmap: CsrRoadmap, fname: str):
+    """
+    Write the roadmap to a binary file that LoadBinary can memory map.
+    Layout: a little endian header (magic, version, id width, node, adjacency and obstacle counts)
+    followed by the arrays of BinSections, each starting at a multiple of binalign bytes.
+    The adjacency is stored in CSR form so a planner can search it straight from the file.
+    """
+    ids = numpy.array([id.encode() for id in rmap.IdList()], dtype=bytes)
+    idwidth = max(1, ids.dtype.itemsize)
+    ids = ids.astype(f"S{idwidth}")
+    arrays = {"ids": ids,
+              "idorder": numpy.argsort(ids, kind="stable"),
+              "xy": rmap.xy,
+              "indptr": rmap.indptr,
+              "nbrs": rmap.nbrs,
+              "costs": rmap.costs,
+              "obst": rmap.obst}
+    with open(fname, "wb") as f:
+        f.write(binheader.pack(binmagic, binversion, idwidth, len(ids), len(rmap.nbrs), len(rmap.obst)))
+        for name, dtype, shape in BinSections(len(ids), idwidth, len(rmap.nbrs), len(rmap.obst)):
+            f.write(b"\0" * (-f.tell() % binalign))
+            numpy.ascontiguousarray(arrays[name], dtype=dtype).reshape(shape).tofile(f)
+
+
+def LoadBinary(fname: str, verbosity: int = 0) -> CsrRoadmap:
+    """
+    Open a roadmap written by SaveBinary, the arrays are read only memmaps of the file so nothing is parsed or copied
+    """
+    with open(fname, "rb") as f:
+        hdr = f.read(binheader.size)
+    if len(hdr) < binheader.size or hdr[:len(binmagic)] != binmagic:
+        raise ValueError(f"{fname} is not a binary roadmap file")
+    _, version, idwidth, nnodes, nnbrs, nobst = binheader.unpack(hdr)
+    if version != binversion:
+        raise ValueError(f"{fname} has roadmap format version {version}, only version {binversion} is supported")
+    arrays = {}
+    offset = binheader.size
+    for name, dtype, shape in BinSections(nnodes, idwidth, nnbrs, nobst):
+        offset += -offset % binalign
+        count = int(numpy.prod(shape))
+        if count == 0:
+            # numpy cannot map zero bytes
+            arrays[name] = numpy.zeros(shape, dtype=dtype)
+        else:
+            arrays[name] = numpy.memmap(fname, dtype=dtype, mode="r", offset=offset, shape=shape)
+        offset += count*dtype.itemsize
+    return CsrRoadmap(arrays["ids"], arrays["xy"], arrays["indptr"], arrays["nbrs"], arrays["costs"],
+                      arrays["obst"], verbosity, idorder=arrays["idorder"])
@@ -0,0 +1,69 @@
+import roadmap
+import argparse
+import time
+
+parser = argparse.ArgumentParser(prog='RoadmapConv',
+                                 description='Converts a roadmap between csv files and the binary memory-mapped format',
+                                 epilog='Text at the bottom of help')
+
+parser.add_argument('-n', '--nodes', type=str, default="nodes.csv",
+                    help='Name of the nodes file')
+parser.add_argument('-e', '--edges', type=str, default="edges.csv",
+                    help='Name of the edges file')
+parser.add_argument('-of', '--obstacles', type=str, default="obstacles.csv",
+                    help='Name of the obstacles file')
+parser.add_argument('-b', '--binary', type=str, default="roadmap.rmap",
+                    help='Name of the binary roadmap file')
+parser.add_argument('-d', '--directory', type=str, default=".",
+                    help='Name of the directory')
+parser.add_argument('-tc', '--tocsv', action='store_true',
+                    help='Convert the binary file to csv files instead of the other way round')
+parser.add_argument('-v', '--verbose', type=int, default=0,
+                    help='Verbosity level')
+
+
+args = parser.parse_args()
+
+fnamenodes = args.nodes
+fnameedges = args.edges
+fnameobstacles = args.obstacles
+fnamebinary = args.binary
+dname = args.directory
+tocsv = args.tocsv
+verbosity = args.verbose
+
+if verbosity > 0:
+    print("roadmapconv.py args:")
+    print("    fnamenodes:", fnamenodes)
+    print("    fnameedges:", fnameedges)
+    print("    fnameobstacles:", fnameobstacles)
+    print("    fnamebinary:", fnamebinary)
+    print("    dname:", dname)
+    print("    tocsv:", tocsv)
+    print("    verbosity:", verbosity)
+
+
+def main():
+    fp_nodename = f"{dname}/{fnamenodes}"
+    fp_edgename = f"{dname}/{fnameedges}"
+    fp_obstename = f"{dname}/{fnameobstacles}"
+    fp_binname = f"{dname}/{fnamebinary}"
+    t0 = time.perf_counter()
+    if tocsv:
+        rmap = roadmap.LoadBinary(fp_binname, verbosity=verbosity)
+        with open(fp_nodename, 'w') as file:
+            file.writelines(rmap.ExtractNodesIntoList())
+        with open(fp_edgename, 'w') as file:
+            file.writelines(rmap.ExtractEdgesIntoList())
+        with open(fp_obstename, 'w') as file:
+            file.writelines(rmap.ExtractObstIntoList())
+        print(f"Wrote {rmap.NumNodes()} nodes and {rmap.NumEdges()} edges from {fp_binname} to csv")
+    else:
+        rmap = roadmap.FromCsv(fp_nodename, fp_edgename, fp_obstename, verbosity=verbosity)
+        roadmap.SaveBinary(rmap, fp_binname)
+        print(f"Wrote {rmap.NumNodes()} nodes and {rmap.NumEdges()} edges to {fp_binname}")
+    print(f"Conversion took {time.perf_counter()-t0:.3f} secs")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,208 @@
+import prm
+import spatial
+import itertools
+import math
+import random
+import time
+
+
+class RrtGen(prm.PrmGen):
+    """
+    RRT and RRT* tree planners that share the obstacles, collision checks and graph of PrmGen
+
+    The tree is grown from the start node with edges added through ConnectIfClear, so the
+    result can be searched, plotted and written out like a PRM roadmap. Nearest neighbours
+    come from an incremental spatial.GridIndex that every new tree node is inserted into.
+    """
+
+    def __init__(self, nodetxt: list[str], edgetxt: list[str], obsttxt: list[str] = None,
+                 verbosity: int = 1, ranseed: bool = False, seed: int = 1234, vectorized: bool = True):
+        """
+        Constructor
+        :param nodetxt: list of node lines
+        :param edgetxt: list of edge lines
+        :param obsttxt: list of obstacle lines
+        :param verbosity: verbosity level
+        :param seed: seed value
+        :param vectorized: check segments with the NumPy collision checker instead of LineCircleIntersect
+        """
+        super().__init__(nodetxt, edgetxt, obsttxt, verbosity, ranseed, seed, vectorized=vectorized)
+        self.treeparent: dict[str, str] = {}
+        self.treecost: dict[str, float] = {}
+        self.treechildren: dict[str, list[str]] = {}
+        self.treeindex = None
+        self.iterations = 0
+        # (iterations, secs, cost) when the goal was first reached
+        self.firstsolution = None
+
+    def PointClear(self, x: float, y: float) -> bool:
+        """
+        True if x,y is outside every obstacle circle. Tree nodes only need the clearance the segment test gives,
+        the one diameter margin of the PRM samples leaves bands between obstacles that short steps cannot cross
+        """
+        if self.vectorized:
+            # a segment of length 0 is tested as a point
+            return bool(self.collision.SegmentsClear([x], [y], [x], [y])[0])
+        for o in self.obstgrid.PointCandidates(x, y):
+            if self.DistToObst(x, y, o) <= o["diam"]/2:
+                return False
+        return True
+
+    def SegmentsClearFrom(self, x: float, y: float, xs: list[float], ys: list[float]) -> list[bool]:
+        """
+        Line of sight from x,y to every point xs[k],ys[k]
+        """
+        if len(xs) == 0:
+            return []
+        if self.stats is not None:
+            self.stats.collisiontests += len(xs)
+        if self.vectorized:
+            return self.collision.SegmentsClear([x]*len(xs), [y]*len(xs), xs, ys).tolist()
+        rv = []
+        for x2, y2 in zip(xs, ys):
+            clear = True
+            for o in self.obstgrid.SegmentCandidates(x, y, x2, y2):
+                if self.LineCircleIntersect(x, y, x2, y2, o["x"], o["y"], o["diam"]):
+                    clear = False
+                    break
+            rv.append(clear)
+        return rv
+
+    def AddTreeNode(self, id: str, parent: str):
+        """
+        Hang node id, which must be in nodedict, below parent in the tree
+        """
+        self.ConnectIfClear(parent, id, True)
+        self.treeparent[id] = parent
+        self.treecost[id] = self.treecost[parent] + self.edgecost[f"{parent}:{id}"]
+        self.treechildren[id] = []
+        self.treechildren[parent].append(id)
+        self.treeindex.Insert(id, self.nodedict[id]["x"], self.nodedict[id]["y"])
+
+    def Reparent(self, n: str, parent: str):
+        """
+        Move node n below parent and update the costs of its subtree
+        """
+        old = self.treeparent[n]
+        self.RemoveEdge(old, n)
+        self.treechildren[old].remove(n)
+        self.ConnectIfClear(parent, n, True)
+        self.treeparent[n] = parent
+        self.treechildren[parent].append(n)
+        delta = self.treecost[parent] + self.edgecost[f"{parent}:{n}"] - self.treecost[n]
+        todo = [n]
+        while todo:
+            m = todo.pop()
+            self.treecost[m] += delta
+            todo.extend(self.treechildren[m])
+
+    def TreePath(self, goal: str) -> list[str]:
+        """
+        Tree path from the root to goal, empty if goal is not in the tree
+        """
+        if goal not in self.treeparent:
+            return []
+        rv = [goal]
+        while self.treeparent[rv[-1]] is not None:
+            rv.append(self.treeparent[rv[-1]])
+        rv.reverse()
+        return rv
+
+    def Plan(self, start: str, goal: str, x0: float, y0: float, x1: float, y1: float, maxiter: int = 5000,
+             step: float = 0.05, goalbias: float = 0.05, star: bool = False, gamma: float = 0.0) -> list[str]:
+        """
+        Grow a tree from start in the rectangle x0,y0,x1,y1 until it reaches goal, returns the tree path
+        :param maxiter: number of samples to draw at most
+        :param step: longest tree edge, samples further from the tree are pulled in to this distance
+        :param goalbias: probability of sampling the goal position instead of a random one
+        :param star: RRT*: pick the cheapest parent near a new node, rewire its neighbours through it and keep
+                     improving the path for all maxiter samples instead of stopping at the first solution
+        :param gamma: RRT* neighbourhood constant, the radius is min(step, gamma*sqrt(log(n)/n)),
+                      0 picks the value that guarantees asymptotic optimality for the rectangle
+        """
+        for n in (start, goal):
+            if n not in self.nodedict:
+                print(f'Error node "{n}" not in nodedict')
+                return []
+        t0 = time.perf_counter()
+        self.collision.Update(self.obst)
+        gx = self.nodedict[goal]["x"]
+        gy = self.nodedict[goal]["y"]
+        self.treeparent = {start: None}
+        self.treecost = {start: 0.0}
+        self.treechildren = {start: []}
+        self.treeindex = spatial.GridIndex(cellsize=step)
+        self.treeindex.Insert(start, self.nodedict[start]["x"], self.nodedict[start]["y"])
+        self.firstsolution = None
+        if gamma <= 0:
+            gamma = 2*math.sqrt(1.5*(x1-x0)*(y1-y0)/math.pi)
+        nextid = max(len(self.nodedict)+1, self.nextid)
+        it = 0
+        nnq = 0
+        while it < maxiter:
+            it += 1
+            if random.random() < goalbias:
+                qx, qy = gx, gy
+            else:
+                qx = random.uniform(x0, x1)
+                qy = random.uniform(y0, y1)
+            d, near = next(self.treeindex.Nearest(qx, qy))
+            nnq += 1
+            nx = self.nodedict[near]["x"]
+            ny = self.nodedict[near]["y"]
+            if d <= 0:
+                continue
+            if d > step:
+                qx = nx + (qx-nx)*step/d
+                qy = ny + (qy-ny)*step/d
+            if not self.PointClear(qx, qy):
+                continue
+            if star:
+                n = len(self.treecost)
+                r = min(step, gamma*math.sqrt(math.log(n+1)/(n+1)))
+                cand = [id for dist, id in itertools.takewhile(lambda c: c[0] <= r, self.treeindex.Nearest(qx, qy))]
+                nnq += 1
+                if near not in cand:
+                    cand.append(near)
+            else:
+                cand = [near]
+            cx = [self.nodedict[m]["x"] for m in cand]
+            cy = [self.nodedict[m]["y"] for m in cand]
+            clear = self.SegmentsClearFrom(qx, qy, cx, cy)
+            dists = [math.sqrt((qx-x)**2 + (qy-y)**2) for x, y in zip(cx, cy)]
+            best = [(self.treecost[m]+dm, m) for m, dm, c in zip(cand, dists, clear) if c]
+            if len(best) == 0:
+                continue
+            parent = min(best)[1]
+
+            id = f"{nextid}"
+            nextid += 1
+            self.nodedict[id] = {"x": qx, "y": qy, "id": id}
+            self.nbr[id] = []
+            self.AddTreeNode(id, parent)
+            if star:
+                for m, dm, c in zip(cand, dists, clear):
+                    if c and m != parent and self.treecost[id] + dm < self.treecost[m]:
+                        self.Reparent(m, id)
+
+            if goal not in self.treeparent and math.sqrt((qx-gx)**2 + (qy-gy)**2) <= step:
+                if self.SegmentsClearFrom(qx, qy, [gx], [gy])[0]:
+                    self.AddTreeNode(goal, id)
+                    self.firstsolution = (it, time.perf_counter()-t0, self.treecost[goal])
+                    if self.verbosity > 0:
+                        print(f"First solution after {it} iterations in {self.firstsolution[1]:.3f} secs "
+                              f"cost:{self.treecost[goal]:.5f}")
+                    if not star:
+                        break
+        self.nextid = nextid
+        self.iterations = it
+        if self.stats is not None:
+            self.stats.AddTime("rrt", time.perf_counter()-t0)
+            self.stats.samplesdrawn += it
+            # samples that did not become tree nodes, the goal joins the tree without being sampled
+            self.stats.samplesrejected += it - (len(self.treeparent) - 1 - (goal in self.treeparent))
+            self.stats.nnqueries += nnq
+        if self.verbosity > 0:
+            print(f"{'RRT*' if star else 'RRT'} grew {len(self.treeparent)} tree nodes in {it} iterations "
+                  f"and {time.perf_counter()-t0:.3f} secs")
+        return self.TreePath(goal)
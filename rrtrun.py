@@ -0,0 +1,159 @@
+import rrt
+import stats
+import argparse
+import time
+
+
+parser = argparse.ArgumentParser(prog='RrtRun.py',
+                                 description='Calculates RRT or RRT* path around obstacles',
+                                 epilog='Text at the bottom of help')
+
+parser.add_argument('-nf', '--nodes', type=str, default="nodes.csv",
+                    help='Name of the nodes file')
+parser.add_argument('-ef', '--edges', type=str, default="edges.csv",
+                    help='Name of the edges file')
+parser.add_argument('-of', '--obstacles', type=str, default="obstacles.csv",
+                    help='Name of the obstacles file')
+parser.add_argument('-fn', '--firstnode', type=str, default="1",
+                    help='Name of the first node')
+parser.add_argument('-tn', '--targetnode', type=str, default="2",
+                    help='Name of the target node')
+parser.add_argument('-mi', '--maxiter', type=int, default=5000,
+                    help='Most samples to draw')
+parser.add_argument('-st', '--step', type=float, default=0.05,
+                    help='Longest tree edge')
+parser.add_argument('-gb', '--goalbias', type=float, default=0.05,
+                    help='Probability of sampling the target node position')
+parser.add_argument('-star', '--star', action='store_true',
+                    help='Run RRT*, which rewires the tree and keeps improving the path for all samples')
+parser.add_argument('-s', '--scene', type=str, default="RRT Planner",
+                    help='Name of the scene')
+parser.add_argument('-d', '--directory', type=str, default="planning_coursera",
+                    help='Name of the directory')
+parser.add_argument('-fp', '--finplot', action='store_true',
+                    help='Do a plot of final path')
+parser.add_argument('-sp', '--stepplot', action='store_true',
+                    help='Create a plot that shows the steps to finding the final path')
+parser.add_argument('-lt', '--labelmax', type=int, default=200,
+                    help='Plot graphs with more nodes than this without labels')
+parser.add_argument('-ps', '--plotstep', type=int, default=1,
+                    help='Make every Nth search step of -sp a frame of the animation')
+parser.add_argument('-pf', '--plotfile', type=str, default="",
+                    help='Write the plot of -fp or -sp to this image file instead of showing it, '
+                         'works without a display')
+parser.add_argument('-sc', '--scalar', action='store_true',
+                    help='Check points and segments one at a time instead of with the NumPy collision checker')
+parser.add_argument('-so', '--statsout', type=str, default="",
+                    help='Collect counters and phase times and write them to this JSON file')
+parser.add_argument('-v', '--verbose', type=int, default=0,
+                    help='Verbosity level')
+parser.add_argument('-rs', '--ranseed', action='store_true',
+                    help='Generate a random seed and print it out')
+parser.add_argument('-seed', '--seed', type=int, default=1234,
+                    help='Random seed value')
+
+
+args = parser.parse_args()
+
+fnamenodes = args.nodes
+fnameedges = args.edges
+fnameobstacles = args.obstacles
+firstnode = args.firstnode
+targetnode = args.targetnode
+maxiter = args.maxiter
+step = args.step
+goalbias = args.goalbias
+star = args.star
+astarscene = args.scene
+dname = args.directory
+finplot = args.finplot
+stepplot = args.stepplot
+plotfile = args.plotfile
+labelmax = args.labelmax
+plotstep = args.plotstep
+vectorized = not args.scalar
+verbosity = args.verbose
+ran_seed = args.ranseed
+seed = args.seed
+statsout = args.statsout
+
+if verbosity > 0:
+    print("rrtrun.py args:")
+    print("    fnamenodes:", fnamenodes)
+    print("    fnameedges:", fnameedges)
+    print("    fnameobstacles:", fnameobstacles)
+    print("    firstnode:", firstnode)
+    print("    targetnode:", targetnode)
+
+    print("    maxiter:", maxiter)
+    print("    step:", step)
+    print("    goalbias:", goalbias)
+    print("    star:", star)
+
+    print("    astarscene:", astarscene)
+    print("    dname:", dname)
+    print("    finplot:", finplot)
+    print("    stepplot:", stepplot)
+    print("    plotfile:", plotfile)
+    print("    labelmax:", labelmax)
+    print("    plotstep:", plotstep)
+    print("    vectorized:", vectorized)
+    print("    verbosity:", verbosity)
+    print("    ran_seed:", ran_seed)
+    print("    seed:", seed)
+    print("    statsout:", statsout)
+
+
+def main():
+    fp_nodename = f"{dname}/{fnamenodes}"
+    fp_edgename = f"{dname}/{fnameedges}"
+    fp_obstacles = f"{dname}/{fnameobstacles}"
+
+    rrta = rrt.RrtGen([fp_nodename], [fp_edgename], [fp_obstacles],
+                      verbosity=verbosity, ranseed=ran_seed, seed=seed, vectorized=vectorized)
+    rrta.labelmax = labelmax
+    rrta.plotstep = plotstep
+    if statsout:
+        rrta.stats = stats.PlannerStats()
+    t0 = time.perf_counter()
+    rv = rrta.Plan(firstnode, targetnode, -0.5, -0.5, 0.5, 0.5, maxiter, step, goalbias, star)
+    elap = time.perf_counter() - t0
+    if rrta.firstsolution is not None:
+        it, secs, cost = rrta.firstsolution
+        print(f"first solution: iterations:{it} secs:{secs:.3f} cost:{cost:.5f}")
+    print(f"Plan took {elap:.3f} secs for {rrta.iterations} iterations, tree has {len(rrta.treeparent)} nodes")
+
+    if rv and (finplot or stepplot):
+        # the tree holds one path to the target, plotting replays it as an A* search
+        rv = rrta.FindPath(firstnode, targetnode, scenename=astarscene, stepplot=stepplot, finplot=finplot)
+    print("bestpath:", rv)
+    print(f"bestpath cost:{rrta.AstarCost(rv):.5f}")
+
+    nodelist = rrta.ExtractNodesIntoList()
+    edgelist = rrta.ExtractEdgesIntoList()
+    obstlist = rrta.ExtractObstIntoList()
+    rrta.ShowPlot(plotfile)
+
+    # Write out the solution node path to "path.csv"
+    pathline = ",".join(rv)
+    with open('path.csv', 'w') as file:
+        file.write(pathline)
+
+    # Write out the tree nodes and edges
+    with open('nodes.csv', 'w') as file:
+        file.writelines(nodelist)
+
+    with open('edges.csv', 'w') as file:
+        file.writelines(edgelist)
+
+    with open('obstacles.csv', 'w') as file:
+        file.writelines(obstlist)
+
+    if rrta.stats is not None:
+        print(rrta.stats.Summary())
+        rrta.stats.Dump(statsout)
+        print(f"Stats written to {statsout}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,195 @@
+import heapq
+import math
+import numpy
+
+
+class GridIndex:
+    """
+    Bucketed uniform grid over 2d points that supports insertion and incremental nearest neighbour queries.
+
+    Cells are kept in a dict so points may be inserted anywhere, the cell size is
+    chosen from the expected point density so each cell holds a couple of points.
+    """
+
+    def __init__(self, ids: list[str] = None, xs=None, ys=None, cellsize: float = 0.0):
+        """
+        Constructor
+        :param ids: ids of the points
+        :param xs: x coordinates of the points
+        :param ys: y coordinates of the points
+        :param cellsize: edge length of a cell, estimated from the points if 0
+        """
+        if ids is None:
+            ids, xs, ys = [], [], []
+        if cellsize <= 0:
+            cellsize = 0.0
+            if len(ids) > 1:
+                w = max(xs) - min(xs)
+                h = max(ys) - min(ys)
+                # points on or near a line have no area, the longer side spreads them over a couple per cell
+                cellsize = max(math.sqrt(2*w*h / len(ids)), 2*max(w, h) / len(ids))
+            if cellsize <= 0:
+                cellsize = 0.1
+        self.cellsize = cellsize
+        self.cells: dict[tuple[int, int], list[tuple[float, float, str]]] = {}
+        self.npoints = 0
+        self.ixmin = self.iymin = 1 << 62
+        self.ixmax = self.iymax = -(1 << 62)
+        for id, x, y in zip(ids, xs, ys):
+            self.Insert(id, x, y)
+
+    def Cell(self, x: float, y: float) -> tuple[int, int]:
+        return (math.floor(x / self.cellsize), math.floor(y / self.cellsize))
+
+    def Insert(self, id: str, x: float, y: float):
+        c = self.Cell(x, y)
+        if c not in self.cells:
+            self.cells[c] = []
+        self.cells[c].append((x, y, id))
+        self.npoints += 1
+        self.ixmin = min(self.ixmin, c[0])
+        self.ixmax = max(self.ixmax, c[0])
+        self.iymin = min(self.iymin, c[1])
+        self.iymax = max(self.iymax, c[1])
+
+    def Remove(self, id: str, x: float, y: float):
+        c = self.Cell(x, y)
+        pts = self.cells.get(c, [])
+        for k, p in enumerate(pts):
+            if p[2] == id:
+                del pts[k]
+                self.npoints -= 1
+                return
+
+    def Nearest(self, x: float, y: float):
+        """
+        Generator that yields (dist, id) for all points in order of increasing distance from (x,y)
+        """
+        cs = self.cellsize
+        cx, cy = self.Cell(x, y)
+        cand = []
+        r = 0
+        # stop growing the rings once they cover every occupied cell
+        rmax = max(cx-self.ixmin, self.ixmax-cx, cy-self.iymin, self.iymax-cy, 0)
+        while r <= rmax:
+            for i in range(cx-r, cx+r+1):
+                if r == 0 or i == cx-r or i == cx+r:
+                    jrange = range(cy-r, cy+r+1)
+                else:
+                    jrange = (cy-r, cy+r)
+                for j in jrange:
+                    pts = self.cells.get((i, j))
+                    if not pts:
+                        continue
+                    for px, py, id in pts:
+                        heapq.heappush(cand, (math.sqrt((px-x)**2 + (py-y)**2), id))
+            # every point not seen yet lies outside the block of rings 0..r
+            bound = min(x - (cx-r)*cs, (cx+r+1)*cs - x, y - (cy-r)*cs, (cy+r+1)*cs - y)
+            while cand and cand[0][0] <= bound:
+                yield heapq.heappop(cand)
+            r += 1
+        while cand:
+            yield heapq.heappop(cand)
+
+
+class KdTree:
+    """
+    Static bucketed k-d tree over 2d points with best-first incremental nearest neighbour queries
+    """
+
+    leafsize: int = 16
+
+    def __init__(self, ids: list[str], xs, ys):
+        """
+        Constructor
+        :param ids: ids of the points
+        :param xs: x coordinates of the points
+        :param ys: y coordinates of the points
+        """
+        self.ids = list(ids)
+        self.xy = numpy.column_stack([numpy.asarray(xs, dtype=numpy.float64),
+                                      numpy.asarray(ys, dtype=numpy.float64)]).reshape(-1, 2)
+        # node arrays: bounding box, children and the point range of leaves
+        self.bbox: list[tuple[float, float, float, float]] = []
+        self.child: list[tuple[int, int]] = []
+        self.leafpts: list[list[tuple[float, float, str]]] = []
+        self.order = numpy.arange(len(self.ids))
+        if len(self.ids) > 0:
+            self.Build(0, len(self.ids))
+
+    def Build(self, lo: int, hi: int) -> int:
+        idx = self.order[lo:hi]
+        pts = self.xy[idx]
+        mn = pts.min(axis=0).tolist()
+        mx = pts.max(axis=0).tolist()
+        node = len(self.bbox)
+        self.bbox.append((mn[0], mn[1], mx[0], mx[1]))
+        self.child.append((-1, -1))
+        self.leafpts.append([])
+        if hi - lo <= self.leafsize:
+            self.leafpts[node] = [(x, y, self.ids[i]) for i, (x, y) in zip(idx.tolist(), pts.tolist())]
+            return node
+        dim = 0 if mx[0]-mn[0] >= mx[1]-mn[1] else 1
+        mid = (hi - lo) // 2
+        part = numpy.argpartition(pts[:, dim], mid)
+        self.order[lo:hi] = idx[part]
+        left = self.Build(lo, lo+mid)
+        right = self.Build(lo+mid, hi)
+        self.child[node] = (left, right)
+        return node
+
+    def BoxDist(self, node: int, x: float, y: float) -> float:
+        x0, y0, x1, y1 = self.bbox[node]
+        dx = max(x0-x, 0.0, x-x1)
+        dy = max(y0-y, 0.0, y-y1)
+        return math.sqrt(dx*dx + dy*dy)
+
+    def Nearest(self, x: float, y: float):
+        """
+        Generator that yields (dist, id) for all points in order of increasing distance from (x,y)
+        """
+        if len(self.bbox) == 0:
+            return
+        # entries are (dist, isnode, key), points (isnode=0) win ties against boxes at the same distance
+        heap = [(self.BoxDist(0, x, y), 1, 0)]
+        while heap:
+            d, isnode, key = heapq.heappop(heap)
+            if not isnode:
+                yield d, key
+                continue
+            left, right = self.child[key]
+            if left < 0:
+                for px, py, id in self.leafpts[key]:
+                    heapq.heappush(heap, (math.sqrt((px-x)**2 + (py-y)**2), 0, id))
+            else:
+                heapq.heappush(heap, (self.BoxDist(left, x, y), 1, left))
+                heapq.heappush(heap, (self.BoxDist(right, x, y), 1, right))
+
+
+class BruteIndex:
+    """
+    Brute force index that sorts all points by distance, used as a reference
+    """
+
+    def __init__(self, ids: list[str], xs, ys):
+        self.ids = list(ids)
+        self.xs = list(xs)
+        self.ys = list(ys)
+
+    def Nearest(self, x: float, y: float):
+        dists = [math.sqrt((px-x)**2 + (py-y)**2) for px, py in zip(self.xs, self.ys)]
+        for k in sorted(range(len(dists)), key=dists.__getitem__):
+            yield dists[k], self.ids[k]
+
+
+def MakeIndex(kind: str, ids: list[str], xs, ys):
+    """
+    Create a spatial index of the given kind ("kdtree", "grid" or "brute") over the points
+    """
+    if kind == "kdtree":
+        return KdTree(ids, xs, ys)
+    if kind == "grid":
+        return GridIndex(ids, xs, ys)
+    if kind == "brute":
+        return BruteIndex(ids, xs, ys)
+    raise ValueError(f"Unknown spatial index kind:{kind}")
@@ -0,0 +1,84 @@
+import contextlib
+import json
+import math
+import time
+
+
+class PlannerStats:
+    """
+    Counters and per phase wall times of a planner, collected when an instance is set as the stats of an AStar
+    or PrmGen. The planners add to the counters once per call or per batch and not per inner loop iteration,
+    so leaving stats at None costs nothing and setting it costs little.
+    """
+
+    counters = ["samplesdrawn", "samplesrejected", "collisiontests", "collisioncached", "nnqueries",
+                "searches", "cachedsearches", "expansions", "openpushes", "openpops"]
+
+    def __init__(self):
+        self.samplesdrawn = 0
+        self.samplesrejected = 0
+        # segment tests that were run and that were answered by the pair cache
+        self.collisiontests = 0
+        self.collisioncached = 0
+        self.nnqueries = 0
+        self.searches = 0
+        # searches answered by the path cache
+        self.cachedsearches = 0
+        self.expansions = 0
+        self.openpushes = 0
+        self.openpops = 0
+        # seconds per phase summed over all calls, and the number of calls
+        self.times: dict[str, float] = {}
+        self.calls: dict[str, int] = {}
+
+    def AddTime(self, name: str, secs: float):
+        self.times[name] = self.times.get(name, 0.0) + secs
+        self.calls[name] = self.calls.get(name, 0) + 1
+
+    @contextlib.contextmanager
+    def Phase(self, name: str):
+        """
+        Time the body of a with statement as phase name
+        """
+        t0 = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.AddTime(name, time.perf_counter() - t0)
+
+    def Merge(self, other: "PlannerStats"):
+        """
+        Add the counters and times of other, the stats of a worker, to these
+        """
+        for c in self.counters:
+            setattr(self, c, getattr(self, c) + getattr(other, c))
+        for name, secs in other.times.items():
+            self.times[name] = self.times.get(name, 0.0) + secs
+            self.calls[name] = self.calls.get(name, 0) + other.calls[name]
+
+    def AsDict(self) -> dict:
+        rv = {c: getattr(self, c) for c in self.counters}
+        rv["times"] = dict(self.times)
+        rv["calls"] = dict(self.calls)
+        return rv
+
+    def Dump(self, fname: str):
+        with open(fname, "w") as f:
+            json.dump(self.AsDict(), f, indent=1)
+
+    def Summary(self) -> str:
+        rv = " ".join(f"{c}:{getattr(self, c)}" for c in self.counters)
+        if self.times:
+            rv += "\n" + " ".join(f"{name}:{secs:.4f}s/{self.calls[name]}" for name, secs in self.times.items())
+        return rv
+
+
+def Percentiles(values, ps=(50, 90, 99)) -> dict[str, float]:
+    """
+    Nearest rank percentiles of values as {"p50": ..}, with their count and maximum
+    """
+    vals = sorted(values)
+    rv = {f"p{p}": vals[max(0, math.ceil(p/100*len(vals))-1)] if vals else 0.0 for p in ps}
+    rv["max"] = vals[-1] if vals else 0.0
+    rv["n"] = len(vals)
+    return rv
@@ -0,0 +1,145 @@
+import astar
+import landmarks
+import pathcache
+import prm
+import queryexec
+import roadmap
+import argparse
+import contextlib
+import io
+import math
+import random
+import sys
+import time
+
+parser = argparse.ArgumentParser(prog='StressQuery',
+                                 description='Answers random queries on a PRM roadmap from thread pools and checks '
+                                             'that every answer is the one a serial run gives',
+                                 epilog='Exits with status 1 if any answer differs')
+
+parser.add_argument('-d', '--directory', type=str, default="planning_coursera",
+                    help='Directory with the nodes.csv, edges.csv and obstacles.csv the roadmap is built on')
+parser.add_argument('-n2g', '--nodes_to_gen', type=int, default=2000,
+                    help='PRM nodes to generate')
+parser.add_argument('-q', '--queries', type=int, default=300,
+                    help='Random queries per round, about a tenth of them repeat an earlier one')
+parser.add_argument('-w', '--workers', type=str, default="1,2,4,8",
+                    help='Thread pool sizes to run the queries with, comma separated')
+parser.add_argument('-r', '--rounds', type=int, default=3,
+                    help='Rounds per pool size, each submits the queries in a new random order')
+parser.add_argument('-bd', '--bidirectional', action='store_true',
+                    help='Answer the queries with bidirectional A*')
+parser.add_argument('-nl', '--numlandmarks', type=int, default=0,
+                    help='Landmarks for the ALT heuristic, 0 uses the euclidean distance only')
+parser.add_argument('-pc', '--pathcache', type=int, default=0,
+                    help='Share a path cache of this many nodes between the threads, 0 for none')
+parser.add_argument('-lz', '--lazy', action='store_true',
+                    help='Build the roadmap lazily, the executor checks its edges before the queries')
+parser.add_argument('-si', '--switchinterval', type=float, default=1e-5,
+                    help='Seconds between thread switches, small values interleave the searches more finely')
+parser.add_argument('-seed', '--seed', type=int, default=1234,
+                    help='Random seed value')
+parser.add_argument('-v', '--verbose', type=int, default=0,
+                    help='Verbosity level')
+
+
+args = parser.parse_args()
+
+
+def MakeQueries(ids: list[str], n: int, rng: random.Random) -> list[tuple[str, str]]:
+    rv = []
+    for _ in range(n):
+        if rv and rng.random() < 0.1:
+            rv.append(rng.choice(rv))
+        else:
+            rv.append(tuple(rng.sample(ids, 2)))
+    return rv
+
+
+def ValidPath(asta: astar.AStar, start: str, goal: str, path: list[str]) -> bool:
+    return (len(path) > 0 and path[0] == start and path[-1] == goal
+            and all(f"{n1}:{n2}" in asta.edgecost for n1, n2 in zip(path, path[1:])))
+
+
+def Mismatches(asta: astar.AStar, queries, serial, results) -> int:
+    """
+    Count the results that differ from the serial ones. Without a path cache the paths have to be the same,
+    with one the order of the queries decides which of several equally short paths is cached, so only the
+    costs have to agree and the paths have to be valid
+    """
+    nbad = 0
+    for (s, g), (path0, cost0), (path, cost) in zip(queries, serial, results):
+        if args.pathcache > 0:
+            ok = math.isclose(cost, cost0, rel_tol=1e-9, abs_tol=1e-12) and (not path or ValidPath(asta, s, g, path))
+        else:
+            ok = path == path0 and cost == cost0
+        if not ok:
+            nbad += 1
+            if nbad <= 5:
+                print(f"  mismatch {s}->{g}: serial cost:{cost0:.6f} {len(path0)} nodes, "
+                      f"threaded cost:{cost:.6f} {len(path)} nodes")
+    return nbad
+
+
+def main():
+    if args.verbose > 0:
+        print("stressquery.py args:")
+        for k, v in vars(args).items():
+            print(f"    {k}:", v)
+    # the constructors print regardless of the verbosity
+    out = sys.stdout if args.verbose > 0 else io.StringIO()
+    with contextlib.redirect_stdout(out):
+        files = [f"{args.directory}/{f}" for f in ("nodes.csv", "edges.csv", "obstacles.csv")]
+        prma = prm.PrmGen(files[:1], files[1:2], files[2:], verbosity=args.verbose, seed=args.seed,
+                          lazy=args.lazy)
+        prma.GenNodesAndEdges(args.nodes_to_gen, -0.5, -0.5, 0.5, 0.5)
+        if args.lazy:
+            # the same check and repair as the executor, so the serial run searches the same roadmap
+            prma.ValidateAndRepair()
+        prma.bidirectional = args.bidirectional
+        if args.numlandmarks > 0:
+            prma.landmarks = landmarks.Build(roadmap.FromAStar(prma), args.numlandmarks, args.verbose)
+        # a second planner in the same process must leave the roadmap of the first alone
+        nnodes = len(prma.nodedict)
+        nedges = len(prma.edgecost)
+        astar.AStar(files[:1], files[1:2], files[2:])
+    failed = 0
+    if (len(prma.nodedict), len(prma.edgecost)) != (nnodes, nedges):
+        print(f"FAIL loading a second planner changed the roadmap of the first")
+        failed += 1
+    print(f"Roadmap of {nnodes} nodes and {nedges//2} edges")
+
+    rng = random.Random(args.seed)
+    queries = MakeQueries(sorted(prma.nodedict.keys()), args.queries, rng)
+    t0 = time.perf_counter()
+    with contextlib.redirect_stdout(out):
+        serial = [(path, prma.AstarCost(path)) for path in (prma.FindPath(s, g) for s, g in queries)]
+    elap = time.perf_counter() - t0
+    nfound = sum(1 for path, _ in serial if path)
+    print(f"serial     {elap:8.3f} secs {len(queries)/elap:9.1f} queries/sec, {nfound}/{len(queries)} found")
+
+    sys.setswitchinterval(args.switchinterval)
+    for nw in [int(v) for v in args.workers.split(",") if v.strip()]:
+        for rnd in range(args.rounds):
+            if args.pathcache > 0:
+                prma.pathcache = pathcache.PathCache(args.pathcache)
+            order = list(range(len(queries)))
+            rng.shuffle(order)
+            t0 = time.perf_counter()
+            with contextlib.redirect_stdout(out):
+                with queryexec.QueryExecutor(prma, nw) as qe:
+                    futures = {k: qe.Submit(*queries[k]) for k in order}
+                    results = [futures[k].result() for k in range(len(queries))]
+            elap = time.perf_counter() - t0
+            nbad = Mismatches(prma, queries, serial, results)
+            failed += nbad
+            print(f"threads:{nw:<3d} round:{rnd} {elap:8.3f} secs {len(queries)/elap:9.1f} queries/sec, "
+                  f"{nbad} mismatches")
+    if failed:
+        print(f"FAIL {failed} mismatches")
+        sys.exit(1)
+    print("All threaded answers match the serial ones")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,128 @@
+import prm
+import argparse
+import contextlib
+import io
+import random
+import sys
+import time
+
+parser = argparse.ArgumentParser(prog='StressUpdate',
+                                 description='Adds random obstacles to a PRM roadmap one at a time and checks that '
+                                             'the start and goal stay connected whenever a rebuild of the edges '
+                                             'connects them',
+                                 epilog='Exits with status 1 if any check fails')
+
+parser.add_argument('-d', '--directory', type=str, default="planning_coursera",
+                    help='Directory with the nodes.csv, edges.csv and obstacles.csv the roadmap is built on')
+parser.add_argument('-n2g', '--nodes_to_gen', type=int, default=400,
+                    help='PRM nodes to generate')
+parser.add_argument('-f', '--firstnode', type=str, default="1",
+                    help='Start node of the checked query')
+parser.add_argument('-t', '--targetnode', type=str, default="2",
+                    help='Goal node of the checked query')
+parser.add_argument('-na', '--numadd', type=int, default=5,
+                    help='Obstacles added per round')
+parser.add_argument('-dm', '--diameters', type=str, default="0.05,0.2",
+                    help='Smallest and largest diameter of the added obstacles, comma separated')
+parser.add_argument('-r', '--rounds', type=int, default=10,
+                    help='Rounds, each starts from a fresh roadmap')
+parser.add_argument('-lz', '--lazy', action='store_true',
+                    help='Build the roadmaps lazily')
+parser.add_argument('-seed', '--seed', type=int, default=1234,
+                    help='Random seed value')
+parser.add_argument('-v', '--verbose', type=int, default=0,
+                    help='Verbosity level')
+
+
+args = parser.parse_args()
+
+
+def Build(files: list[str], obstlines: list[str]) -> prm.PrmGen:
+    prma = prm.PrmGen(files[:1], files[1:2], obstlines, verbosity=args.verbose, seed=args.seed, lazy=args.lazy)
+    prma.GenNodesAndEdges(args.nodes_to_gen, -0.5, -0.5, 0.5, 0.5)
+    return prma
+
+
+def Rebuild(prma: prm.PrmGen, obstlines: list[str]) -> prm.PrmGen:
+    """
+    A roadmap on the nodes left in prma with all edges linked again from scratch, new samples would make
+    connections the update cannot be expected to find
+    """
+    nodelines = [f"{n},{d['x']!r},{d['y']!r},0" for n, d in prma.nodedict.items()]
+    rv = prm.PrmGen(nodelines, [], obstlines, verbosity=args.verbose, seed=args.seed, lazy=args.lazy)
+    rv.maxlinks = prma.maxlinks
+    rv.maxcand = prma.maxcand
+    rv.LinkNodes(list(rv.nodedict.keys()))
+    return rv
+
+
+def PathClear(prma: prm.PrmGen, path: list[str]) -> bool:
+    if len(path) < 2:
+        return True
+    xy = [(prma.nodedict[n]["x"], prma.nodedict[n]["y"]) for n in path]
+    x1, y1 = zip(*xy[:-1])
+    x2, y2 = zip(*xy[1:])
+    return bool(prma.collision.SegmentsClear(x1, y1, x2, y2).all())
+
+
+def main():
+    if args.verbose > 0:
+        print("stressupdate.py args:")
+        for k, v in vars(args).items():
+            print(f"    {k}:", v)
+    # the constructors print regardless of the verbosity
+    out = sys.stdout if args.verbose > 0 else io.StringIO()
+    files = [f"{args.directory}/{f}" for f in ("nodes.csv", "edges.csv", "obstacles.csv")]
+    with open(files[2]) as file:
+        obstlines = file.read().splitlines()
+    dmin, dmax = (float(v) for v in args.diameters.split(","))
+    start, goal = args.firstnode, args.targetnode
+    rng = random.Random(args.seed)
+    failed = 0
+    for rnd in range(args.rounds):
+        t0 = time.perf_counter()
+        with contextlib.redirect_stdout(out):
+            prma = Build(files, obstlines)
+        tbuild = time.perf_counter() - t0
+        ends = [(prma.nodedict[n]["x"], prma.nodedict[n]["y"]) for n in (start, goal)]
+        added = []
+        tadd = 0.0
+        while len(added) < args.numadd:
+            x, y = rng.uniform(-0.5, 0.5), rng.uniform(-0.5, 0.5)
+            diam = rng.uniform(dmin, dmax)
+            # an obstacle over the start or goal removes it from the updated roadmap but not from a rebuild
+            if any((x-ex)**2 + (y-ey)**2 < diam**2 for ex, ey in ends):
+                continue
+            t0 = time.perf_counter()
+            with contextlib.redirect_stdout(out):
+                prma.AddObstacle(x, y, diam)
+            tadd += time.perf_counter() - t0
+            added.append(f"{x!r},{y!r},{diam!r}")
+            with contextlib.redirect_stdout(out):
+                rebuilt = Rebuild(prma, obstlines + added)
+                # a lazy search only drops blocked edges, the components are bridged by the repair
+                prma.ValidateAndRepair()
+                rebuilt.ValidateAndRepair()
+                path = prma.FindPath(start, goal)
+                path0 = rebuilt.FindPath(start, goal)
+            cost = prma.AstarCost(path) if path else None
+            cost0 = rebuilt.AstarCost(path0) if path0 else None
+            if path0 and not path:
+                failed += 1
+                print(f"  round:{rnd} obstacle {len(added)} at {added[-1]}: rebuild cost:{cost0:.5f}, "
+                      f"updated roadmap has no path")
+            elif not PathClear(prma, path):
+                failed += 1
+                print(f"  round:{rnd} obstacle {len(added)} at {added[-1]}: updated path is blocked")
+            elif args.verbose > 0:
+                print(f"  round:{rnd} obstacle {len(added)}: updated cost:{cost} rebuild cost:{cost0}")
+        print(f"round:{rnd} build {tbuild:8.3f} secs, {len(added)} obstacles added in {tadd:8.3f} secs, "
+              f"{len(prma.nodedict)} nodes {len(prma.edgecost)//2} edges left")
+    if failed:
+        print(f"FAIL {failed} checks")
+        sys.exit(1)
+    print("The updated roadmaps connect the start and goal whenever a rebuild does")
+
+
+if __name__ == "__main__":
+    main()